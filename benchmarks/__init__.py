@@ -0,0 +1 @@
+"""Offline performance benchmarks (python -m benchmarks.run)."""
@@ -0,0 +1,159 @@
+"""
+Load test for the HTTP/JSON ration service (feed_suggestion.service).
+
+Starts the service in a subprocess on a free localhost port (or targets
+--url), opens --concurrency keep-alive connections and sends --requests
+POSTs drawn from a pool of --distinct ration and herd requests, so the
+LRU, coalescing and batching all see traffic. Reports throughput and the
+latency percentiles as JSON.
+
+    python -m benchmarks.loadtest                          # 20k requests, 64 connections
+    python -m benchmarks.loadtest --distinct 100000        # mostly cache misses
+    python -m benchmarks.loadtest --url http://127.0.0.1:8088
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from feed_suggestion import engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CATALOG = os.path.join(ROOT, "Fodder and Nutrients.xlsx")
+REQUESTS = 20_000
+CONCURRENCY = 64
+DISTINCT = 2_000
+# share of /herd requests in the mix, and animals per herd request
+HERD_SHARE = 0.1
+HERD_ANIMALS = 20
+
+
+def _animal(rng):
+    fields = {"animal": rng.choice(engine.ANIMALS), "body_size": rng.choice(engine.BODY_SIZES),
+              "stage": rng.choice(engine.STAGES)}
+    if rng.random() < 0.5:
+        fields["milk_level"] = rng.choice(engine.MILK_LEVELS)
+    else:
+        fields["milk_yield"] = round(rng.uniform(0, engine.MAX_MILK_YIELD), 1)
+    return fields
+
+
+def workload(options, distinct, herd_share=HERD_SHARE, seed=0):
+    """`distinct` (path, encoded body) requests; `options` maps feed slots to ingredient names."""
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        feeds = {k: rng.choice(names) for k, names in options.items() if names and rng.random() < 0.8}
+        if rng.random() < herd_share:
+            animals = [dict(_animal(rng), count=rng.randint(1, 10)) for _ in range(HERD_ANIMALS)]
+            pool.append(("/herd", json.dumps({"animals": animals, "feeds": feeds}).encode()))
+        else:
+            pool.append(("/ration", json.dumps({**_animal(rng), "feeds": feeds}).encode()))
+    return pool
+
+
+async def _client(host, port, jobs, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while jobs:
+            path, body = jobs.pop()
+            start = time.perf_counter()
+            writer.write(f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def load(host, port, pool, requests, concurrency, seed=0):
+    """Send `requests` requests drawn from `pool` over `concurrency` connections; returns the result dict."""
+    rng = random.Random(seed)
+    jobs = [rng.choice(pool) for _ in range(requests)]
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, jobs, latencies, errors) for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+    ms = np.percentile(np.array(latencies) * 1000, [50, 90, 99]).tolist()
+    return {
+        "requests": len(latencies), "errors": len(errors), "seconds": round(seconds, 3),
+        "rps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(ms[0], 3), "p90_ms": round(ms[1], 3), "p99_ms": round(ms[2], 3),
+        "max_ms": round(max(latencies) * 1000, 3),
+    }
+
+
+def start_server(catalog):
+    """Run the service in a subprocess on a free port; returns (process, host, port)."""
+    proc = subprocess.Popen([sys.executable, "-m", "feed_suggestion", "serve", "--port", "0", "--catalog", catalog],
+                            cwd=ROOT, stderr=subprocess.PIPE, text=True)
+    line = proc.stderr.readline()
+    if "http://" not in line:
+        proc.kill()
+        raise RuntimeError(f"service did not start: {line.strip()}")
+    address = urlsplit(line.split()[-1])
+    return proc, address.hostname, address.port
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the HTTP/JSON ration service.")
+    parser.add_argument("--url", help="running service to test (default: start one on localhost)")
+    parser.add_argument("--catalog", default=CATALOG)
+    parser.add_argument("-n", "--requests", type=int, default=REQUESTS)
+    parser.add_argument("-c", "--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--distinct", type=int, default=DISTINCT, help="distinct request bodies in the mix")
+    parser.add_argument("--herd-share", type=float, default=HERD_SHARE)
+    parser.add_argument("-o", "--output", help="write JSON results here (default: stdout)")
+    args = parser.parse_args(argv)
+    if args.requests < 1 or args.concurrency < 1 or args.distinct < 1:
+        parser.error("--requests, --concurrency and --distinct must be positive")
+
+    from feed_suggestion.catalog import Catalog
+
+    catalog = Catalog.load(args.catalog)
+    options = {k: catalog.options(engine.FEED_CATEGORIES[k]) for k in engine.FEED_KEYS}
+    pool = workload(options, args.distinct, args.herd_share)
+
+    proc = None
+    if args.url:
+        address = urlsplit(args.url)
+        host, port = address.hostname, address.port or 80
+    else:
+        proc, host, port = start_server(args.catalog)
+    try:
+        result = asyncio.run(load(host, port, pool, args.requests, args.concurrency))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+    result.update(concurrency=args.concurrency, distinct=args.distinct, herd_share=args.herd_share)
+
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
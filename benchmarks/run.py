@@ -0,0 +1,362 @@
+"""
+Benchmark suite.
+
+Times catalog loading (workbook parse vs compiled catalog), category and
+ingredient lookups, nutrient totals, herd aggregation, what-if sweeps and
+PDF generation at parametrized sizes on synthetic data, measures the
+memory a loaded catalog and each page session keep, and writes
+machine-readable JSON.
+Runs offline without a browser or the Streamlit server.
+
+    python -m benchmarks.run -o bench.json             # full sizes
+    python -m benchmarks.run --quick                   # up to 5k ingredients / 10k animals
+    python -m benchmarks.run --compare old.json        # exit 1 on regressions
+
+Legacy rows reproduce the original per-row code paths (DataFrame boolean
+filters, the nutrient_from_feed loop, per-animal dict rations) and are
+only timed up to LEGACY_MAX_ANIMALS animals.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from feed_suggestion import engine
+from feed_suggestion.catalog import Catalog, compile_catalog
+from feed_suggestion.herd import group_herd, herd_totals
+from feed_suggestion.search import SearchIndex
+from feed_suggestion.substitute import substitutes
+from feed_suggestion.sweep import sweep
+from feed_suggestion.uncertainty import SAMPLES, ration_bands
+
+from .synthetic import CATEGORIES, catalog_frame, herd_frame, synthetic_catalog, write_workbook
+
+INGREDIENT_SIZES = [50, 500, 5_000, 50_000]
+ANIMAL_SIZES = [1, 100, 10_000, 1_000_000]
+QUICK_INGREDIENT_SIZES = [50, 500, 5_000]
+QUICK_ANIMAL_SIZES = [1, 100, 10_000]
+# alternatives per feed slot; the grid has 16 * 6 * 6 * 4 settings times k**4
+SWEEP_ALTERNATIVES = [1, 3, 5]
+QUICK_SWEEP_ALTERNATIVES = [1, 3]
+LEGACY_MAX_ANIMALS = 10_000
+# catalog size used by the per-animal benchmarks
+ANIMAL_CATALOG_SIZE = 500
+# distinct blends (of BLEND_SIZE ingredients each) spread over the animals
+BLENDS = 1_000
+BLEND_SIZE = 24
+
+# search-as-you-type queries timed together: short and long prefixes,
+# within a category, and typos that fall through to the trigram pass
+SEARCH_QUERIES = [("f", None), ("feed 00", CATEGORIES[0]), ("feed 0012", None), ("000123", None),
+                  ("fede 01234", None), ("fed", CATEGORIES[2])]
+
+# Stop repeating a measurement once it has used this much time (s)
+TIME_BUDGET = 2.0
+REPEAT = 5
+# --compare flags results slower than old * TOLERANCE + SLACK (s), or
+# using more than old * TOLERANCE + BYTES_SLACK bytes
+TOLERANCE = 1.2
+SLACK = 0.001
+BYTES_SLACK = 4096
+# page sessions kept open to measure the memory of one more session
+SESSIONS = 5
+
+
+def measure(fn, repeat=REPEAT, budget=TIME_BUDGET):
+    """Run `fn` up to `repeat` times (at least once, within `budget`)."""
+    times = []
+    start = time.perf_counter()
+    while len(times) < repeat and (not times or time.perf_counter() - start < budget):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return {"median_s": statistics.median(times), "min_s": min(times), "runs": len(times)}
+
+
+def measure_memory(fn):
+    """Python heap bytes allocated by `fn` and still held by its result, and the peak."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"bytes": after - before, "peak_bytes": peak - before}
+
+
+class Suite:
+    def __init__(self, verbose=True):
+        self.results = []
+        self.verbose = verbose
+
+    def add(self, name, size, unit, fn, **kw):
+        result = {"benchmark": name, "size": size, "unit": unit, **measure(fn, **kw)}
+        self.results.append(result)
+        if self.verbose:
+            print(f"{name:<28} {size:>10,} {unit:<12} {result['median_s'] * 1e3:12.3f} ms", file=sys.stderr)
+
+    def add_memory(self, name, size, unit, fn, per=1, **extra):
+        """Record the memory `fn` keeps; with `per`, per that many units of `size`."""
+        result = measure_memory(fn)
+        result = {"benchmark": name, "size": size, "unit": unit,
+                  **{k: round(v / per) for k, v in result.items()}, **extra}
+        self.results.append(result)
+        if self.verbose:
+            print(f"{name:<28} {size:>10,} {unit:<12} {result['bytes'] / 1024:12.1f} KiB", file=sys.stderr)
+
+
+# ----------------------------------------
+# LEGACY CODE PATHS (as in the original page script)
+# ----------------------------------------
+def legacy_lookups(df, choices):
+    for category in CATEGORIES:
+        df[df["Category"] == category]["Ingredient"].unique()
+    return [df[df["Ingredient"] == choice].iloc[0] for choice in choices]
+
+
+def legacy_totals(feed_rows, ration):
+    nutrient_totals = {k: 0.0 for k in engine.NUTRIENT_COLS}
+    for feed_row, qty in zip(feed_rows, [ration[k] for k in engine.FEED_KEYS]):
+        nf = engine.nutrient_from_feed(feed_row, qty)
+        for k in engine.NUTRIENT_COLS:
+            nutrient_totals[k] += nf[k]
+    return nutrient_totals
+
+
+# ----------------------------------------
+# BENCHMARKS
+# ----------------------------------------
+def bench_catalog(suite, sizes, workdir):
+    for n in sizes:
+        path = write_workbook(os.path.join(workdir, f"catalog_{n}.xlsx"), n)
+        suite.add("catalog.workbook_compile", n, "ingredients", lambda: compile_catalog(path), repeat=3)
+        suite.add("catalog.compiled_load", n, "ingredients", lambda: Catalog.load(path))
+
+
+def bench_lookups(suite, sizes):
+    for n in sizes:
+        df = catalog_frame(n)
+        catalog = synthetic_catalog(n)
+        choices = [catalog.options(c)[-1] for c in CATEGORIES]
+        suite.add("lookup.index_build", n, "ingredients", lambda: synthetic_catalog(n))
+        suite.add("lookup.legacy_dataframe", n, "ingredients", lambda: legacy_lookups(df, choices))
+        suite.add("lookup.indexed", n, "ingredients",
+                  lambda: ([catalog.options(c) for c in CATEGORIES], [catalog.row(x) for x in choices]))
+        suite.add("lookup.search_index_build", n, "ingredients",
+                  lambda: SearchIndex(catalog.rows, catalog.aliases, catalog.by_category))
+        catalog.search("")
+        suite.add("lookup.search", n, "ingredients",
+                  lambda: [catalog.search(q, c) for q, c in SEARCH_QUERIES])
+        catalog.substitution_index()
+        suite.add("lookup.substitutes", n, "ingredients",
+                  lambda: [substitutes(catalog, x, 2.0, category=category) for x in choices for category in (None, "")])
+
+
+def _animals(n, catalog, seed=0):
+    rng = np.random.default_rng(seed)
+    config = [np.array(labels, dtype=object)[rng.integers(0, len(labels), n)]
+              for labels in (engine.ANIMALS, engine.MILK_LEVELS, engine.BODY_SIZES, engine.STAGES)]
+    feed_idx = np.column_stack([
+        rng.choice(catalog.rows_in(engine.FEED_CATEGORIES[k]) if catalog.options(engine.FEED_CATEGORIES[k])
+                   else np.array([-1]), n)
+        for k in engine.FEED_KEYS
+    ])
+    return config, feed_idx
+
+
+def bench_nutrients(suite, sizes):
+    catalog = synthetic_catalog(ANIMAL_CATALOG_SIZE)
+    df = catalog_frame(ANIMAL_CATALOG_SIZE)
+    rng = np.random.default_rng(3)
+    blends = (rng.integers(0, ANIMAL_CATALOG_SIZE, (BLENDS, BLEND_SIZE)), rng.random((BLENDS, BLEND_SIZE)))
+    for n in sizes:
+        config, feed_idx = _animals(n, catalog)
+        ration = engine.ration_matrix(*config)
+        suite.add("nutrients.engine", n, "animals", lambda: engine.nutrient_matrix(ration, feed_idx, catalog.nutrients))
+        suite.add("nutrients.engine_with_ration", n, "animals",
+                  lambda: engine.evaluate(*config, feed_idx, catalog.nutrients))
+        blend_idx = np.random.default_rng(2).integers(0, BLENDS, (n, len(engine.FEED_KEYS)))
+        suite.add("nutrients.blends", n, "animals",
+                  lambda: engine.nutrient_matrix(ration, blend_idx, engine.blend_table(*blends, catalog.nutrients)))
+        yields = np.random.default_rng(1).uniform(0, engine.MAX_MILK_YIELD, n)
+        suite.add("nutrients.yield_ration", n, "animals",
+                  lambda: engine.yield_ration_matrix(config[0], yields, config[2], config[3]))
+        if n <= LEGACY_MAX_ANIMALS:
+            rows = [[df.iloc[i] if i >= 0 else None for i in idx] for idx in feed_idx]
+            dicts = [dict(zip(engine.RATION_KEYS, r)) for r in ration.tolist()]
+            suite.add("nutrients.legacy_loop", n, "animals",
+                      lambda: [legacy_totals(r, d) for r, d in zip(rows, dicts)])
+    # Monte Carlo bands of one ration with a two-ingredient blend per slot
+    ration = engine.ration_for(engine.ANIMALS[0], engine.MILK_LEVELS[1], engine.BODY_SIZES[0], engine.STAGES[0])
+    blends = {k: dict.fromkeys(catalog.options(engine.FEED_CATEGORIES[k])[:2], 1.0) for k in engine.FEED_KEYS}
+    suite.add("nutrients.uncertainty", SAMPLES, "samples", lambda: ration_bands(catalog, ration, blends))
+
+
+def bench_herd(suite, sizes):
+    for n in sizes:
+        herd = herd_frame(n)
+        suite.add("herd.grouped", n, "animals", lambda: herd_totals(group_herd(herd)))
+        if n <= LEGACY_MAX_ANIMALS:
+            records = herd.to_numpy().tolist()
+
+            def per_animal():
+                totals = dict.fromkeys(engine.RATION_KEYS, 0.0)
+                for animal, milk_level, body_type, stage in records:
+                    ration = engine.adjust_ration(engine.get_base_ration(animal, milk_level, stage), body_type, stage)
+                    for k in totals:
+                        totals[k] += ration[k]
+                return totals
+
+            suite.add("herd.legacy_per_animal", n, "animals", per_animal)
+
+
+def bench_sweep(suite, alternatives):
+    catalog = synthetic_catalog(ANIMAL_CATALOG_SIZE)
+    settings = (np.linspace(0, 15, 16), np.linspace(0.8, 1.3, 6), np.linspace(0.8, 1.3, 6), np.linspace(0.9, 1.2, 4))
+    for k in alternatives:
+        rows = [catalog.rows_in(engine.FEED_CATEGORIES[key])[:k] if catalog.options(engine.FEED_CATEGORIES[key])
+                else [-1] for key in engine.FEED_KEYS]
+        points = int(np.prod([len(v) for v in settings]) * np.prod([len(r) for r in rows]))
+        suite.add("sweep.grid", points, "points",
+                  lambda: sweep("Cow", "Mid lactation", *settings, rows, catalog.nutrients))
+
+
+def bench_pdf(suite, workdir):
+    from feed_suggestion.report import ReportCache, build_report, farm_specs, report_spec, write_reports_zip
+
+    ration = engine.ration_for("Buffalo", "10 L milk", "Large", "Early lactation")
+    spec = report_spec(
+        "Buffalo", "10 L milk", "Large", "Early lactation", 10, ration,
+        choices={k: f"Feed {i:06d}" for i, k in enumerate(engine.FEED_KEYS)},
+        nutrients=dict.fromkeys(engine.NUTRIENT_COLS, 1.0),
+        herd_kg={k: v * 10 for k, v in ration.items()},
+    )
+    suite.add("pdf.build", 1, "reports", lambda: build_report(spec))
+    cache = ReportCache()
+    cache.report(spec, "bench")
+    suite.add("pdf.cached", 1, "reports", lambda: cache.report(spec, "bench"))
+
+    catalog = synthetic_catalog(ANIMAL_CATALOG_SIZE)
+    for n in (10, 100):
+        farms = herd_frame(n)
+        for k, col in zip(engine.FEED_KEYS, ["Dry Fodder", "Green Fodder", "Concentrate", "Oil Cake", "Bran"]):
+            options = catalog.options(engine.FEED_CATEGORIES[k])
+            farms[col] = options[0] if options else None
+        out = os.path.join(workdir, "reports.zip")
+        suite.add("pdf.batch_zip", n, "reports",
+                  lambda: write_reports_zip(farm_specs(farms, catalog), out), repeat=1)
+
+
+def bench_memory(suite, sizes, workdir):
+    # the nutrient matrix is memory-mapped (page cache, shared by every
+    # process) and not on the Python heap; it is reported as mapped_bytes
+    for n in sizes:
+        path = write_workbook(os.path.join(workdir, f"memory_{n}.xlsx"), n)
+        compile_catalog(path)
+        suite.add_memory("memory.catalog_per_1k", n, "ingredients", lambda: Catalog.load(path),
+                         per=n / 1000, mapped_bytes=round(n * len(engine.NUTRIENT_COLS) * 8 / (n / 1000)))
+
+    # one more page session once a few are open (the catalog is loaded by then)
+    import logging
+
+    from streamlit.testing.v1 import AppTest
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)     # bare-mode warnings
+
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nddb_feed_app.py")
+
+    def session():
+        app = AppTest.from_file(script, default_timeout=60)
+        app.run()
+        return app
+
+    open_sessions = [session() for _ in range(2)]
+    suite.add_memory("memory.session", SESSIONS, "sessions",
+                     lambda: [session() for _ in range(SESSIONS)], per=SESSIONS)
+    del open_sessions
+
+
+def run(quick=False, only=None, verbose=True):
+    suite = Suite(verbose)
+    ingredients = QUICK_INGREDIENT_SIZES if quick else INGREDIENT_SIZES
+    animals = QUICK_ANIMAL_SIZES if quick else ANIMAL_SIZES
+    with tempfile.TemporaryDirectory() as workdir:
+        groups = {
+            "catalog": lambda: bench_catalog(suite, ingredients, workdir),
+            "lookup": lambda: bench_lookups(suite, ingredients),
+            "nutrients": lambda: bench_nutrients(suite, animals),
+            "herd": lambda: bench_herd(suite, animals),
+            "sweep": lambda: bench_sweep(suite, QUICK_SWEEP_ALTERNATIVES if quick else SWEEP_ALTERNATIVES),
+            "pdf": lambda: bench_pdf(suite, workdir),
+            "memory": lambda: bench_memory(suite, ingredients, workdir),
+        }
+        for name, fn in groups.items():
+            if not only or name in only:
+                fn()
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": quick,
+        },
+        "results": suite.results,
+    }
+
+
+def regressions(current, baseline, tolerance=TOLERANCE):
+    old = {(r["benchmark"], r["size"]): r for r in baseline["results"]}
+    found = []
+    for r in current["results"]:
+        before = old.get((r["benchmark"], r["size"]))
+        if not before:
+            continue
+        if "median_s" in r and r["median_s"] > before["median_s"] * tolerance + SLACK:
+            found.append(f"{r['benchmark']} @ {r['size']:,} {r['unit']}: "
+                         f"{r['median_s'] * 1e3:.3f} ms (was {before['median_s'] * 1e3:.3f} ms)")
+        if "bytes" in r and r["bytes"] > before["bytes"] * tolerance + BYTES_SLACK:
+            found.append(f"{r['benchmark']} @ {r['size']:,} {r['unit']}: "
+                         f"{r['bytes'] / 1024:.1f} KiB (was {before['bytes'] / 1024:.1f} KiB)")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("-o", "--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes for a fast run")
+    parser.add_argument("--only", nargs="+", choices=["catalog", "lookup", "nutrients", "herd", "sweep", "pdf", "memory"])
+    parser.add_argument("--compare", help="baseline JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    result = run(args.quick, args.only)
+    text = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            found = regressions(result, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
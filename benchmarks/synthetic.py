@@ -0,0 +1,56 @@
+"""
+Synthetic catalogs and herds for benchmarking.
+
+Catalogs mimic "Fodder and Nutrients.xlsx": the same columns and
+categories, plausible nutrient ranges and the same kind of blanks (many
+feeds have no NDF/ADF or ME).
+"""
+import numpy as np
+
+from feed_suggestion.catalog import Catalog
+from feed_suggestion.engine import ANIMALS, BODY_SIZES, MILK_LEVELS, NUTRIENT_COLS, STAGES
+
+CATEGORIES = ["Dry fodder", "Green fodder", "Concentrate", "Oil cake", "Unconventional feed"]
+
+# mean and spread per nutrient column (CP, EE, CF, NFE, Ash, NDF, ADF, ME)
+_MEAN = np.array([10.0, 3.0, 20.0, 50.0, 8.0, 50.0, 30.0, 2.3])
+_SPREAD = np.array([6.0, 2.0, 10.0, 12.0, 3.0, 15.0, 10.0, 0.5])
+# share of blank cells per nutrient column
+_BLANK = np.array([0.0, 0.05, 0.05, 0.05, 0.05, 0.5, 0.5, 0.4])
+
+
+def catalog_frame(n, seed=0):
+    """A workbook-shaped DataFrame with `n` ingredients."""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    values = np.abs(rng.normal(_MEAN, _SPREAD, (n, len(NUTRIENT_COLS)))).round(2)
+    values[rng.random(values.shape) < _BLANK] = np.nan
+    df = pd.DataFrame(values, columns=NUTRIENT_COLS)
+    df.insert(0, "Ingredient", [f"Feed {i:06d}" for i in range(n)])
+    df["Category"] = [CATEGORIES[i % len(CATEGORIES)] for i in range(n)]
+    return df
+
+
+def synthetic_catalog(n, seed=0):
+    """An in-memory Catalog with `n` ingredients."""
+    df = catalog_frame(n, seed)
+    return Catalog(df["Ingredient"], df["Category"], df[NUTRIENT_COLS].to_numpy(), f"synthetic-{n}-{seed}")
+
+
+def write_workbook(path, n, seed=0):
+    catalog_frame(n, seed).to_excel(path, index=False)
+    return path
+
+
+def herd_frame(n, seed=0):
+    """A herd register with `n` animals of random configuration."""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Animal Type": np.array(ANIMALS, dtype=object)[rng.integers(0, len(ANIMALS), n)],
+        "Milk Production Level": np.array(MILK_LEVELS, dtype=object)[rng.integers(0, len(MILK_LEVELS), n)],
+        "Body Size": np.array(BODY_SIZES, dtype=object)[rng.integers(0, len(BODY_SIZES), n)],
+        "Stage of Lactation": np.array(STAGES, dtype=object)[rng.integers(0, len(STAGES), n)],
+    })
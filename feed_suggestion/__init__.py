@@ -0,0 +1 @@
+"""Headless ration logic behind the NDDB feed recommendation app."""
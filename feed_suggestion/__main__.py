@@ -0,0 +1,49 @@
+"""
+Command line entry point: one subcommand per headless tool.
+
+    python -m feed_suggestion batch herd.csv -o plan.parquet
+    python -m feed_suggestion serve --port 8088
+    python -m feed_suggestion district registers/*.csv -o district_totals.csv
+    python -m feed_suggestion export herd.csv -o plan.xlsx
+    python -m feed_suggestion reports farms.csv -o reports.zip
+    python -m feed_suggestion compile "Fodder and Nutrients.xlsx"
+    python -m feed_suggestion startup --check
+
+None of them imports Streamlit.
+"""
+import importlib
+import sys
+
+# Subcommand -> (module, summary); each module has a main(argv)
+COMMANDS = {
+    "batch": ("batch", "rations and nutrient totals for every animal of a herd register"),
+    "serve": ("service", "serve rations, nutrient totals and herd totals as JSON over HTTP"),
+    "district": ("district", "total daily feed requirements across herd registers"),
+    "export": ("export", "export a herd's rations, nutrients and requirements"),
+    "reports": ("report", "render feed reports for many farms into a ZIP archive"),
+    "compile": ("catalog", "compile the ingredient workbook for fast loading"),
+    "startup": ("startup", "profile app startup and check it against a baseline"),
+}
+
+
+def usage():
+    width = max(map(len, COMMANDS))
+    lines = [f"  {name:<{width}}  {summary}" for name, (_, summary) in COMMANDS.items()]
+    return "usage: python -m feed_suggestion COMMAND [ARGS...]\n\ncommands:\n" + "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0 if argv else 2
+    if argv[0] not in COMMANDS:
+        print(f"unknown command: {argv[0]}\n\n{usage()}", file=sys.stderr)
+        return 2
+    module = importlib.import_module(f".{COMMANDS[argv[0]][0]}", __package__)
+    sys.argv[0] = f"python -m feed_suggestion {argv[0]}"
+    return module.main(argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""
+Batch rations.
+
+Computes the per-animal ration and nutrient totals of every row of a herd
+register, the same calculations as the page, without Streamlit. Large
+CSV registers are split into line-aligned byte ranges that worker
+processes read and compute on their own, so the parent only writes the
+results, in input order, as they arrive (Parquet row groups or CSV
+blocks); Excel registers are read by the parent in chunks. Memory is
+bounded by the chunk size times the jobs in flight.
+
+Rows keep the register's columns (as text; Count and the milk yield as
+numbers) followed by the ration per slot (kg/day, mineral in g/day) and
+the nutrient totals. Feed ingredients come from the register's farm
+report feed columns (Dry Fodder, Green Fodder, ...) or the defaults given
+with --feed; slots without one add no nutrients. CSV registers must have
+one record per line (no quoted line breaks).
+
+    python -m feed_suggestion batch herd.csv -o plan.parquet \\
+        --feed dry="Wheat straw" --feed conc="Compound cattle feed"
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .catalog import clean_columns
+from .engine import FEED_KEYS, NUTRIENT_COLS, encode_feeds, nutrient_matrix
+from .engine import ration_matrix, yield_ration_matrix
+from .herd import COUNT_COLUMN, HERD_COLUMNS, LEVEL_COLUMN, YIELD_COLUMN
+from .report import FEED_COLUMNS
+
+# Bytes of CSV register per job
+CHUNK_BYTES = 8 * 1024 * 1024
+# Rows of an Excel register per job
+CHUNK_ROWS = 100_000
+OUTPUT_FORMATS = ["parquet", "csv"]
+
+RATION_COLUMNS = [f"{FEED_COLUMNS[k]} (kg/day)" for k in FEED_KEYS] + ["Mineral Mixture (g/day)"]
+NUTRIENT_COLUMNS = [f"{c} (MJ/day)" if c == "ME" else f"{c} (kg/day)" for c in NUTRIENT_COLS]
+NUMERIC_COLUMNS = [COUNT_COLUMN, YIELD_COLUMN]
+
+# Worker state, set once per process by _init_worker
+_composition = None
+_rows = None
+
+
+def required_columns(columns):
+    """Register columns the rations need: the four settings, with the yield in place of the level when given."""
+    return [YIELD_COLUMN if c == LEVEL_COLUMN and YIELD_COLUMN in columns else c for c in HERD_COLUMNS]
+
+
+def output_columns(columns):
+    """Columns of the plan for a register with `columns`."""
+    return [*columns, *RATION_COLUMNS, *NUTRIENT_COLUMNS]
+
+
+def plan_rows(frame, feeds, composition, rows):
+    """
+    The plan of one chunk of a register: `frame` with the ration and
+    nutrient columns appended. `feeds` gives the default ingredient per
+    slot, `rows` ({ingredient: catalog row}) and `composition` the catalog.
+    """
+    import pandas as pd
+
+    for col in frame.columns:
+        if col in NUMERIC_COLUMNS:
+            frame[col] = frame[col].astype(float)
+        else:
+            frame[col] = frame[col].astype("str").where(frame[col].notna())
+    settings = [frame[c].str.strip().to_numpy() if c != YIELD_COLUMN else frame[c].to_numpy()
+                for c in required_columns(frame.columns)]
+    matrix = yield_ration_matrix if YIELD_COLUMN in frame else ration_matrix
+    ration = matrix(*settings)
+
+    feed_idx = np.empty((len(frame), len(FEED_KEYS)), dtype=np.intp)
+    for j, k in enumerate(FEED_KEYS):
+        default = feeds.get(k) or ""
+        if FEED_COLUMNS[k] in frame:
+            # a register names few distinct ingredients: look each up once
+            codes, names = pd.factorize(frame[FEED_COLUMNS[k]].fillna("").str.strip())
+            feed_idx[:, j] = encode_feeds([name or default for name in names], rows)[codes]
+        else:
+            feed_idx[:, j] = encode_feeds([default], rows)[0]
+    nutrients = nutrient_matrix(ration, feed_idx, composition)
+
+    values = np.round(np.hstack([ration, nutrients]), 3)
+    for i, col in enumerate(RATION_COLUMNS + NUTRIENT_COLUMNS):
+        frame[col] = values[:, i]
+    return frame
+
+
+def csv_ranges(path, chunk_bytes=CHUNK_BYTES):
+    """Line-aligned (start, stop) byte ranges of a CSV register's data rows."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        f.readline()
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + chunk_bytes, size) - 1)
+            f.readline()
+            yield start, f.tell()
+            start = f.tell()
+
+
+def read_header(path):
+    """Cleaned column names of a CSV or Excel register."""
+    import pandas as pd
+
+    read = pd.read_csv if path.lower().endswith(".csv") else pd.read_excel
+    return list(clean_columns(read(path, nrows=0).columns))
+
+
+def read_range(path, start, stop, columns):
+    """Rows of a CSV register between two byte offsets (see csv_ranges), as text."""
+    import pandas as pd
+
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(stop - start)
+    return pd.read_csv(io.BytesIO(data), header=None, names=columns, dtype=str, keep_default_na=False,
+                       na_values=[""])
+
+
+def encode_output(frame, fmt):
+    """
+    One plan chunk ready to append to the output: a pyarrow Table for
+    Parquet, UTF-8 bytes for CSV (formatted by pyarrow when installed,
+    several times faster than pandas).
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        if fmt != "csv":
+            raise
+        return frame.to_csv(header=False, index=False).encode("utf-8")
+
+    schema = pa.schema([(c, pa.float64() if c in NUMERIC_COLUMNS or c in RATION_COLUMNS + NUTRIENT_COLUMNS
+                         else pa.string()) for c in frame.columns])
+    table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+    if fmt != "csv":
+        return table
+    import pyarrow.csv
+
+    out = pa.BufferOutputStream()
+    pyarrow.csv.write_csv(table, out, pyarrow.csv.WriteOptions(include_header=False, quoting_style="needed"))
+    return out.getvalue().to_pybytes()
+
+
+def _init_worker(catalog_path):
+    global _composition, _rows
+    if catalog_path is None:
+        # no ingredients: every slot is unused, but nutrient_matrix still gathers a row
+        _composition, _rows = np.zeros((1, len(NUTRIENT_COLS))), {}
+    else:
+        from .catalog import Catalog
+
+        catalog = Catalog.load(catalog_path)
+        _composition, _rows = catalog.nutrients, catalog.rows
+
+
+def _plan_job(job, feeds, fmt):
+    path, part, columns, where = job
+    if part is None:
+        part = read_range(path, *where, columns)
+        where = f"bytes {where[0]}-{where[1]}"
+    try:
+        frame = plan_rows(part, feeds, _composition, _rows)
+    except ValueError as exc:
+        raise ValueError(f"{path} ({where}): {exc}") from None
+    return encode_output(frame, fmt)
+
+
+def _jobs(path, columns, chunk_bytes, chunk_rows):
+    # (path, rows or None to read the byte range, columns, rows or byte range)
+    if path.lower().endswith(".csv"):
+        for start, stop in csv_ranges(path, chunk_bytes):
+            yield path, None, columns, (start, stop)
+    else:
+        from .district import read_chunks
+
+        for i, part in enumerate(read_chunks(path, chunk_rows)):
+            part.columns = columns
+            yield path, part, columns, f"rows {i * chunk_rows + 1}-{i * chunk_rows + len(part)}"
+
+
+def plan_chunks(path, feeds=None, catalog_path=None, fmt="parquet", workers=None,
+                chunk_bytes=CHUNK_BYTES, chunk_rows=CHUNK_ROWS):
+    """
+    Yield the plan of a register chunk by chunk, in input order, encoded
+    for `fmt` (see encode_output). Chunks are computed in a process pool
+    with two jobs per worker in flight (in-process for a single worker).
+    `catalog_path` is needed when any row names an ingredient.
+    """
+    columns = read_header(path)
+    missing = [c for c in required_columns(columns) if c not in columns]
+    if missing:
+        raise ValueError(f"Herd register is missing column(s): {', '.join(missing)}")
+    feeds = feeds or {}
+    jobs = _jobs(path, columns, chunk_bytes, chunk_rows)
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        _init_worker(catalog_path)
+        for job in jobs:
+            yield _plan_job(job, feeds, fmt)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(catalog_path,)) as pool:
+        pending = deque()
+        for job in jobs:
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+            pending.append(pool.submit(_plan_job, job, feeds, fmt))
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_plan(chunks, out, columns, fmt):
+    """
+    Write encoded plan chunks to `out` (path or binary file) as they come:
+    one Parquet row group or CSV block each. Returns the number of rows.
+    """
+    count = 0
+    if fmt == "csv":
+        f = open(out, "wb") if isinstance(out, str) else out
+        try:
+            header = io.StringIO()
+            csv.writer(header, lineterminator="\n").writerow(columns)
+            f.write(header.getvalue().encode("utf-8"))
+            for data in chunks:
+                f.write(data)
+                count += data.count(b"\n")
+        finally:
+            if f is not out:
+                f.close()
+        return count
+
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for table in chunks:
+            if writer is None:
+                writer = pq.ParquetWriter(out, table.schema)
+            writer.write_table(table)
+            count += table.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rations and nutrient totals for every animal of a herd register.")
+    parser.add_argument("register", help="CSV or Excel herd register")
+    parser.add_argument("-o", "--output", required=True, help=".parquet or .csv file")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES / 2**20, help="MB of CSV register per job")
+    parser.add_argument("--catalog", default="Fodder and Nutrients.xlsx")
+    parser.add_argument("--feed", action="append", default=[], metavar="SLOT=INGREDIENT",
+                        help=f"default ingredient per slot ({', '.join(FEED_KEYS)})")
+    args = parser.parse_args(argv)
+
+    fmt = args.output.rsplit(".", 1)[-1].lower()
+    if fmt not in OUTPUT_FORMATS:
+        parser.error(f"output must be a {' or '.join('.' + f for f in OUTPUT_FORMATS)} file")
+    feeds = dict(item.split("=", 1) for item in args.feed)
+    unknown = set(feeds) - set(FEED_KEYS)
+    if unknown:
+        parser.error(f"unknown feed slot(s): {', '.join(sorted(unknown))}")
+
+    # written beside the output and renamed on success, so a failed run
+    # leaves an existing output as it was
+    tmp = f"{args.output}.{os.getpid()}.tmp"
+    try:
+        columns = read_header(args.register)
+        named = feeds or any(FEED_COLUMNS[k] in columns for k in FEED_KEYS)
+        catalog_path = args.catalog if named else None
+        if catalog_path:
+            from .catalog import Catalog
+
+            # compiled once here, so the workers only map it
+            unknown = sorted(set(feeds.values()) - set(Catalog.load(catalog_path).rows))
+            if unknown:
+                parser.error(f"unknown ingredient(s): {', '.join(unknown)}")
+        chunks = plan_chunks(args.register, feeds, catalog_path, fmt, args.jobs, int(args.chunk_mb * 2**20))
+        n = write_plan(chunks, tmp, output_columns(columns), fmt)
+        os.replace(tmp, args.output)
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    print(f"{n:,} animals -> {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+HTML result cards.
+
+Each section of the page's results (feed recommendation, nutrient
+analysis, herd totals) is rendered from the templates below as one HTML
+payload, so a rerun sends one markdown element per section instead of
+one per card. Sections are memoized on their inputs (plain tuples of
+labels and numbers), and ingredient names are escaped.
+
+The stylesheet lives in static/feed.css. When Streamlit serves app/static
+(server.enableStaticServing, see .streamlit/config.toml) the page only
+sends a <link> to it, versioned by its digest, and the browser fetches it
+once; otherwise it is inlined.
+
+    feed_section(((("Dry Fodder", "Wheat straw", 6.0),), ()), 120.0)
+"""
+import hashlib
+import html
+import os
+from functools import lru_cache
+
+from .metrics import CACHE_MISSES, CACHE_REQUESTS, METRICS
+from .uncertainty import BAND_LABEL
+
+STYLESHEET = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "static", "feed.css")
+STYLESHEET_URL = "app/static/feed.css"
+# Rendered sections kept per section kind
+SECTION_CACHE_SIZE = 256
+
+SECTION_HEADER = '<div class="section-header">{title}</div>'
+DIVIDER = '<div class="custom-divider"></div>'
+FEED_ITEM = """<div class="feed-item{kind}">
+    <div>
+        <div class="feed-label">{label}</div>
+        <div class="feed-name">{name}</div>
+    </div>
+    <div class="feed-quantity">{quantity}</div>
+</div>"""
+NUTRIENT_CARD = """<div class="nutrient-card">
+    <div class="nutrient-label">{label}</div>
+    <div class="nutrient-value">{value:.2f}</div>
+    <div class="nutrient-unit">{unit}</div>{band}
+</div>"""
+NUTRIENT_BAND = """
+    <div class="nutrient-band">{label} {low:.2f}–{high:.2f}</div>"""
+HERD_LINE = """<div class="herd-summary{kind}">
+    <span class="herd-ingredient">{name}</span>
+    <span class="herd-amount">{total:.2f} kg/day</span>
+</div>"""
+
+
+@lru_cache(maxsize=2)
+def stylesheet_tag(static_serving):
+    """The page's stylesheet: a versioned <link> when app/static is served, else an inline <style>."""
+    with open(STYLESHEET, "rb") as f:
+        css = f.read()
+    if static_serving:
+        return f'<link rel="stylesheet" href="{STYLESHEET_URL}?v={hashlib.sha1(css).hexdigest()[:12]}">'
+    return f"<style>{css.decode('utf-8')}</style>"
+
+
+def _feed_item(label, name, quantity, kind=""):
+    return FEED_ITEM.format(kind=kind, label=html.escape(label), name=html.escape(name), quantity=quantity)
+
+
+@lru_cache(maxsize=SECTION_CACHE_SIZE)
+def feed_section(columns, mineral_g):
+    """
+    The daily feed recommendation: `columns` holds, per card column, the
+    (label, ingredient, kg/day) items; the mineral mixture (g/day) spans
+    the width below them.
+    """
+    cells = "".join(
+        "<div>" + "".join(_feed_item(label, name, f"{kg:.2f} kg") for label, name, kg in items) + "</div>"
+        for items in columns
+    )
+    mineral = _feed_item("Mineral Supplement", "Mineral Mixture", f"{mineral_g:.0f} g", " mineral")
+    return (SECTION_HEADER.format(title="Daily Feed Recommendation (Per Animal)")
+            + f'<div class="card-columns">{cells}</div>' + mineral)
+
+
+@lru_cache(maxsize=SECTION_CACHE_SIZE)
+def nutrient_section(rows):
+    """
+    The nutrient analysis: `rows` of (label, value, unit) cards, four to a
+    row, each optionally followed by its uncertainty band (low, high).
+    """
+    grids = "".join(
+        '<div class="card-grid">' + "".join(
+            NUTRIENT_CARD.format(label=html.escape(label), value=value, unit=unit,
+                                 band=NUTRIENT_BAND.format(label=BAND_LABEL, low=band[0][0], high=band[0][1])
+                                 if band else "")
+            for label, value, unit, *band in cards
+        ) + "</div>"
+        for cards in rows
+    )
+    return DIVIDER + SECTION_HEADER.format(title="Nutritional Analysis (Per Animal Per Day)") + grids
+
+
+@lru_cache(maxsize=SECTION_CACHE_SIZE)
+def herd_section(animals, lines, mineral_kg):
+    """The herd's total requirements: (ingredient, kg/day) `lines` and the mineral mixture (kg/day)."""
+    body = "".join(HERD_LINE.format(kind="", name=html.escape(name), total=kg) for name, kg in lines)
+    mineral = HERD_LINE.format(kind=" mineral", name="Mineral Mixture", total=mineral_kg)
+    return DIVIDER + SECTION_HEADER.format(title=f"Total Feed Requirements ({animals} Animals)") + body + mineral
+
+
+def _section_cache_stats():
+    infos = [fn.cache_info() for fn in (feed_section, nutrient_section, herd_section)]
+    return [(CACHE_REQUESTS, {"cache": "cards"}, sum(i.hits + i.misses for i in infos)),
+            (CACHE_MISSES, {"cache": "cards"}, sum(i.misses for i in infos))]
+
+
+METRICS.add_collector(_section_cache_stats)
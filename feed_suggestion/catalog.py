@@ -0,0 +1,525 @@
+"""
+Compiled feed catalog.
+
+"Fodder and Nutrients.xlsx" is parsed with openpyxl only when it changes.
+The compiler cleans it once and writes a memory-mappable nutrient matrix
+(.npy) plus a JSON table of ingredient names and categories next to it;
+every later load maps those files instead of re-reading the workbook.
+
+A running app watches the workbook (watch_catalog): edits are compiled and
+loaded in a background thread, diffed against the previous catalog by
+ingredient, and swapped in; cached totals of unchanged ingredients carry
+over, and caches keyed on ingredient_version only miss for the
+ingredients that changed.
+
+    python -m feed_suggestion.catalog "Fodder and Nutrients.xlsx"
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .engine import FEED_KEYS, NUTRIENT_COLS, blend_table, encode_feeds, ration_nutrients
+from .metrics import CATALOG_RELOADS, METRICS, cache_lookup, timed
+from .search import SearchIndex, split_aliases
+from .substitute import SubstitutionIndex
+from .uncertainty import blend_spread, composition_spread
+
+CATALOG_FORMAT = 2
+CACHE_DIRNAME = ".feed_catalog"
+META_FILE = "catalog.json"
+# Nutrient totals memoized per catalog (distinct ration + feed combinations)
+NUTRIENT_MEMO_SIZE = 4096
+# Optional workbook column of other (e.g. local-language) names, separated by ";"
+ALIAS_COLUMN = "Aliases"
+# Seconds between checks of a watched workbook
+WATCH_INTERVAL = 2.0
+
+
+def catalog_dir(excel_path):
+    """Directory holding the compiled files for a workbook."""
+    folder, name = os.path.split(os.path.abspath(excel_path))
+    return os.path.join(folder, CACHE_DIRNAME, os.path.splitext(name)[0])
+
+
+def source_stamp(excel_path):
+    """Cheap change marker for the workbook: (mtime_ns, size), or None if missing."""
+    try:
+        st = os.stat(excel_path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def clean_columns(columns):
+    """Strip whitespace and zero-width characters from workbook headers."""
+    return columns.str.strip().str.replace('\u200b', '').str.replace('\ufeff', '')
+
+
+def _write_json(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _read_meta(out_dir):
+    try:
+        with open(os.path.join(out_dir, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if meta.get("format") != CATALOG_FORMAT or meta.get("nutrients") != NUTRIENT_COLS:
+        return None
+    if not os.path.exists(os.path.join(out_dir, meta["matrix"])):
+        return None
+    return meta
+
+
+def compile_catalog(excel_path, digest=None):
+    """
+    Parse the workbook, clean it and write the compiled catalog.
+    Returns the catalog metadata.
+    """
+    import pandas as pd
+
+    stamp = source_stamp(excel_path)
+    digest = digest or file_digest(excel_path)
+    df = pd.read_excel(excel_path)
+    df.columns = clean_columns(df.columns)
+    df = df[df["Ingredient"].notna()]
+
+    nutrients = np.ascontiguousarray(
+        df[NUTRIENT_COLS].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    )
+    version = digest[:12]
+    out_dir = catalog_dir(excel_path)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # the matrix file is named by version, so readers holding the old
+    # metadata never see a matrix from a different workbook
+    matrix = f"nutrients-{version}.npy"
+    tmp = os.path.join(out_dir, f"{matrix}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, nutrients, allow_pickle=False)
+    os.replace(tmp, os.path.join(out_dir, matrix))
+
+    meta = {
+        "format": CATALOG_FORMAT,
+        "source": os.path.basename(excel_path),
+        "mtime_ns": stamp[0],
+        "size": stamp[1],
+        "sha256": digest,
+        "version": version,
+        "matrix": matrix,
+        "nutrients": NUTRIENT_COLS,
+        "ingredients": [str(x) for x in df["Ingredient"]],
+        "categories": [str(x) if pd.notna(x) else "" for x in df["Category"]],
+        "aliases": [split_aliases(x) for x in df[ALIAS_COLUMN]] if ALIAS_COLUMN in df else None,
+    }
+    _write_json(os.path.join(out_dir, META_FILE), meta)
+
+    for name in os.listdir(out_dir):
+        if name.startswith("nutrients-") and name != matrix and not name.endswith(".tmp"):
+            os.remove(os.path.join(out_dir, name))
+    return meta
+
+
+def ensure_compiled(excel_path):
+    """
+    Return metadata for an up-to-date compiled catalog, rebuilding it only
+    when the workbook's mtime/size changed and its content hash differs.
+    A compiled catalog is used as-is when the workbook is not present.
+    """
+    out_dir = catalog_dir(excel_path)
+    meta = _read_meta(out_dir)
+    stamp = source_stamp(excel_path)
+    if stamp is None:
+        if meta is None:
+            raise FileNotFoundError(excel_path)
+        return meta
+    if meta is not None and (meta["mtime_ns"], meta["size"]) == stamp:
+        return meta
+
+    digest = file_digest(excel_path)
+    if meta is not None and meta["sha256"] == digest:
+        # touched but not edited: just record the new stamp
+        meta["mtime_ns"], meta["size"] = stamp
+        _write_json(os.path.join(out_dir, META_FILE), meta)
+        return meta
+    return compile_catalog(excel_path, digest)
+
+
+def load_compiled(excel_path):
+    """Returns (metadata, read-only memory-mapped nutrient matrix)."""
+    meta = ensure_compiled(excel_path)
+    nutrients = np.load(os.path.join(catalog_dir(excel_path), meta["matrix"]), mmap_mode="r")
+    return meta, nutrients
+
+
+def load_frame(excel_path):
+    """The compiled catalog as a DataFrame with the workbook's (cleaned) columns."""
+    import pandas as pd
+
+    meta, nutrients = load_compiled(excel_path)
+    df = pd.DataFrame(np.array(nutrients), columns=NUTRIENT_COLS)
+    df.insert(0, "Ingredient", meta["ingredients"])
+    df["Category"] = meta["categories"]
+    return df
+
+
+def blend_shares(blend):
+    """(ingredient, share) pairs of a blend {ingredient: proportion}, shares summing to 1."""
+    total = sum(blend.values())
+    return [(name, parts / total) for name, parts in blend.items() if parts > 0] if total > 0 else []
+
+
+def blend_label(blend):
+    """Display name of a blend: the ingredient alone, or "A 75% + B 25%"."""
+    shares = blend_shares(blend)
+    if len(shares) == 1:
+        return shares[0][0]
+    return " + ".join(f"{name.strip()} {share:.0%}" for name, share in shares) or None
+
+
+class Catalog:
+    """
+    Read-only feed catalog with its lookup indexes.
+
+    Built once per catalog version: a category -> ingredient list index
+    (sheet order, duplicates removed, like `.unique()`) and an
+    ingredient -> row offset hash index (first matching row, like
+    `df[df["Ingredient"] == name].iloc[0]`).
+
+    Compact and meant to be shared (see shared_catalog): names and
+    categories are deduplicated strings in tuples, the nutrients one read-only
+    C-contiguous float64 matrix (memory-mapped when loaded from the
+    compiled catalog). Nothing is copied per lookup or per session. A
+    loaded catalog keeps about 130 KiB of Python heap per 1,000 ingredients
+    plus 64 KiB of mapped matrix; a page session adds about 170 KiB, none of
+    it catalog (benchmarks: --only memory).
+    """
+
+    __slots__ = ("ingredients", "categories", "nutrients", "version", "rows", "by_category", "aliases",
+                 "_memo", "_memo_lock", "_indexes", "__weakref__")
+
+    def __init__(self, ingredients, categories, nutrients, version, aliases=None):
+        # one string object per distinct category (and per duplicate name)
+        pool = {}
+        self.ingredients = tuple(pool.setdefault(x, x) for x in map(str, ingredients))
+        self.categories = tuple(pool.setdefault(x, x) for x in map(str, categories))
+        nutrients = np.ascontiguousarray(nutrients, dtype=np.float64).view()
+        nutrients.flags.writeable = False
+        self.nutrients = nutrients
+        self.version = version
+
+        self.rows = {}
+        by_category = {}
+        for i, (name, category) in enumerate(zip(self.ingredients, self.categories)):
+            self.rows.setdefault(name, i)
+            by_category.setdefault(category, {}).setdefault(name, None)
+        self.by_category = {c: list(names) for c, names in by_category.items()}
+        # ingredient -> alias names, for the ingredients that have any
+        self.aliases = {}
+        for name, names in zip(self.ingredients, aliases or ()):
+            if names:
+                self.aliases[name] = tuple(dict.fromkeys(self.aliases.get(name, ()) + tuple(names)))
+
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self._indexes = {}
+
+    @classmethod
+    def load(cls, excel_path):
+        meta, nutrients = load_compiled(excel_path)
+        return cls(meta["ingredients"], meta["categories"], nutrients, meta["version"], meta.get("aliases"))
+
+    def __len__(self):
+        return len(self.ingredients)
+
+    def options(self, category):
+        """Ingredient names in a category (empty list for unknown categories)."""
+        return self.by_category.get(category, [])
+
+    def rows_in(self, category):
+        """Row offsets of the ingredients in a category, as an int array."""
+        return np.array([self.rows[name] for name in self.options(category)], dtype=np.intp)
+
+    def row(self, name):
+        """Row offset of an ingredient, or -1 for None."""
+        return -1 if name is None else self.rows[name]
+
+    def rows_of(self, choices):
+        """Vectorized `row` over an array of names (None -> -1)."""
+        return encode_feeds(choices, self.rows)
+
+    def search(self, query, category=None, k=10):
+        """
+        Top `k` ingredient names for a search-as-you-type query (names and
+        aliases, prefix then fuzzy; see search.SearchIndex), optionally
+        within a category. The index is built on first use.
+        """
+        index = self._index("search", lambda: SearchIndex(self.rows, self.aliases, self.by_category))
+        return index.search(query, category, k)
+
+    def substitution_index(self):
+        """Normalized nutrient profiles for substitute lookups (see substitute.py), built on first use."""
+        return self._index("substitutes", lambda: SubstitutionIndex(
+            self.nutrients, {"": list(self.rows.values()), **{c: self.rows_in(c) for c in self.by_category}}
+        ))
+
+    def nutrient_spread(self):
+        """Standard deviation of every row's nutrients (see uncertainty.py), built on first use."""
+        return self._index("spread", lambda: composition_spread(self.nutrients, self.ingredients, self.rows))
+
+    def _index(self, name, build):
+        """A derived index, built once per catalog (hot reloads get a fresh one)."""
+        index = self._indexes.get(name)
+        if index is None:
+            with self._memo_lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    index = self._indexes[name] = build()
+        return index
+
+    def _memoized(self, key, compute):
+        with self._memo_lock:
+            totals = self._memo.get(key)
+            if totals is not None:
+                self._memo.move_to_end(key)
+        cache_lookup("nutrients", totals is not None)
+        if totals is None:
+            totals = compute()
+            with self._memo_lock:
+                self._memo[key] = totals
+                if len(self._memo) > NUTRIENT_MEMO_SIZE:
+                    self._memo.popitem(last=False)
+        return dict(totals)
+
+    def ration_nutrients(self, ration, feed_idx):
+        """
+        Memoized engine.ration_nutrients against this catalog, keyed on the
+        feed quantities and row offsets. Returns a fresh dict.
+        """
+        key = ("rows", tuple(ration[k] for k in FEED_KEYS), tuple(int(i) for i in feed_idx))
+        return self._memoized(key, lambda: ration_nutrients(ration, feed_idx, self.nutrients))
+
+    def blend_table(self, blends):
+        """
+        Composition of one blend per feed slot. `blends` maps FEED_KEYS to
+        {ingredient: proportion} (missing or empty for an unused slot).
+        Returns the (5, 8) table and each slot's row in it (-1 if unused),
+        ready for engine.nutrient_matrix.
+        """
+        rows, weights = self._blend_rows(blends)
+        return blend_table(rows, weights, self.nutrients), [j if blends.get(k) else -1 for j, k in enumerate(FEED_KEYS)]
+
+    def blend_spread(self, blends):
+        """Standard deviation of each slot's blend composition (see uncertainty.py), (5, 8) like blend_table."""
+        return blend_spread(*self._blend_rows(blends), self.nutrient_spread())
+
+    def _blend_rows(self, blends):
+        # (5, k) catalog rows of each slot's blend (-1 pads) and their proportions
+        blends = [blends.get(k) or {} for k in FEED_KEYS]
+        rows = np.full((len(FEED_KEYS), max(1, *map(len, blends))), -1, dtype=np.intp)
+        weights = np.zeros(rows.shape)
+        for j, blend in enumerate(blends):
+            rows[j, :len(blend)] = [self.rows[name] for name in blend]
+            weights[j, :len(blend)] = list(blend.values())
+        return rows, weights
+
+    def blend_nutrients(self, ration, blends):
+        """
+        Memoized nutrient totals for blended feed slots (see blend_table).
+        A single ingredient per slot gives exactly ration_nutrients.
+        """
+        key = ("blend", tuple(ration[k] for k in FEED_KEYS),
+               tuple(tuple((blends.get(k) or {}).items()) for k in FEED_KEYS))
+
+        def compute():
+            table, idx = self.blend_table(blends)
+            return ration_nutrients(ration, idx, table)
+
+        return self._memoized(key, compute)
+
+    def composition(self, name):
+        """Nutrient row of an ingredient as a dict keyed by NUTRIENT_COLS."""
+        return dict(zip(NUTRIENT_COLS, self.nutrients[self.rows[name]].tolist()))
+
+    def ingredient_version(self, names):
+        """
+        Short digest of the category and nutrient row of each named
+        ingredient (unknown names included as missing). Unlike `version`,
+        it only changes when one of these ingredients does, so it keys
+        cached results that depend on a few ingredients.
+        """
+        names = sorted({name for name in names if name is not None})
+        rows = [self.rows.get(name, -1) for name in names]
+        h = hashlib.sha1()
+        for name, row in zip(names, rows):
+            h.update(f"{name}\0{self.categories[row] if row >= 0 else None}\0".encode("utf-8"))
+        h.update(self.nutrients[[r for r in rows if r >= 0]].tobytes())
+        return h.hexdigest()[:12]
+
+    def carry_over(self, old, changed):
+        """
+        Copy the memoized totals of catalog `old` that only involve
+        ingredients not in `changed` (re-keyed to this catalog's rows).
+        Returns the number of entries kept.
+        """
+        with old._memo_lock:
+            items = list(old._memo.items())
+        kept = []
+        for (kind, qty, feeds), totals in items:
+            if kind == "rows":
+                names = [old.ingredients[r] if r >= 0 else None for r in feeds]
+                if any(name in changed for name in names):
+                    continue
+                kept.append(((kind, qty, tuple(self.row(name) for name in names)), totals))
+            elif not any(name in changed for blend in feeds for name, _ in blend):
+                kept.append(((kind, qty, feeds), totals))
+        with self._memo_lock:
+            for key, totals in kept[-NUTRIENT_MEMO_SIZE:]:
+                self._memo.setdefault(key, totals)
+        return len(kept)
+
+
+def _analyses(catalog):
+    # (name, occurrence) -> row, for every row including repeated analyses of a name
+    seen, keys = {}, {}
+    for i, name in enumerate(catalog.ingredients):
+        n = seen[name] = seen.get(name, -1) + 1
+        keys[name, n] = i
+    return keys
+
+
+def catalog_diff(old, new):
+    """
+    Names of the ingredients added, removed or edited (category or any
+    nutrient value; blanks compare equal) between two catalogs. Every row
+    of a name counts, not just the first: repeated analyses feed the
+    nutrient spreads (uncertainty.py).
+    """
+    old_rows, new_rows = _analyses(old), _analyses(new)
+    changed = {name for name, _ in old_rows.keys() ^ new_rows.keys()}
+    common = [key for key in new_rows if key in old_rows]
+    a = old.nutrients[[old_rows[key] for key in common]]
+    b = new.nutrients[[new_rows[key] for key in common]]
+    edited = ~((a == b) | (np.isnan(a) & np.isnan(b))).all(axis=1)
+    for key, differs in zip(common, edited.tolist()):
+        if differs or old.categories[old_rows[key]] != new.categories[new_rows[key]]:
+            changed.add(key[0])
+    return changed
+
+
+# workbook path -> (source stamp, Catalog), one per process
+_SHARED = {}
+_shared_lock = threading.Lock()
+# serializes (re)loads; lookups never wait on it once a catalog is loaded
+_reload_lock = threading.Lock()
+_watched = set()
+
+
+def reload_catalog(excel_path):
+    """
+    Compile and load the workbook again if it changed since the shared
+    catalog was loaded, diff it against that catalog, carry over the
+    cached totals of unchanged ingredients and swap it in. Returns the
+    changed ingredient names, or None when the workbook is unchanged.
+    """
+    key = os.path.abspath(excel_path)
+    with _reload_lock:
+        stamp = source_stamp(excel_path)
+        with _shared_lock:
+            entry = _SHARED.get(key)
+        if entry is not None and entry[0] == stamp:
+            return None
+        with timed("catalog_reload"):
+            new = Catalog.load(excel_path)
+            old = entry[1] if entry is not None else None
+            if old is not None and old.version == new.version:
+                # touched but not edited: keep the loaded catalog
+                new, changed = old, set()
+            elif old is not None:
+                changed = catalog_diff(old, new)
+                new.carry_over(old, changed)
+            else:
+                changed = set(new.rows)
+        with _shared_lock:
+            _SHARED[key] = (stamp, new)
+    return changed
+
+
+def shared_catalog(excel_path):
+    """
+    The process-wide Catalog of a workbook, loaded on first use and again
+    only when the workbook changes. Every session, thread and caller in the
+    process gets the same instance (and the same nutrient memo); the
+    replaced catalog is dropped once its last user lets go of it.
+
+    Once the workbook is watched (watch_catalog) this never loads or even
+    stats the file: changes are picked up in the background.
+    """
+    key = os.path.abspath(excel_path)
+    with _shared_lock:
+        entry = _SHARED.get(key)
+    hit = entry is not None and (key in _watched or entry[0] == source_stamp(excel_path))
+    if not hit:
+        reload_catalog(excel_path)
+        with _shared_lock:
+            entry = _SHARED[key]
+    cache_lookup("catalog", hit)
+    return entry[1]
+
+
+def watch_catalog(excel_path, interval=WATCH_INTERVAL):
+    """
+    Reload the shared catalog of a workbook from a daemon thread whenever
+    the file changes. Safe to call on every rerun; one watcher per
+    workbook and process. A workbook that fails to load (e.g. saved
+    half-way) keeps the current catalog and is retried on the next check.
+    """
+    key = os.path.abspath(excel_path)
+    with _shared_lock:
+        if key in _watched:
+            return
+        _watched.add(key)
+
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                changed = reload_catalog(excel_path)
+            except Exception:
+                METRICS.inc(CATALOG_RELOADS, outcome="error")
+                continue
+            if changed is not None:
+                METRICS.inc(CATALOG_RELOADS, outcome="ok")
+
+    threading.Thread(target=loop, name="feed-catalog-watch", daemon=True).start()
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else "Fodder and Nutrients.xlsx"
+    meta = compile_catalog(path)
+    print(f"{meta['source']}: {len(meta['ingredients'])} ingredients, "
+          f"version {meta['version']} -> {catalog_dir(path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
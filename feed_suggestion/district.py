@@ -0,0 +1,175 @@
+"""
+District-wide feed requirements.
+
+Streams herd registers from many villages (CSV or Excel, any size) in
+chunks, maps every row to its ration with the herd grouping the page uses
+and reduces into daily totals per district and ingredient. Memory is
+bounded by the chunk size and the number of distinct (district,
+ingredient) pairs, not by the number of rows; several files are
+aggregated in parallel, one worker process per file.
+
+Registers have the herd register columns plus, optionally, a District
+column (default: the file name) and the farm report feed columns (Dry
+Fodder, Green Fodder, ...) naming the ingredient per slot. Slots without
+an ingredient use the defaults given with --feed, else they are totalled
+as "Unspecified <category>".
+
+    python -m feed_suggestion.district registers/*.csv -o district_totals.csv \\
+        --feed dry="Wheat straw" --feed conc="Compound cattle feed"
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .catalog import clean_columns
+from .engine import FEED_CATEGORIES, FEED_KEYS, RATION_KEYS
+from .herd import group_herd
+from .report import FEED_COLUMNS
+
+DISTRICT_COLUMN = "District"
+MINERAL = "Mineral Mixture"
+# Rows read per chunk
+CHUNK_ROWS = 100_000
+
+
+def read_chunks(path, chunksize=CHUNK_ROWS):
+    """
+    Yield a CSV or Excel register as DataFrames of at most `chunksize` rows,
+    indexed by data row from 0 across the chunks.
+    """
+    import pandas as pd
+
+    if path.lower().endswith(".csv"):
+        with pd.read_csv(path, chunksize=chunksize) as reader:
+            yield from reader
+        return
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        chunk, start = [], 0
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunksize:
+                yield pd.DataFrame(chunk, columns=header, index=pd.RangeIndex(start, start + len(chunk)))
+                chunk, start = [], start + len(chunk)
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header, index=pd.RangeIndex(start, start + len(chunk)))
+    finally:
+        wb.close()
+
+
+def aggregate_chunk(chunk, district, feeds, totals, animals):
+    """
+    Add one chunk's daily requirement into `totals` ({(district,
+    ingredient): kg}) and its head count into `animals` ({district: n}).
+    """
+    chunk.columns = clean_columns(chunk.columns)
+    if DISTRICT_COLUMN not in chunk:
+        chunk[DISTRICT_COLUMN] = district
+    feed_cols = [FEED_COLUMNS[k] for k in FEED_KEYS]
+    groups = group_herd(chunk.reindex(columns=[*chunk.columns, *(c for c in feed_cols if c not in chunk)]),
+                        by=[DISTRICT_COLUMN, *feed_cols])
+
+    counts = groups["Animals"].to_numpy(dtype=float)
+    kg = groups[RATION_KEYS].to_numpy() * counts[:, None]
+    districts = groups[DISTRICT_COLUMN].to_numpy()
+    for j, k in enumerate(FEED_KEYS):
+        default = feeds.get(k) or f"Unspecified {FEED_CATEGORIES[k].lower()}"
+        names = np.where(groups[feed_cols[j]].to_numpy() == "", default, groups[feed_cols[j]].to_numpy())
+        for d, name, amount in zip(districts, names, kg[:, j]):
+            if amount > 0:
+                totals[d, name] = totals.get((d, name), 0.0) + amount
+    for d, grams, n in zip(districts, kg[:, RATION_KEYS.index("mineral")], counts):
+        totals[d, MINERAL] = totals.get((d, MINERAL), 0.0) + grams / 1000
+        animals[d] = animals.get(d, 0) + int(n)
+
+
+def aggregate_file(path, feeds=None, chunksize=CHUNK_ROWS):
+    """(totals, animals) of one register; see aggregate_chunk."""
+    district = os.path.splitext(os.path.basename(path))[0]
+    totals, animals = {}, {}
+    for i, chunk in enumerate(read_chunks(path, chunksize)):
+        try:
+            aggregate_chunk(chunk, district, feeds or {}, totals, animals)
+        except ValueError as exc:
+            raise ValueError(f"{path} (rows {i * chunksize + 1}-{i * chunksize + len(chunk)}): {exc}") from None
+    return totals, animals
+
+
+def aggregate_files(paths, feeds=None, workers=None, chunksize=CHUNK_ROWS):
+    """
+    Aggregate many registers, one file per worker process (in-process for a
+    single file or worker). Returns merged (totals, animals).
+    """
+    totals, animals = {}, {}
+
+    def merge(result):
+        for key, kg in result[0].items():
+            totals[key] = totals.get(key, 0.0) + kg
+        for key, n in result[1].items():
+            animals[key] = animals.get(key, 0) + n
+
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers <= 1:
+        for path in paths:
+            merge(aggregate_file(path, feeds, chunksize))
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            for future in as_completed([pool.submit(aggregate_file, p, feeds, chunksize) for p in paths]):
+                merge(future.result())
+    return totals, animals
+
+
+def totals_frame(totals, animals):
+    """
+    Long table of daily requirements: District, Ingredient, Animals and
+    kg/day, with an "All districts" block at the end.
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame(
+        [(d, name, kg) for (d, name), kg in totals.items()], columns=["District", "Ingredient", "kg/day"]
+    )
+    overall = frame.groupby("Ingredient", as_index=False)["kg/day"].sum()
+    overall.insert(0, "District", "All districts")
+    frame = frame.sort_values(["District", "Ingredient"], kind="stable")
+    frame = pd.concat([frame, overall], ignore_index=True)
+    counts = dict(animals, **{"All districts": sum(animals.values())})
+    frame.insert(2, "Animals", frame["District"].map(counts).astype(int))
+    return frame
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Total daily feed requirements across herd registers.")
+    parser.add_argument("registers", nargs="+", help="CSV or Excel herd registers")
+    parser.add_argument("-o", "--output", help="CSV file for the totals (default: stdout)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--feed", action="append", default=[], metavar="SLOT=INGREDIENT",
+                        help=f"default ingredient per slot ({', '.join(FEED_KEYS)})")
+    args = parser.parse_args(argv)
+
+    feeds = dict(item.split("=", 1) for item in args.feed)
+    unknown = set(feeds) - set(FEED_KEYS)
+    if unknown:
+        parser.error(f"unknown feed slot(s): {', '.join(sorted(unknown))}")
+    try:
+        frame = totals_frame(*aggregate_files(args.registers, feeds, args.jobs, args.chunksize))
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    frame.to_csv(args.output or sys.stdout, index=False, float_format="%.3f")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
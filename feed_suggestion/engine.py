@@ -0,0 +1,355 @@
+"""
+Vectorized NDDB ration engine.
+
+Every function here works on arrays, so one call evaluates a single animal
+(the Streamlit page) or tens of thousands of animal configurations (the
+nightly batch run) with the same arithmetic.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from .metrics import CACHE_MISSES, CACHE_REQUESTS, METRICS
+
+# -------------------------------
+# LABELS (order defines the integer codes)
+# -------------------------------
+ANIMALS = ["Cow", "Buffalo"]
+MILK_LEVELS = ["Dry (0 L milk)", "5 L milk", "10 L milk"]
+BODY_SIZES = ["Small", "Medium", "Large"]
+STAGES = ["Early lactation", "Mid lactation", "Late lactation", "Pregnant (7–9 months)", "Dry period"]
+
+# -------------------------------
+# NDDB BASE RATION VALUES (kg/day)
+# -------------------------------
+NDDB_COW = {
+    "Dry (0 L milk)": {"dry": 7, "green": 4,  "conc": 2, "oil": 0, "bran": 0, "mineral": 50},
+    "5 L milk":       {"dry": 7, "green": 4,  "conc": 4, "oil": 0, "bran": 0, "mineral": 100},
+    "10 L milk":      {"dry": 7, "green": 4,  "conc": 6, "oil": 0, "bran": 0, "mineral": 150},
+}
+
+NDDB_BUFFALO = {
+    "Dry (0 L milk)": {"dry": 6, "green": 2,  "conc": 0, "oil": 2, "bran": 0, "mineral": 75},
+    "5 L milk":       {"dry": 7, "green": 5,  "conc": 5, "oil": 0, "bran": 0, "mineral": 125},
+    "10 L milk":      {"dry": 7, "green": 10, "conc": 6, "oil": 2, "bran": 0, "mineral": 175},
+}
+
+# Daily milk yield (L) each MILK_LEVELS row was tabulated for
+MILK_YIELDS = [0.0, 5.0, 10.0]
+# Continuous yields are interpolated between those rows and extrapolated
+# along the 5–10 L segment up to this yield; the tables say nothing
+# beyond it, so larger yields are rejected rather than guessed.
+MAX_MILK_YIELD = 15.0
+
+# Pregnant animal ration from NDDB (generic cow/buffalo) – mid-points of ranges
+PREGNANT_BASE = {"dry": 4.5, "green": 17.5, "conc": 2.5, "oil": 1.0, "bran": 0.0, "mineral": 50}
+
+# Body size factors (approximate)
+BODY_FACTORS = {
+    "Small": 0.9,
+    "Medium": 1.0,
+    "Large": 1.15,
+}
+
+# Stage-based adjustments (mild): early lactation ↑ concentrate and green,
+# late lactation ↓ concentrate
+STAGE_CONC_FACTORS = {"Early lactation": 1.15, "Late lactation": 0.9}
+STAGE_GREEN_FACTORS = {"Early lactation": 1.05}
+
+# Columns of a ration matrix; the first five are feed slots, mineral is in g
+RATION_KEYS = ["dry", "green", "conc", "oil", "bran", "mineral"]
+FEED_KEYS = RATION_KEYS[:5]
+FEED_CATEGORIES = {
+    "dry": "Dry fodder",
+    "green": "Green fodder",
+    "conc": "Concentrate",
+    "oil": "Oil cake",
+    "bran": "Bran",
+}
+
+# ----------------------------------------
+# NUTRIENTS
+# ----------------------------------------
+NUTRIENT_COLS = ["CP", "EE", "CF", "NFE", "Ash", "NDF", "ADF", "ME"]
+
+NUTRIENT_NAMES = {
+    "CP": "Crude Protein (Protein)",
+    "EE": "Ether Extract (Fat)",
+    "CF": "Crude Fibre (Fibre)",
+    "NFE": "Nitrogen Free Extract (Carbohydrates)",
+    "Ash": "Ash (Minerals)",
+    "NDF": "Neutral Detergent Fibre (Digestible Fibre)",
+    "ADF": "Acid Detergent Fibre (Indigestible Fibre)",
+    "ME": "Metabolizable Energy (Energy)"
+}
+
+# CP–ADF are given in % of the feed, ME in MJ per kg
+NUTRIENT_DIVISORS = np.array([100.0, 100.0, 100.0, 100.0, 100.0, 100.0, 100.0, 1.0])
+
+# -------------------------------
+# PRECOMPUTED TABLES
+# -------------------------------
+_BASE_TABLE = np.array([
+    [[table[level][k] for k in RATION_KEYS] for level in MILK_LEVELS]
+    for table in (NDDB_COW, NDDB_BUFFALO)
+], dtype=float)                                     # (animal, milk level, ration key)
+# piecewise-linear yield tables: each segment's start/end yield and rows
+_YIELD_KNOTS = np.array(MILK_YIELDS)
+_SEGMENT_LO = _BASE_TABLE[:, :-1]                   # (animal, segment, ration key)
+_SEGMENT_HI = _BASE_TABLE[:, 1:]
+_SEGMENT_START = _YIELD_KNOTS[:-1]
+_SEGMENT_WIDTH = np.diff(_YIELD_KNOTS)
+_PREGNANT_ROW = np.array([PREGNANT_BASE[k] for k in RATION_KEYS], dtype=float)
+_BODY_FACTOR = np.array([BODY_FACTORS[b] for b in BODY_SIZES])
+_STAGE_CONC = np.array([STAGE_CONC_FACTORS.get(s, 1.0) for s in STAGES])
+_STAGE_GREEN = np.array([STAGE_GREEN_FACTORS.get(s, 1.0) for s in STAGES])
+
+_PREGNANT = STAGES.index("Pregnant (7–9 months)")
+_DRY_PERIOD = STAGES.index("Dry period")
+_DRY_MILK = MILK_LEVELS.index("Dry (0 L milk)")
+_GREEN = RATION_KEYS.index("green")
+_CONC = RATION_KEYS.index("conc")
+_MINERAL = RATION_KEYS.index("mineral")
+
+
+def _round(x, decimals):
+    """
+    Vectorized equivalent of Python's round(x, decimals).
+
+    np.round works on x * 10**decimals, which can land exactly on .5 where
+    x itself does not (4.5 * 1.15 rounds to 5.18 instead of 5.17). Those
+    ties are settled with the exact error of the product (Dekker split).
+    """
+    scale = 10.0 ** decimals
+    y = x * scale
+    r = np.rint(y)
+    tie = np.abs(y - np.trunc(y)) == 0.5
+    if tie.any():
+        x, y, r = np.broadcast_to(x, tie.shape)[tie], y[tie], np.array(r)
+        c = 134217729.0 * x
+        hi = c - (c - x)
+        err = (hi * scale - y) + (x - hi) * scale
+        r[tie] = np.where(err > 0, np.floor(y) + 1, np.where(err < 0, np.floor(y), r[tie]))
+    return r / scale
+
+
+def encode(values, labels, what="value"):
+    """
+    Map labels (or already-encoded integer codes) to integer codes.
+    Works on scalars and arrays; unknown labels raise ValueError.
+    """
+    arr = np.asarray(values)
+    if arr.dtype.kind in "iu":
+        if arr.size and (arr.min() < 0 or arr.max() >= len(labels)):
+            raise ValueError(f"{what} code out of range")
+        return arr.astype(np.intp)
+    # a dict lookup per element is far cheaper than sorting object arrays
+    lookup = {label: i for i, label in enumerate(labels)}
+    try:
+        codes = np.fromiter(map(lookup.__getitem__, arr.ravel().tolist()), dtype=np.intp, count=arr.size)
+    except KeyError as exc:
+        raise ValueError(f"Unknown {what}: {exc.args[0]!r}") from None
+    return codes.reshape(arr.shape)
+
+
+def encode_feeds(choices, ingredient_rows):
+    """
+    Map ingredient names to catalog row offsets.
+    `choices` is an array of names (one column per feed slot); None or an
+    empty string means "no feed" and becomes -1.
+    """
+    arr = np.asarray(choices, dtype=object)
+    uniq, inverse = np.unique(np.where(arr == None, "", arr).astype(str), return_inverse=True)  # noqa: E711
+    try:
+        codes = np.array([ingredient_rows[u] if u else -1 for u in uniq.tolist()], dtype=np.intp)
+    except KeyError as exc:
+        raise ValueError(f"Unknown ingredient: {exc.args[0]!r}") from None
+    return codes[inverse].reshape(arr.shape)
+
+
+def base_rations(animal, milk_level, stage):
+    """
+    Returns the NDDB base ration per animal as an (n, 6) array in
+    RATION_KEYS order. Inputs may be labels or codes and are broadcast.
+    """
+    a, m, s = np.broadcast_arrays(
+        encode(animal, ANIMALS, "animal"),
+        encode(milk_level, MILK_LEVELS, "milk level"),
+        encode(stage, STAGES, "stage"),
+    )
+    a, m, s = np.atleast_1d(a.ravel(), m.ravel(), s.ravel())
+    # dry period always uses the dry ration, pregnancy its own ration
+    rows = _BASE_TABLE[a, np.where(s == _DRY_PERIOD, _DRY_MILK, m)]
+    return np.where((s == _PREGNANT)[:, None], _PREGNANT_ROW, rows)
+
+
+def yield_rations(animal, milk_yield, stage):
+    """
+    Like base_rations, but for a continuous daily milk yield in litres:
+    each ration key is interpolated linearly between the NDDB rows (0, 5
+    and 10 L) and extrapolated along the last segment up to MAX_MILK_YIELD.
+    At the tabulated yields the result equals base_rations exactly.
+    """
+    a, y, s = np.broadcast_arrays(
+        encode(animal, ANIMALS, "animal"),
+        np.asarray(milk_yield, dtype=float),
+        encode(stage, STAGES, "stage"),
+    )
+    a, y, s = np.atleast_1d(a.ravel(), y.ravel(), s.ravel())
+    if y.size and not (y.min() >= 0 and y.max() <= MAX_MILK_YIELD):
+        raise ValueError(f"Milk yield must be between 0 and {MAX_MILK_YIELD:g} L/day")
+    # dry period always uses the dry ration, pregnancy its own ration
+    y = np.where(s == _DRY_PERIOD, 0.0, y)
+    seg = np.minimum(np.searchsorted(_YIELD_KNOTS, y, side="right") - 1, len(_SEGMENT_WIDTH) - 1)
+    t = ((y - _SEGMENT_START[seg]) / _SEGMENT_WIDTH[seg])[:, None]
+    # (1 - t) * lo + t * hi hits the table rows exactly at t = 0 and t = 1
+    rows = np.maximum((1 - t) * _SEGMENT_LO[a, seg] + t * _SEGMENT_HI[a, seg], 0.0)
+    return np.where((s == _PREGNANT)[:, None], _PREGNANT_ROW, rows)
+
+
+def adjust_rations(base, body_type, stage):
+    """
+    Applies the body size scaling and stage adjustments to an (n, 6) array
+    of base rations. Feeds are rounded to 0.01 kg, mineral to 1 g.
+    """
+    base = np.atleast_2d(np.asarray(base, dtype=float))
+    n = len(base)
+    b = np.broadcast_to(encode(body_type, BODY_SIZES, "body size"), (n,))
+    s = np.broadcast_to(encode(stage, STAGES, "stage"), (n,))
+    return scale_rations(base, _BODY_FACTOR[b], _STAGE_CONC[s], _STAGE_GREEN[s])
+
+
+def scale_rations(base, body_factor, conc_factor=1.0, green_factor=1.0):
+    """
+    adjust_rations with the body size factor and stage multipliers given
+    as numbers instead of labels. `base` is (..., 6); the factors broadcast
+    against base[..., 0], so a grid of factors yields a grid of rations.
+    """
+    base = np.asarray(base, dtype=float)
+    body_factor, conc_factor, green_factor, _ = np.broadcast_arrays(
+        np.asarray(body_factor, dtype=float), conc_factor, green_factor, base[..., 0]
+    )
+
+    # scale by body size
+    ration = _round(base * body_factor[..., None], 2)
+
+    # stage-based adjustments (mild)
+    ration[..., _CONC] = _round(ration[..., _CONC] * conc_factor, 2)
+    ration[..., _GREEN] = _round(ration[..., _GREEN] * green_factor, 2)
+
+    # mineral – keep NDDB base, small body-size scaling
+    ration[..., _MINERAL] = _round(base[..., _MINERAL] * body_factor, 0)
+    return ration
+
+
+def ration_matrix(animal, milk_level, body_type, stage):
+    """Adjusted daily ration per animal as an (n, 6) array."""
+    return adjust_rations(base_rations(animal, milk_level, stage), body_type, stage)
+
+
+def yield_ration_matrix(animal, milk_yield, body_type, stage):
+    """Adjusted daily ration per animal for continuous milk yields (L/day)."""
+    return adjust_rations(yield_rations(animal, milk_yield, stage), body_type, stage)
+
+
+def nutrient_matrix(ration, feed_idx, composition):
+    """
+    Returns the (n, 8) matrix of daily nutrient totals (NUTRIENT_COLS order):
+    CP–ADF in kg/day, ME in MJ/day.
+
+    `ration` is (n, 6) or (n, 5), `feed_idx` holds the catalog row chosen for
+    each feed slot (-1 for none) and `composition` is the catalog's
+    (ingredients, 8) nutrient matrix. Unselected or zero-quantity slots
+    contribute nothing, even where the catalog has blanks.
+    """
+    ration = np.atleast_2d(np.asarray(ration, dtype=float))
+    n = len(ration)
+    feed_idx = np.broadcast_to(np.asarray(feed_idx, dtype=np.intp), (n, len(FEED_KEYS)))
+    # gathered row by row, never copied: the catalog is shared read-only
+    composition = np.asarray(composition)
+
+    totals = np.zeros((n, len(NUTRIENT_COLS)))
+    for j in range(len(FEED_KEYS)):
+        qty = ration[:, j]
+        active = (feed_idx[:, j] >= 0) & (qty > 0)
+        rows = composition[np.where(active, feed_idx[:, j], 0)]
+        # masked after the product, so blanks of unused rows do not leak
+        totals += np.where(active[:, None], qty[:, None] * rows / NUTRIENT_DIVISORS, 0.0)
+    return totals
+
+
+def blend_table(rows, weights, composition):
+    """
+    Compositions of ingredient blends as one weights x composition product.
+
+    `rows` and `weights` are (n, k): the catalog rows of each blend (-1
+    pads shorter blends) and their proportions, which need not sum to 1.
+    Returns the (n, 8) composition table; pass it to nutrient_matrix in
+    place of the catalog, with feed_idx pointing at blends. A blend with
+    no ingredients is all zeros; a blank nutrient of any ingredient in a
+    blend leaves that nutrient blank for the blend.
+    """
+    rows = np.atleast_2d(np.asarray(rows, dtype=np.intp))
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    used = (weights > 0) & (rows >= 0)
+    weights = np.where(used, weights, 0.0)
+    total = weights.sum(axis=1, keepdims=True)
+    weights = np.divide(weights, total, out=np.zeros_like(weights), where=total > 0)
+    parts = np.where(used[..., None], np.asarray(composition)[np.where(used, rows, 0)], 0.0)
+    return (weights[:, None, :] @ parts)[:, 0]
+
+
+def evaluate(animal, milk_level, body_type, stage, feed_idx, composition):
+    """Batch entry point: returns the (n, 6) ration and (n, 8) nutrient matrices."""
+    ration = ration_matrix(animal, milk_level, body_type, stage)
+    return ration, nutrient_matrix(ration, feed_idx, composition)
+
+
+# ----------------------------------------
+# SINGLE-ANIMAL HELPERS (used by the UI)
+# ----------------------------------------
+def get_base_ration(animal, milk_level, stage):
+    return dict(zip(RATION_KEYS, base_rations(animal, milk_level, stage)[0].tolist()))
+
+
+def adjust_ration(base, body_type, stage):
+    row = np.array([[base[k] for k in RATION_KEYS]], dtype=float)
+    return dict(zip(RATION_KEYS, adjust_rations(row, body_type, stage)[0].tolist()))
+
+
+@lru_cache(maxsize=1024)
+def _ration_row(animal, milk_level, body_type, stage):
+    return tuple(ration_matrix(animal, milk_level, body_type, stage)[0].tolist())
+
+
+def ration_for(animal, milk_level, body_type, stage):
+    """
+    Memoized adjust_ration(get_base_ration(...)) for one animal; returns a
+    fresh dict each call so callers may modify it.
+    """
+    return dict(zip(RATION_KEYS, _ration_row(animal, milk_level, body_type, stage)))
+
+
+def _ration_cache_stats():
+    info = _ration_row.cache_info()
+    return [(CACHE_REQUESTS, {"cache": "ration"}, info.hits + info.misses),
+            (CACHE_MISSES, {"cache": "ration"}, info.misses)]
+
+
+METRICS.add_collector(_ration_cache_stats)
+
+
+def ration_nutrients(ration, feed_idx, composition):
+    """Nutrient totals for one animal as a dict keyed by NUTRIENT_COLS."""
+    row = [ration[k] for k in FEED_KEYS]
+    return dict(zip(NUTRIENT_COLS, nutrient_matrix([row], [feed_idx], composition)[0].tolist()))
+
+
+def nutrient_from_feed(feed_row, qty_kg):
+    """
+    Returns dict of nutrient amounts per day for a given feed:
+    CP–ADF in kg/day, ME in MJ/day.
+    """
+    if feed_row is None or qty_kg <= 0:
+        return {k: 0.0 for k in NUTRIENT_COLS}
+    return {k: qty_kg * feed_row[k] / d for k, d in zip(NUTRIENT_COLS, NUTRIENT_DIVISORS.tolist())}
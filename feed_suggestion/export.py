@@ -0,0 +1,224 @@
+"""
+Spreadsheet export.
+
+The per-animal ration (one row per animal group and ingredient), the
+nutrient totals (one row per group) and the herd requirements (one row
+per ingredient) of a herd, as an Excel workbook with one sheet per table
+(openpyxl write-only mode) or as CSV (one table, or a ZIP with one file
+per table). Rows are generated group by group and written as they come,
+so the command line writes hundreds of thousands of rows to a file with
+flat memory. The page builds a download in memory when it is clicked
+(Streamlit sends a download whole, so it cannot stream one). A table
+longer than an Excel sheet continues on "<name> (2)", ... (openpyxl
+writes several times faster when lxml is installed).
+
+    python -m feed_suggestion.export herd.csv -o plan.xlsx \\
+        --feed dry="Wheat straw" --feed conc="Compound cattle feed"
+"""
+import argparse
+import csv
+import io
+import sys
+import zipfile
+
+from .catalog import blend_shares
+from .engine import FEED_KEYS, NUTRIENT_COLS, RATION_KEYS
+from .herd import group_nutrients, herd_totals
+from .report import FEED_COLUMNS
+
+MINERAL = "Mineral Mixture"
+# Groups turned into rows at a time
+CHUNK_GROUPS = 10_000
+TABLES = ["Ration", "Nutrients", "Requirements"]
+# Rows per Excel sheet, header included
+EXCEL_MAX_ROWS = 1_048_576
+MIME_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "zip": "application/zip",
+    "csv": "text/csv",
+}
+
+
+def single_group(animal, milk_level, body_type, stage, count, ration):
+    """
+    A one-group herd (the sidebar animal times `count`) in group_herd's
+    layout. Loads pandas: call it when an export is built, not on page runs.
+    """
+    import pandas as pd
+
+    return pd.DataFrame([{
+        "Animal Type": animal, "Milk Production Level": milk_level, "Body Size": body_type,
+        "Stage of Lactation": stage, "Animals": count, **{k: ration[k] for k in RATION_KEYS},
+    }])
+
+
+def _label_columns(groups):
+    return [c for c in groups.columns if c not in RATION_KEYS and c != "Animals"]
+
+
+def _chunks(groups):
+    labels = _label_columns(groups)
+    for start in range(0, len(groups), CHUNK_GROUPS):
+        part = groups.iloc[start:start + CHUNK_GROUPS]
+        yield (part, part[labels].itertuples(index=False, name=None),
+               part["Animals"].to_numpy(dtype=float).tolist(), part[RATION_KEYS].to_numpy().tolist())
+
+
+def ration_rows(groups, blends):
+    """
+    Rows of the ration table: group labels, animals, feed, ingredient,
+    kg/animal/day and kg/day for the group. `blends` maps FEED_KEYS to
+    {ingredient: proportion}; slots without an ingredient are left out.
+    """
+    shares = [blend_shares(blends.get(k) or {}) for k in FEED_KEYS]
+    mineral = RATION_KEYS.index("mineral")
+    for _, labels, counts, qty in _chunks(groups):
+        for label, n, q in zip(labels, counts, qty):
+            for j, k in enumerate(FEED_KEYS):
+                if q[j] > 0:
+                    for name, share in shares[j]:
+                        yield (*label, int(n), FEED_COLUMNS[k], name,
+                               round(q[j] * share, 3), round(q[j] * share * n, 3))
+            kg = q[mineral] / 1000
+            yield (*label, int(n), MINERAL, MINERAL, round(kg, 4), round(kg * n, 3))
+
+
+def nutrient_rows(groups, feed_idx, feed_table):
+    """Rows of the nutrient table: group labels, animals and per-animal totals (see group_nutrients)."""
+    for part, labels, counts, _ in _chunks(groups):
+        for label, n, values in zip(labels, counts, group_nutrients(part, feed_idx, feed_table).tolist()):
+            yield (*label, int(n), *(round(v, 3) for v in values))
+
+
+def requirement_rows(groups, blends):
+    """Rows of the herd requirement table: feed, ingredient and kg/day for the whole herd."""
+    herd_kg = herd_totals(groups)
+    for k in FEED_KEYS:
+        for name, share in blend_shares(blends.get(k) or {}):
+            if herd_kg[k] > 0:
+                yield FEED_COLUMNS[k], name, round(herd_kg[k] * share, 3)
+    yield MINERAL, MINERAL, round(herd_kg["mineral"] / 1000, 3)
+
+
+def plan_tables(groups, blends, catalog):
+    """
+    {table name: (header, rows)} for TABLES, with lazily generated rows.
+    `groups` is a group_herd (or single_group) frame, `blends` the feed
+    per slot as {ingredient: proportion}.
+    """
+    labels = _label_columns(groups)
+    feed_table, feed_idx = catalog.blend_table(blends)
+    units = ["MJ/day" if c == "ME" else "kg/day" for c in NUTRIENT_COLS]
+    return {
+        "Ration": ([*labels, "Animals", "Feed", "Ingredient", "kg/animal/day", "kg/day"],
+                   ration_rows(groups, blends)),
+        "Nutrients": ([*labels, "Animals", *(f"{c} ({u})" for c, u in zip(NUTRIENT_COLS, units))],
+                      nutrient_rows(groups, feed_idx, feed_table)),
+        "Requirements": (["Feed", "Ingredient", "kg/day"], requirement_rows(groups, blends)),
+    }
+
+
+# ----------------------------------------
+# WRITERS
+# ----------------------------------------
+def write_xlsx(out, tables):
+    """Write each table to its own sheet of a workbook (path or binary file)."""
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for title, (header, rows) in tables.items():
+        ws, sheets, n = None, 0, EXCEL_MAX_ROWS
+        for row in rows:
+            if n == EXCEL_MAX_ROWS:
+                sheets += 1
+                ws = wb.create_sheet(title if sheets == 1 else f"{title} ({sheets})")
+                ws.append(header)
+                n = 1
+            ws.append(row)
+            n += 1
+        if ws is None:
+            wb.create_sheet(title).append(header)
+    wb.save(out)
+
+
+def write_csv(out, header, rows):
+    """Write one table to a text file."""
+    writer = csv.writer(out)
+    writer.writerow(header)
+    writer.writerows(rows)
+
+
+def write_csv_zip(out, tables):
+    """Write each table as <name>.csv into a ZIP archive (path or binary file)."""
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, (header, rows) in tables.items():
+            with io.TextIOWrapper(zf.open(f"{name}.csv", "w"), encoding="utf-8", newline="") as f:
+                write_csv(f, header, rows)
+
+
+def export_bytes(fmt, tables):
+    """
+    The tables in format `fmt` (a MIME_TYPES key; "csv" holds the first
+    table only) as the bytes of a download.
+    """
+    f = io.BytesIO()
+    if fmt == "xlsx":
+        write_xlsx(f, tables)
+    elif fmt == "zip":
+        write_csv_zip(f, tables)
+    elif fmt == "csv":
+        header, rows = next(iter(tables.values()))
+        text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+        write_csv(text, header, rows)
+        text.detach()       # flushes, and leaves `f` open
+    else:
+        raise ValueError(f"Unknown export format: {fmt!r}")
+    return f.getvalue()
+
+
+def main(argv=None):
+    from .catalog import Catalog
+    from .herd import group_herd, read_herd
+
+    parser = argparse.ArgumentParser(description="Export a herd's rations, nutrients and requirements.")
+    parser.add_argument("register", help="CSV or Excel herd register")
+    parser.add_argument("-o", "--output", help=".xlsx, .zip (CSV per table) or .csv file (default: CSV on stdout)")
+    parser.add_argument("--table", choices=TABLES, default="Ration", help="table written to a .csv or stdout")
+    parser.add_argument("--catalog", default="Fodder and Nutrients.xlsx")
+    parser.add_argument("--feed", action="append", default=[], metavar="SLOT=INGREDIENT",
+                        help=f"ingredient per slot ({', '.join(FEED_KEYS)}); repeat a slot to blend equal parts")
+    args = parser.parse_args(argv)
+
+    blends = {}
+    for item in args.feed:
+        slot, _, name = item.partition("=")
+        if slot not in FEED_KEYS:
+            parser.error(f"unknown feed slot: {slot}")
+        blends.setdefault(slot, {})[name] = 1.0
+    catalog = Catalog.load(args.catalog)
+    unknown = sorted({name for blend in blends.values() for name in blend} - set(catalog.rows))
+    if unknown:
+        parser.error(f"unknown ingredient(s): {', '.join(unknown)}")
+    try:
+        with open(args.register, "rb") as f:
+            groups = group_herd(read_herd(f, args.register))
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+
+    out = plan_tables(groups, blends, catalog)
+    fmt = (args.output or "").rsplit(".", 1)[-1].lower()
+    if fmt == "xlsx":
+        write_xlsx(args.output, out)
+    elif fmt == "zip":
+        write_csv_zip(args.output, out)
+    elif args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            write_csv(f, *out[args.table])
+    else:
+        write_csv(sys.stdout, *out[args.table])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Herd register import.
+
+A herd register lists animals (one per row, or with a Count column) by the
+same four settings as the sidebar. A numeric milk yield column may replace
+the milk production level, in which case rations are interpolated between
+the NDDB table rows. Animals are grouped by their distinct
+configuration and rations are computed once per group, so the work scales
+with the number of groups rather than the number of animals.
+"""
+import numpy as np
+
+from .catalog import clean_columns
+from .engine import ANIMALS, BODY_SIZES, FEED_KEYS, MILK_LEVELS, RATION_KEYS, STAGES
+from .engine import nutrient_matrix, ration_matrix, yield_ration_matrix
+
+# Register column -> allowed values (same labels as the sidebar)
+HERD_COLUMNS = {
+    "Animal Type": ANIMALS,
+    "Milk Production Level": MILK_LEVELS,
+    "Body Size": BODY_SIZES,
+    "Stage of Lactation": STAGES,
+}
+# Optional column: number of animals the row stands for (default 1)
+COUNT_COLUMN = "Count"
+# Optional column: daily milk yield in litres, used instead of the level
+YIELD_COLUMN = "Milk Yield (L/day)"
+LEVEL_COLUMN = "Milk Production Level"
+
+
+def _config_columns(columns):
+    """The four configuration columns, with the yield in place of the level when given."""
+    return [YIELD_COLUMN if c == LEVEL_COLUMN and YIELD_COLUMN in columns else c for c in HERD_COLUMNS]
+
+
+def _row_numbers(index, bad):
+    """The register rows flagged in `bad` (1-based data rows), the first few of many."""
+    rows = [str(i + 1) for i in index[bad][:5]]
+    more = int(bad.sum()) - len(rows)
+    return ", ".join(rows) + (f" and {more} more" if more > 0 else "")
+
+
+def read_herd(file, filename):
+    """Read a CSV or Excel herd register into a DataFrame."""
+    import pandas as pd
+
+    if filename.lower().endswith(".csv"):
+        herd = pd.read_csv(file)
+    else:
+        herd = pd.read_excel(file)
+    herd.columns = clean_columns(herd.columns)
+    missing = [c for c in _config_columns(herd.columns) if c not in herd.columns]
+    if missing:
+        raise ValueError(f"Herd register is missing column(s): {', '.join(missing)}")
+    return herd
+
+
+def check_labels(herd):
+    """
+    Raise ValueError for settings that are not sidebar labels, naming the
+    rows (blank cells show as "(blank)"). Expects stripped text columns.
+    """
+    for col, labels in HERD_COLUMNS.items():
+        if col not in herd:
+            continue
+        bad = (~herd[col].isin(labels)).to_numpy()
+        if bad.any():
+            unknown = sorted(set(herd[col][bad].replace("", "(blank)")))
+            raise ValueError(f"Unknown {col}: {', '.join(unknown)} in data row(s) "
+                             f"{_row_numbers(herd.index, bad)} (expected one of: {', '.join(labels)})")
+
+
+def animal_counts(herd, column=COUNT_COLUMN):
+    """
+    Animals each register row stands for: its `column` count (blank counts
+    one), or 1 without that column. Anything but a whole number is a
+    ValueError naming the rows.
+    """
+    import pandas as pd
+
+    if column not in herd.columns:
+        return np.ones(len(herd), dtype=np.int64)
+    counts = pd.to_numeric(herd[column], errors="coerce")
+    bad = ((counts.isna() & herd[column].notna()) | (counts < 0)
+           | (counts.notna() & (counts % 1 != 0))).to_numpy()
+    if bad.any():
+        raise ValueError(f"{column} must be a whole number of animals in data row(s) "
+                         f"{_row_numbers(herd.index, bad)}")
+    return counts.fillna(1).to_numpy(dtype=np.int64)
+
+
+def group_herd(herd, by=()):
+    """
+    Collapse a herd register to one row per distinct configuration with an
+    "Animals" count and the per-animal ration (RATION_KEYS columns).
+    Extra text columns in `by` (blank when missing) are grouped on as well.
+    A blank or non-numeric milk yield is an error, not a dropped row, and
+    so is a count that is not a whole number of animals (blank counts one).
+    """
+    import pandas as pd
+
+    cols = _config_columns(herd.columns)
+    by = list(by)
+    herd = herd[by + cols + [c for c in [COUNT_COLUMN] if c in herd.columns]].copy()
+    for col in by:
+        herd[col] = herd[col].fillna("").astype(str).str.strip()
+    for col in cols:
+        if col == YIELD_COLUMN:
+            values = pd.to_numeric(herd[col], errors="coerce")
+            bad = values.isna().to_numpy()
+            if bad.any():
+                raise ValueError(f"{YIELD_COLUMN} is blank or not a number in data row(s) "
+                                 f"{_row_numbers(herd.index, bad)}")
+            herd[col] = values.astype(float)
+        else:
+            herd[col] = herd[col].fillna("").astype(str).str.strip()
+    check_labels(herd)
+    herd["Animals"] = animal_counts(herd)
+
+    groups = herd.groupby(by + cols, sort=False)["Animals"].sum().reset_index()
+    matrix = yield_ration_matrix if YIELD_COLUMN in cols else ration_matrix
+    groups[RATION_KEYS] = matrix(*(groups[c].to_numpy() for c in cols))
+    return groups
+
+
+def group_nutrients(groups, feed_idx, composition):
+    """Per-animal nutrient totals for each group as an (groups, 8) array."""
+    return nutrient_matrix(groups[FEED_KEYS].to_numpy(), feed_idx, composition)
+
+
+def herd_totals(groups):
+    """Herd-wide daily requirement per ration key (feeds in kg, mineral in g)."""
+    counts = groups["Animals"].to_numpy(dtype=float)
+    return dict(zip(RATION_KEYS, (counts @ groups[RATION_KEYS].to_numpy()).tolist()))
+
+
+def herd_needs(groups):
+    """Largest per-animal quantity of each ration key across the groups."""
+    return dict(zip(RATION_KEYS, np.max(groups[RATION_KEYS].to_numpy(), axis=0).tolist()))
@@ -0,0 +1,274 @@
+"""
+In-process metrics.
+
+Latency histograms and counters for the page's hot path, cheap enough to
+leave on all the time (two perf_counter calls, a bisect and a lock per
+observation). They are exposed in Prometheus text format and/or dumped
+to JSON periodically:
+
+    FEED_METRICS_PORT=9108 streamlit run nddb_feed_app.py
+        -> http://localhost:9108/metrics
+    FEED_METRICS_HOST=0.0.0.0 FEED_METRICS_PORT=9108 ...     # scraped from other hosts
+    FEED_METRICS_JSON=/var/log/feed/metrics.json FEED_METRICS_INTERVAL=60 ...
+
+Stage timings go to feed_stage_seconds{stage=...}; cache effectiveness to
+feed_cache_requests_total / feed_cache_misses_total{cache=...}; catalog
+hot reloads to feed_catalog_reloads_total{outcome=...}; the HTTP API
+(feed_suggestion.service) to feed_api_requests_total{endpoint=...,status=...}
+and feed_api_coalesced_total{endpoint=...}.
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_LOG = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds (s)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_SECONDS = "feed_stage_seconds"
+CACHE_REQUESTS = "feed_cache_requests_total"
+CACHE_MISSES = "feed_cache_misses_total"
+CATALOG_RELOADS = "feed_catalog_reloads_total"
+API_REQUESTS = "feed_api_requests_total"
+API_COALESCED = "feed_api_coalesced_total"
+
+_HELP = {
+    STAGE_SECONDS: "Time spent in each stage of a page run or report export.",
+    CACHE_REQUESTS: "Lookups per cache.",
+    CACHE_MISSES: "Lookups per cache that had to compute the result.",
+    CATALOG_RELOADS: "Background catalog reloads after a workbook change, by outcome.",
+    API_REQUESTS: "HTTP API requests by endpoint and status.",
+    API_COALESCED: "HTTP API requests answered by an identical request already in flight.",
+}
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Bucket upper bound below which a fraction q of observations fall."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, n in zip(BUCKETS + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Registry:
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add_collector(self, fn):
+        """
+        Register a callable returning (name, labels, value) counter samples,
+        read at export time (for caches that keep their own statistics).
+        """
+        self._collectors.append(fn)
+
+    def counters(self):
+        with self._lock:
+            samples = dict(self._counters)
+        for fn in self._collectors:
+            for name, labels, value in fn():
+                samples[(name, tuple(sorted(labels.items())))] = value
+        return samples
+
+    def histograms(self):
+        with self._lock:
+            return {k: (list(h.counts), h.sum, h.count, h) for k, h in self._histograms.items()}
+
+    def prometheus(self):
+        """All metrics in Prometheus text exposition format."""
+        lines, seen = [], set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), (counts, total, count, _) in sorted(self.histograms().items()):
+            header(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        for (name, labels), value in sorted(self.counters().items()):
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """All metrics as a JSON-ready dict, with p50/p90/p99 bucket estimates."""
+        stages = []
+        for (name, labels), (counts, total, count, hist) in sorted(self.histograms().items()):
+            stages.append({
+                "name": name, "labels": dict(labels), "count": count, "sum_s": total,
+                "p50_s": hist.quantile(0.5), "p90_s": hist.quantile(0.9), "p99_s": hist.quantile(0.99),
+                "buckets": dict(zip([str(b) for b in BUCKETS] + ["+Inf"], counts)),
+            })
+        counters = [{"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self.counters().items())]
+        return {"timestamp": time.time(), "histograms": stages, "counters": counters}
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+# process-wide registry shared by every session
+METRICS = Registry()
+
+
+@contextmanager
+def timed(stage):
+    """Record the duration of the block under feed_stage_seconds{stage=...}."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICS.observe(STAGE_SECONDS, time.perf_counter() - start, stage=stage)
+
+
+class Stopwatch:
+    """
+    Times consecutive sections of a script: each lap(stage) records the
+    time since the previous lap (or since creation), total(stage) the time
+    since creation.
+    """
+
+    def __init__(self):
+        self._start = self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        METRICS.observe(STAGE_SECONDS, now - self._last, stage=stage)
+        self._last = now
+
+    def total(self, stage):
+        METRICS.observe(STAGE_SECONDS, time.perf_counter() - self._start, stage=stage)
+
+
+def cache_lookup(cache, hit):
+    METRICS.inc(CACHE_REQUESTS, cache=cache)
+    if not hit:
+        METRICS.inc(CACHE_MISSES, cache=cache)
+
+
+# ----------------------------------------
+# EXPORT
+# ----------------------------------------
+_started = set()
+_start_lock = threading.Lock()
+
+
+def serve(port, host="127.0.0.1"):
+    """
+    Serve /metrics (Prometheus text) from a daemon thread. The endpoint has
+    no authentication, so it only listens on localhost unless `host` says
+    otherwise.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = METRICS.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="feed-metrics-http", daemon=True).start()
+    return server
+
+
+def dump_json(path):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(METRICS.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def dump_periodically(path, interval=60.0):
+    """
+    Write a JSON snapshot to `path` every `interval` seconds from a daemon
+    thread. Returns the thread's stop Event: set it to stop the dumps.
+    """
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                dump_json(path)
+            except Exception:
+                # a full disk or missing directory may be fixed by the next dump
+                _LOG.exception("Could not write metrics to %s", path)
+
+    threading.Thread(target=loop, name="feed-metrics-json", daemon=True).start()
+    return stop
+
+
+def start_from_env():
+    """
+    Start the exporters configured by FEED_METRICS_PORT (and
+    FEED_METRICS_HOST, default 127.0.0.1) / FEED_METRICS_JSON (and
+    FEED_METRICS_INTERVAL). Safe to call on every rerun; each exporter
+    starts once per process.
+    """
+    with _start_lock:
+        port = os.environ.get("FEED_METRICS_PORT")
+        if port and "http" not in _started:
+            serve(int(port), os.environ.get("FEED_METRICS_HOST", "127.0.0.1"))
+            _started.add("http")
+        path = os.environ.get("FEED_METRICS_JSON")
+        if path and "json" not in _started:
+            dump_periodically(path, float(os.environ.get("FEED_METRICS_INTERVAL", 60)))
+            _started.add("json")
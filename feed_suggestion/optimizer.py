@@ -0,0 +1,237 @@
+"""
+Least-cost ration optimizer.
+
+Picks one priced ingredient per feed slot, and its quantity, so that the
+ration meets nutrient targets derived from the NDDB base ration at the
+lowest cost. Candidates are first pruned by dominance in one vectorized
+pass over each category, then the choice is solved as a small
+mixed-integer linear program (scipy / HiGHS). No per-ingredient nutrient
+loop is involved.
+"""
+import warnings
+
+import numpy as np
+
+from .engine import FEED_CATEGORIES, FEED_KEYS, NUTRIENT_COLS, NUTRIENT_DIVISORS, nutrient_matrix
+
+# Each feed slot's quantity may move this far from the NDDB ration (±20%)
+QTY_TOLERANCE = 0.2
+# Fibre ceilings allow this much more NDF/ADF than the reference ration
+FIBRE_TOLERANCE = 1.1
+
+# Targets: floors for CP and ME, ceilings for NDF and ADF
+MIN_TARGETS = ["CP", "ME"]
+MAX_TARGETS = ["NDF", "ADF"]
+
+# Pairwise dominance test is done in blocks of this many candidates
+_PRUNE_BLOCK = 1024
+# Quantities are reported in steps of this many kg (the ration's own rounding)
+QTY_STEP = 0.01
+# Kept clear of each nutrient bound, so the solver's feasibility tolerance
+# never leaves a reported total just past it
+_BOUND_MARGIN = 1e-6
+
+
+def nutrient_targets(ration, catalog):
+    """
+    Targets derived from the NDDB ration: the CP and ME it supplies and its
+    NDF/ADF (with FIBRE_TOLERANCE slack) when every feed slot holds the
+    median ingredient of its category.
+    """
+    per_kg = np.zeros((len(FEED_KEYS), len(NUTRIENT_COLS)))
+    for j, key in enumerate(FEED_KEYS):
+        rows = catalog.rows_in(FEED_CATEGORIES[key])
+        if len(rows):
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)   # all-NaN columns
+                per_kg[j] = np.nan_to_num(np.nanmedian(catalog.nutrients[rows], axis=0))
+    qty = np.array([ration[k] for k in FEED_KEYS], dtype=float)
+    reference = dict(zip(NUTRIENT_COLS, (qty @ per_kg / NUTRIENT_DIVISORS).tolist()))
+
+    targets = {k: round(reference[k], 3) for k in MIN_TARGETS}
+    targets.update({k: round(reference[k] * FIBRE_TOLERANCE, 3) for k in MAX_TARGETS})
+    return targets
+
+
+def _dominated(block, other):
+    """True for rows of `block` dominated by some row of `other`."""
+    ge = (other[:, None, :] >= block[None, :, :]).all(axis=2)
+    gt = (other[:, None, :] > block[None, :, :]).any(axis=2)
+    return (ge & gt).any(axis=0)
+
+
+def _pareto_mask(values):
+    """
+    True for rows not dominated by another row, where every column of
+    `values` is "higher is better".
+
+    Rows are swept in descending lexicographic order, where every row
+    comes after the rows dominating it, so each block only needs to be
+    compared with the blocks of rows kept before it, and its survivors
+    with each other (a row dominated within the block by a dominated row
+    is dominated by a kept one as well). The temporaries stay
+    (_PRUNE_BLOCK, _PRUNE_BLOCK, columns) at any size.
+    """
+    values = np.asarray(values)
+    order = np.lexsort(values.T[::-1])[::-1]
+    keep = np.zeros(len(values), dtype=bool)
+    frontier = []
+    for start in range(0, len(values), _PRUNE_BLOCK):
+        idx = order[start:start + _PRUNE_BLOCK]
+        block = values[idx]
+        for other in frontier:
+            survivors = ~_dominated(block, other)
+            idx, block = idx[survivors], block[survivors]
+        survivors = ~_dominated(block, block)
+        idx, block = idx[survivors], block[survivors]
+        keep[idx] = True
+        if len(idx):
+            frontier.append(block)
+    return keep
+
+
+def _solve(price, per_kg, slot_of, lo, hi, bound_lo, bound_hi, steps=False):
+    """
+    The MILP choosing one candidate per slot and its quantity: `price` and
+    `per_kg` (nutrient totals per kg, bounded columns only) per candidate,
+    `slot_of` its slot, [lo, hi] the kg band per slot and [bound_lo,
+    bound_hi] the nutrient bounds. With `steps` the quantities are whole
+    QTY_STEP steps (at least the step holding lo). Returns (chosen
+    candidates, kg of each) or None when infeasible.
+    """
+    from scipy.optimize import Bounds, LinearConstraint, milp
+    from scipy.sparse import coo_array, hstack
+
+    n, s = len(price), len(lo)
+    unit = QTY_STEP if steps else 1.0
+    if steps:
+        lo = np.ceil(lo / unit - 1e-6)
+        hi = np.maximum(np.floor(hi / unit + 1e-6), lo)
+
+    # z = [x (units per candidate), y (candidate chosen)]
+    idx = np.arange(n)
+    slot_sum = coo_array((np.ones(n), (slot_of, idx)), shape=(s, n))
+    zero_sn = coo_array((s, n))
+    eye = coo_array((np.ones(n), (idx, idx)), shape=(n, n))
+    link = coo_array((-hi[slot_of], (idx, idx)), shape=(n, n))
+    constraints = [
+        # total quantity per slot within the tolerance band
+        LinearConstraint(hstack([slot_sum, zero_sn], format="csr"), lo, hi),
+        # exactly one ingredient per slot
+        LinearConstraint(hstack([zero_sn, slot_sum], format="csr"), 1, 1),
+        # only the chosen ingredient carries weight: x_i <= hi_slot * y_i
+        LinearConstraint(hstack([eye, link], format="csr"), -np.inf, 0),
+    ]
+    if per_kg.shape[1]:
+        a = np.hstack([per_kg.T * unit, np.zeros((per_kg.shape[1], n))])
+        constraints.append(LinearConstraint(a, bound_lo, bound_hi))
+
+    res = milp(
+        c=np.concatenate([price * unit, np.zeros(n)]),
+        constraints=constraints,
+        integrality=np.concatenate([np.full(n, int(steps)), np.ones(n)]),
+        bounds=Bounds(0, np.concatenate([hi[slot_of], np.ones(n)])),
+    )
+    if res.status != 0 or res.x is None:
+        return None
+    chosen = np.flatnonzero(res.x[n:] > 0.5)
+    x = res.x[chosen]
+    return chosen, (np.round(x) * unit if steps else x)
+
+
+def price_vector(catalog, prices):
+    """Per-row price array for the catalog (NaN where no price is given)."""
+    vec = np.full(len(catalog), np.nan)
+    for name, price in prices.items():
+        row = catalog.rows.get(name)
+        if row is not None and price is not None:
+            vec[row] = price
+    return vec
+
+
+def least_cost(ration, catalog, prices, targets=None, tolerance=QTY_TOLERANCE):
+    """
+    Cheapest single-ingredient-per-slot ration meeting `targets`.
+
+    `ration` is the adjusted NDDB ration (slots with 0 kg stay empty),
+    `prices` maps ingredient name -> price per kg and `targets` maps
+    nutrient -> bound (see nutrient_targets; None disables a bound).
+
+    Returns a dict with "choices", "quantities", "cost" and "nutrients",
+    or None when no priced combination meets the targets. Quantities come
+    in QTY_STEP steps that themselves meet every bound: the continuous
+    optimum's ingredients are kept and their quantities solved again on
+    the steps (over all candidates in the rare case those cannot meet the
+    bounds), and the cost and nutrients are those of the reported ration.
+    Raises ValueError when a required slot has no priced candidate.
+    """
+    targets = targets if targets is not None else nutrient_targets(ration, catalog)
+    bounds = [(k, v, +1) for k, v in targets.items() if k in MIN_TARGETS and v is not None]
+    bounds += [(k, v, -1) for k, v in targets.items() if k in MAX_TARGETS and v is not None]
+    cols = [NUTRIENT_COLS.index(k) for k, _, _ in bounds]
+    sense = np.array([s for _, _, s in bounds], dtype=float)
+
+    price = price_vector(catalog, prices) if isinstance(prices, dict) else np.asarray(prices, dtype=float)
+
+    # ---- candidates per slot: priced, nutrients known, not dominated
+    slots, cand, slot_of = [], [], []
+    for j, key in enumerate(FEED_KEYS):
+        if ration[key] <= 0:
+            continue
+        rows = catalog.rows_in(FEED_CATEGORIES[key])
+        comp = catalog.nutrients[rows][:, cols]
+        ok = np.isfinite(price[rows]) & np.isfinite(comp).all(axis=1)
+        rows, comp = rows[ok], comp[ok]
+        if not len(rows):
+            raise ValueError(f"No priced {FEED_CATEGORIES[key]} ingredient with known "
+                             f"{', '.join(k for k, _, _ in bounds)}")
+        # swapping a candidate for one that is cheaper and no worse on
+        # every bounded nutrient keeps the ration feasible, so drop it
+        rows = rows[_pareto_mask(np.column_stack([comp * sense, -price[rows]]))]
+        slots.append(j)
+        cand.append(rows)
+        slot_of.append(np.full(len(rows), len(slots) - 1))
+    if not slots:
+        return None
+    rows = np.concatenate(cand)
+    slot_of = np.concatenate(slot_of)
+    n = len(rows)
+
+    qty = np.array([ration[FEED_KEYS[j]] for j in slots], dtype=float)
+    lo, hi = qty * (1 - tolerance), qty * (1 + tolerance)
+
+    per_kg = catalog.nutrients[rows][:, cols] / NUTRIENT_DIVISORS[cols]
+    target = np.array([v for _, v, _ in bounds]) + sense * _BOUND_MARGIN
+    bound_lo, bound_hi = np.where(sense > 0, target, -np.inf), np.where(sense > 0, np.inf, target)
+
+    def solve(subset, steps):
+        solved = _solve(price[rows[subset]], per_kg[subset], slot_of[subset], lo, hi, bound_lo, bound_hi, steps)
+        return None if solved is None else (subset[solved[0]], solved[1])
+
+    everything = np.arange(n)
+    solved = solve(everything, steps=False)
+    if solved is None:
+        return None
+    # one candidate per slot: re-solving on the steps is a tiny integer program
+    solved = solve(solved[0], steps=True) or solve(everything, steps=True)
+    if solved is None:
+        return None
+
+    choices, feed_idx = {}, np.full(len(FEED_KEYS), -1)
+    quantities = {key: 0.0 for key in FEED_KEYS}
+    for i, kg in zip(*solved):
+        key = FEED_KEYS[slots[slot_of[i]]]
+        choices[key] = catalog.ingredients[rows[i]]
+        quantities[key] = round(float(kg), 2)
+        feed_idx[slots[slot_of[i]]] = rows[i]
+
+    qty_row = [quantities[k] for k in FEED_KEYS]
+    nutrients = nutrient_matrix([qty_row], feed_idx, catalog.nutrients)[0]
+    cost = float(sum(quantities[k] * price[feed_idx[j]] for j, k in enumerate(FEED_KEYS) if feed_idx[j] >= 0))
+    return {
+        "choices": choices,
+        "quantities": quantities,
+        "cost": cost,
+        "nutrients": dict(zip(NUTRIENT_COLS, nutrients.tolist())),
+    }
+
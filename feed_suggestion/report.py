@@ -0,0 +1,532 @@
+"""
+PDF feed reports.
+
+The drawing helpers lay out one report on a reportlab canvas. A report is
+described by a plain, picklable spec dict (see report_spec), so the same
+layout serves the page's "Export PDF Report" button and the batch
+generator, which renders many farms in a process pool and streams the
+PDFs into a ZIP archive.
+
+reportlab is only imported when a report is actually rendered, and
+rendered reports are kept in a process-wide LRU (REPORT_CACHE) keyed by
+their content and a catalog version, so repeat downloads are instant. The
+page passes the version of the report's own ingredients
+(Catalog.ingredient_version), so catalog edits elsewhere keep it cached.
+
+    python -m feed_suggestion.report farms.csv -o reports.zip
+"""
+import argparse
+import datetime
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .engine import FEED_KEYS, NUTRIENT_COLS, RATION_KEYS, nutrient_matrix, ration_matrix
+from .herd import HERD_COLUMNS, animal_counts, check_labels
+from .metrics import CACHE_MISSES, CACHE_REQUESTS, METRICS, timed
+from .uncertainty import BAND_LABEL
+
+# US letter in points (reportlab.lib.pagesizes.letter), kept here so the
+# module can be imported without loading reportlab
+letter = (612.0, 792.0)
+width, height = letter
+
+# Report cache bounds
+MAX_CACHE_BYTES = 64 * 1024 * 1024
+MAX_CACHE_ENTRIES = 512
+
+# Feed table rows: (label, ration key, unit)
+FEED_ROWS = [
+    ("DRY FODDER", "dry", "kg"),
+    ("GREEN FODDER", "green", "kg"),
+    ("CONCENTRATE", "conc", "kg"),
+    ("OIL CAKE", "oil", "kg"),
+    ("BRAN", "bran", "kg"),
+]
+HERD_ROWS = [
+    ("Dry Fodder", "dry"),
+    ("Green Fodder", "green"),
+    ("Concentrate", "conc"),
+    ("Oil Cake", "oil"),
+    ("Bran", "bran"),
+]
+NUTRIENT_ROWS = [
+    ("CP", "Crude Protein (Protein)", "kg/day"),
+    ("EE", "Ether Extract (Fat)", "kg/day"),
+    ("CF", "Crude Fibre (Fibre)", "kg/day"),
+    ("NFE", "NFE (Carbohydrates)", "kg/day"),
+    ("Ash", "Ash (Minerals)", "kg/day"),
+    ("NDF", "NDF (Digestible Fibre)", "kg/day"),
+    ("ADF", "ADF (Indigestible Fibre)", "kg/day"),
+    ("ME", "Metabolizable Energy", "MJ/day"),
+]
+
+# Batch input: farm name, herd size and one feed column per slot
+FARM_COLUMN = "Farm"
+ANIMALS_COLUMN = "Number of Animals"
+FEED_COLUMNS = dict(zip(FEED_KEYS, ["Dry Fodder", "Green Fodder", "Concentrate", "Oil Cake", "Bran"]))
+
+
+def draw_header_box(c, y_pos):
+    """Draw green header box"""
+    c.setFillColorRGB(0.176, 0.314, 0.086)  # Dark green
+    c.rect(40, y_pos - 35, width - 80, 50, fill=True, stroke=False)
+    c.setFillColorRGB(1, 1, 1)  # White text
+    c.setFont("Helvetica-Bold", 18)
+    c.drawString(55, y_pos - 15, "Feed Recommendation Report")
+    c.setFont("Helvetica", 10)
+    c.drawString(55, y_pos - 30, "NDDB-Based Scientific Ration Balancing for Dairy Animals")
+    return y_pos - 50
+
+
+def draw_section_box(c, y_pos, title, content_lines, bg_color=(0.941, 0.973, 0.902)):
+    """Draw a styled section box with content"""
+    box_height = 30 + (len(content_lines) * 18)
+
+    # Check if we need a new page
+    if y_pos - box_height < 50:
+        c.showPage()
+        y_pos = height - 80
+
+    # Draw background box
+    c.setFillColorRGB(*bg_color)
+    c.rect(40, y_pos - box_height, width - 80, box_height, fill=True, stroke=True)
+
+    # Draw title bar
+    c.setFillColorRGB(0.176, 0.314, 0.086)
+    c.rect(40, y_pos - 25, width - 80, 25, fill=True, stroke=False)
+    c.setFillColorRGB(1, 1, 1)
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y_pos - 18, title)
+
+    # Draw content
+    c.setFillColorRGB(0, 0, 0)
+    c.setFont("Helvetica", 10)
+    y_content = y_pos - 42
+    for line in content_lines:
+        c.drawString(55, y_content, line)
+        y_content -= 18
+
+    return y_pos - box_height - 20
+
+
+def draw_feed_table(c, y_pos, feeds_data):
+    """Draw feed recommendation table"""
+    if y_pos < 200:
+        c.showPage()
+        y_pos = height - 80
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y_pos, "Daily Feed Recommendation (Per Animal)")
+    y_pos -= 25
+
+    # Table header
+    c.setFillColorRGB(0.176, 0.314, 0.086)
+    c.rect(50, y_pos - 20, width - 100, 25, fill=True, stroke=True)
+    c.setFillColorRGB(1, 1, 1)
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(60, y_pos - 13, "Feed Type")
+    c.drawString(250, y_pos - 13, "Ingredient")
+    c.drawString(450, y_pos - 13, "Quantity")
+
+    y_pos -= 25
+    c.setFillColorRGB(0, 0, 0)
+    c.setFont("Helvetica", 10)
+
+    # Table rows
+    for i, (feed_type, ingredient, quantity, unit) in enumerate(feeds_data):
+        if quantity > 0:
+            # Alternate row colors
+            if i % 2 == 0:
+                c.setFillColorRGB(0.97, 0.97, 0.97)
+            else:
+                c.setFillColorRGB(1, 1, 1)
+            c.rect(50, y_pos - 18, width - 100, 20, fill=True, stroke=True)
+
+            c.setFillColorRGB(0, 0, 0)
+            c.drawString(60, y_pos - 12, feed_type)
+            c.drawString(250, y_pos - 12, ingredient)
+            c.drawString(450, y_pos - 12, f"{quantity:.2f} {unit}")
+            y_pos -= 20
+
+    return y_pos - 20
+
+
+def draw_nutrient_grid(c, y_pos, nutrients_data, bands=None):
+    """Draw nutrient analysis in a grid, with each nutrient's uncertainty band when given"""
+    if y_pos < 300:
+        c.showPage()
+        y_pos = height - 80
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y_pos, "Nutritional Analysis (Per Animal Per Day)")
+    y_pos -= 30
+
+    # Draw 2 columns x 4 rows grid
+    col_width = (width - 100) / 2
+    row_height = 60
+    x_start = 50
+
+    row = 0
+    col = 0
+
+    for nutrient, full_name, value, unit in nutrients_data:
+        x = x_start + (col * col_width)
+        y = y_pos - (row * row_height)
+
+        # Draw box
+        c.setFillColorRGB(0.97, 0.97, 0.97)
+        c.rect(x, y - row_height + 10, col_width - 10, row_height - 10, fill=True, stroke=True)
+
+        # Draw content
+        c.setFillColorRGB(0.4, 0.4, 0.4)
+        c.setFont("Helvetica", 8)
+        c.drawString(x + 10, y - 20, full_name)
+
+        # Value and unit on same line
+        c.setFillColorRGB(0.176, 0.314, 0.086)
+        c.setFont("Helvetica-Bold", 18)
+        value_text = f"{value:.2f}"
+        c.drawString(x + 10, y - 43, value_text)
+
+        # Calculate width of value text to position unit right after it
+        value_width = c.stringWidth(value_text, "Helvetica-Bold", 18)
+
+        c.setFillColorRGB(0.5, 0.5, 0.5)
+        c.setFont("Helvetica", 10)
+        c.drawString(x + 10 + value_width + 3, y - 43, f" {unit}")
+
+        # Uncertainty band, right-aligned on the value line
+        if bands and nutrient in bands:
+            low, high = bands[nutrient]
+            c.setFillColorRGB(0.29, 0.486, 0.173)
+            c.setFont("Helvetica", 8)
+            c.drawRightString(x + col_width - 20, y - 43, f"{BAND_LABEL} {low:.2f}–{high:.2f}")
+
+        col += 1
+        if col >= 2:
+            col = 0
+            row += 1
+
+    return y_pos - (row * row_height) - 30
+
+
+def draw_herd_summary(c, y_pos, num, herd_feeds, mineral_kg):
+    """Draw total herd requirements"""
+    # Check if we need a new page for herd summary
+    if y_pos < 200:
+        c.showPage()
+        y_pos = height - 80
+
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(50, y_pos, f"Total Herd Requirements ({num} Animals)")
+    y_pos -= 25
+
+    c.setFont("Helvetica", 10)
+    for label, feed, total in herd_feeds:
+        if feed is not None and total > 0:
+            c.setFillColorRGB(0.941, 0.973, 0.902)
+            c.rect(50, y_pos - 18, width - 100, 20, fill=True, stroke=True)
+            c.setFillColorRGB(0, 0, 0)
+            c.drawString(60, y_pos - 12, f"{label}: {feed}")
+            c.setFillColorRGB(0.176, 0.314, 0.086)
+            c.setFont("Helvetica-Bold", 10)
+            c.drawString(450, y_pos - 12, f"{total:.2f} kg/day")
+            c.setFont("Helvetica", 10)
+            c.setFillColorRGB(0, 0, 0)
+            y_pos -= 22
+
+    # Mineral mixture
+    c.setFillColorRGB(1, 0.98, 0.8)
+    c.rect(50, y_pos - 18, width - 100, 20, fill=True, stroke=True)
+    c.setFillColorRGB(0, 0, 0)
+    c.drawString(60, y_pos - 12, "Mineral Mixture")
+    c.setFillColorRGB(0.96, 0.66, 0.09)
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(450, y_pos - 12, f"{mineral_kg:.2f} kg/day")
+    return y_pos - 40
+
+
+def draw_footer(c):
+    """Draw NDDB footer"""
+    c.setFillColorRGB(0.7, 0.7, 0.7)
+    c.setFont("Helvetica", 8)
+    footer_text = "National Dairy Development Board (NDDB) Standards Applied"
+    c.drawCentredString(width/2, 40, footer_text)
+    c.drawCentredString(width/2, 28, "Base rations from NDDB TMR tables; adjustments follow NDDB feeding principles")
+
+
+def report_spec(animal, milk_level, body_type, stage, num, ration, choices, nutrients, herd_kg, farm=None,
+                bands=None):
+    """
+    Everything a report shows, as a picklable dict. `choices` maps feed
+    slot -> ingredient (None when unused), `herd_kg` maps ration key -> herd
+    total (feeds in kg, mineral in g) and `bands`, when given, maps each
+    nutrient to its uncertainty band (low, high; see uncertainty.py);
+    nutrients without one show none.
+    """
+    spec = {
+        "farm": farm,
+        "animal": animal,
+        "milk_level": milk_level,
+        "body_type": body_type,
+        "stage": stage,
+        "num": num,
+        "ration": dict(ration),
+        "choices": dict(choices),
+        "nutrients": dict(nutrients),
+        "herd_kg": dict(herd_kg),
+        # the date only: it is part of the cache key, so a cached report
+        # is re-rendered the next day rather than showing a stale time
+        "generated": datetime.date.today().strftime('%B %d, %Y'),
+    }
+    if bands:
+        spec["bands"] = {k: list(band) for k, band in bands.items()}
+    return spec
+
+
+def build_report(spec):
+    """Render a report spec to PDF bytes."""
+    from reportlab.pdfgen import canvas
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    ration, choices = spec["ration"], spec["choices"]
+
+    # Header
+    y = draw_header_box(c, height - 60)
+    y -= 30
+
+    # Generated date
+    c.setFont("Helvetica", 9)
+    c.setFillColorRGB(0.5, 0.5, 0.5)
+    c.drawString(50, y, f"Generated: {spec['generated']}")
+    y -= 30
+
+    # Animal Configuration
+    animal_info = [
+        f"Animal Type: {spec['animal']}",
+        f"Milk Production Level: {spec['milk_level']}",
+        f"Body Size: {spec['body_type']}",
+        f"Lactation Stage: {spec['stage']}",
+        f"Number of Animals: {spec['num']}"
+    ]
+    if spec.get("farm"):
+        animal_info.insert(0, f"Farm: {spec['farm']}")
+    y = draw_section_box(c, y, "■ Animal Configuration", animal_info)
+
+    # Feed Recommendation Table
+    feeds_data = [(label, choices.get(key) or "", ration[key], unit) for label, key, unit in FEED_ROWS]
+    feeds_data.append(("MINERAL SUPPLEMENT", "Mineral Mixture", ration["mineral"], "g"))
+    y = draw_feed_table(c, y, feeds_data)
+
+    # Nutritional Analysis Grid
+    nutrients_data = [(k, name, spec["nutrients"][k], unit) for k, name, unit in NUTRIENT_ROWS]
+    y = draw_nutrient_grid(c, y, nutrients_data, spec.get("bands"))
+
+    # Total Herd Requirements
+    herd_feeds = [(label, choices.get(key), spec["herd_kg"][key]) for label, key in HERD_ROWS]
+    draw_herd_summary(c, y, spec["num"], herd_feeds, spec["herd_kg"]["mineral"] / 1000)
+
+    draw_footer(c)
+    c.save()
+    return buffer.getvalue()
+
+
+# ----------------------------------------
+# REPORT CACHE
+# ----------------------------------------
+def report_key(spec, catalog_version):
+    """Cache key: everything the report shows (its date included) plus the catalog version."""
+    content = {k: v for k, v in spec.items() if k != "filename"}
+    blob = json.dumps([catalog_version, content], sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+class ReportCache:
+    """Thread-safe LRU of rendered reports, bounded by entry count and total bytes."""
+
+    def __init__(self, max_bytes=MAX_CACHE_BYTES, max_entries=MAX_CACHE_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            self._items[key] = data
+            self.nbytes += len(data)
+            while self.nbytes > self.max_bytes or len(self._items) > self.max_entries:
+                _, evicted = self._items.popitem(last=False)
+                self.nbytes -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def report(self, spec, catalog_version):
+        """PDF bytes for a spec, rendered only on a cache miss."""
+        key = report_key(spec, catalog_version)
+        data = self.get(key)
+        if data is None:
+            with timed("pdf_build"):
+                data = build_report(spec)
+            self.put(key, data)
+        return data
+
+    def stats(self, name):
+        """Counter samples for the metrics registry."""
+        return [(CACHE_REQUESTS, {"cache": name}, self.hits + self.misses),
+                (CACHE_MISSES, {"cache": name}, self.misses)]
+
+
+# shared by every session in the process
+REPORT_CACHE = ReportCache()
+METRICS.add_collector(lambda: REPORT_CACHE.stats("report"))
+
+
+# ----------------------------------------
+# BATCH GENERATION
+# ----------------------------------------
+def _slug(text):
+    return re.sub(r"[^A-Za-z0-9]+", "_", str(text)).strip("_") or "farm"
+
+
+def farm_specs(farms, catalog):
+    """
+    One report spec per farm row, as an iterator. Rations and nutrients for
+    all farms are computed in one engine call; feed columns name the
+    ingredient per slot (blank for none). The farm list is checked up front
+    (ValueError naming the rows), before any report is rendered.
+    """
+    cols = list(HERD_COLUMNS)
+    missing = [c for c in cols if c not in farms]
+    if missing:
+        raise ValueError(f"Farm list is missing column(s): {', '.join(missing)}")
+    farms = farms.copy()
+    for col in cols:
+        farms[col] = farms[col].fillna("").astype(str).str.strip()
+    check_labels(farms)
+    nums = animal_counts(farms, ANIMALS_COLUMN)
+    ration = ration_matrix(*(farms[c].to_numpy() for c in cols))
+    names = farms.reindex(columns=list(FEED_COLUMNS.values())).to_numpy(dtype=object, copy=True)
+    names[farms.reindex(columns=list(FEED_COLUMNS.values())).isna().to_numpy()] = None
+    # slots the ration does not use are left empty, as on the page
+    names[ration[:, :len(FEED_KEYS)] <= 0] = None
+    feed_idx = catalog.rows_of(names)
+    nutrients = nutrient_matrix(ration, feed_idx, catalog.nutrients)
+
+    def specs():
+        for i, row in enumerate(farms[cols].itertuples(index=False)):
+            num = int(nums[i])
+            spec = report_spec(
+                *row, num,
+                ration=dict(zip(RATION_KEYS, ration[i].tolist())),
+                choices=dict(zip(FEED_KEYS, names[i].tolist())),
+                nutrients=dict(zip(NUTRIENT_COLS, nutrients[i].tolist())),
+                herd_kg=dict(zip(RATION_KEYS, (ration[i] * num).tolist())),
+                farm=farms[FARM_COLUMN].iat[i] if FARM_COLUMN in farms else None,
+            )
+            spec["filename"] = f"{i + 1:05d}_{_slug(spec['farm'] or 'farm')}.pdf"
+            yield spec
+
+    return specs()
+
+
+def _render(spec):
+    return spec["filename"], build_report(spec)
+
+
+def write_reports_zip(specs, out, workers=None):
+    """
+    Render specs in a process pool and stream the PDFs into a ZIP archive
+    (path or binary file object). At most two reports per worker are in
+    flight, so memory stays bounded however many farms there are.
+    Returns the number of reports written.
+    """
+    workers = workers or os.cpu_count() or 1
+    count = 0
+    with ProcessPoolExecutor(workers) as pool, zipfile.ZipFile(out, "w") as zf:
+        pending = set()
+
+        def drain(return_when):
+            nonlocal count
+            done, rest = wait(pending, return_when=return_when)
+            for future in done:
+                name, data = future.result()
+                zf.writestr(name, data)
+                count += 1
+            return rest
+
+        for spec in specs:
+            if len(pending) >= 2 * workers:
+                pending = drain(FIRST_COMPLETED)
+            pending.add(pool.submit(_render, spec))
+        while pending:
+            pending = drain(FIRST_COMPLETED)
+    return count
+
+
+def main(argv=None):
+    import pandas as pd
+
+    from .catalog import Catalog, clean_columns
+
+    parser = argparse.ArgumentParser(description="Render feed reports for many farms into a ZIP archive.")
+    parser.add_argument("farms", help="CSV or Excel file, one farm per row")
+    parser.add_argument("-o", "--output", default="feed_reports.zip")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--catalog", default="Fodder and Nutrients.xlsx")
+    args = parser.parse_args(argv)
+
+    read = pd.read_csv if args.farms.lower().endswith(".csv") else pd.read_excel
+    farms = read(args.farms)
+    farms.columns = clean_columns(farms.columns)
+    # written beside the output and renamed on success, so a failed run
+    # leaves an existing archive as it was
+    tmp = f"{args.output}.{os.getpid()}.tmp"
+    try:
+        specs = farm_specs(farms, Catalog.load(args.catalog))
+        n = write_reports_zip(specs, tmp, args.jobs)
+        os.replace(tmp, args.output)
+    except ValueError as exc:
+        print(f"{args.farms}: {exc}", file=sys.stderr)
+        return 1
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    print(f"{n} reports -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+"""
+Year-long feeding schedule.
+
+Projects each animal group through the calving cycle day by day (early,
+mid and late lactation, the dry period, then the last months of pregnancy
+before calving again) and accumulates the daily herd requirement into
+monthly totals per ingredient for procurement planning.
+
+Work is cached per group. Changing one group recomputes only that group,
+and only from the date the change takes effect; changing the ingredients
+fed to a group only re-buckets its cached totals.
+
+    plan = FeedingPlan(datetime.date(2025, 4, 1))
+    plan.set_group("A", {"animal": "Cow", "milk_level": "10 L milk", "body_type": "Medium",
+                         "stage": "Mid lactation", "days_in_stage": 20, "count": 12},
+                   feeds={"dry": "Wheat straw", "green": "Maize", ...})
+    plan.monthly_by_ingredient()      # {"Wheat straw": array of kg per month, ...}
+
+Feeds name one ingredient per slot or a blend {ingredient: proportion}.
+"""
+import datetime
+
+import numpy as np
+
+from .catalog import blend_shares
+from .engine import FEED_KEYS, RATION_KEYS, STAGES, encode, ration_matrix, yield_ration_matrix
+
+# Calving cycle: stage and its length in days, in order; after the last
+# stage the animal calves and starts again with early lactation
+CYCLE = [
+    ("Early lactation", 100),
+    ("Mid lactation", 100),
+    ("Late lactation", 105),
+    ("Dry period", 30),
+    ("Pregnant (7–9 months)", 30),
+]
+CYCLE_DAYS = sum(days for _, days in CYCLE)
+PLAN_DAYS = 365
+MINERAL = "Mineral Mixture"
+
+_CYCLE_START = dict(zip([s for s, _ in CYCLE], np.cumsum([0] + [d for _, d in CYCLE[:-1]]).tolist()))
+# stage code for every day of the cycle
+_STAGE_OF_DAY = np.repeat(encode([s for s, _ in CYCLE], STAGES, "stage"), [d for _, d in CYCLE])
+_MINERAL_COL = RATION_KEYS.index("mineral")
+
+
+def cycle_position(stage, days_in_stage=0):
+    """Day of the calving cycle for an animal `days_in_stage` days into `stage`."""
+    if stage not in _CYCLE_START:
+        raise ValueError(f"Unknown stage: {stage!r}")
+    return (_CYCLE_START[stage] + int(days_in_stage)) % CYCLE_DAYS
+
+
+def group_rations(group, first, last):
+    """
+    Daily requirement of a whole group (count x per-animal ration) for plan
+    days first..last-1 as a (days, 6) array in RATION_KEYS order.
+
+    `group` has animal, body_type, count, stage and days_in_stage (the
+    group's position on the first plan day) and either milk_level or a
+    continuous milk_yield in L/day.
+    """
+    codes = np.arange(len(STAGES))
+    if "milk_yield" in group:
+        per_stage = yield_ration_matrix(group["animal"], group["milk_yield"], group["body_type"], codes)
+    else:
+        per_stage = ration_matrix(group["animal"], group["milk_level"], group["body_type"], codes)
+    day = cycle_position(group["stage"], group.get("days_in_stage", 0)) + np.arange(first, last)
+    return group["count"] * per_stage[_STAGE_OF_DAY[day % CYCLE_DAYS]]
+
+
+class FeedingPlan:
+    """Monthly feed requirements of a herd over `days` days from `start`."""
+
+    def __init__(self, start, days=PLAN_DAYS):
+        self.start = start
+        self.days = days
+        dates = [start + datetime.timedelta(days=d) for d in range(days)]
+        self.month_starts = np.array([d for d, date in enumerate(dates) if d == 0 or date.day == 1])
+        self.months = [dates[d].strftime("%Y-%m") for d in self.month_starts]
+        self._month_of_day = np.searchsorted(self.month_starts, np.arange(days), side="right") - 1
+        self.groups = {}
+        self.feeds = {}
+        self._daily = {}         # group id -> (days, 6) daily requirement
+        self._monthly = {}       # group id -> (months, 6) monthly requirement
+        self.recomputed_days = 0
+
+    def day_of(self, date):
+        """Plan day index of a date (clipped to the plan)."""
+        return min(max((date - self.start).days, 0), self.days)
+
+    def set_group(self, gid, group, feeds=None, effective=None):
+        """
+        Add or change a group. Its daily requirement is recomputed from
+        `effective` (a date; default the plan start) to the end of the
+        plan, and its monthly totals from that month on.
+        """
+        if feeds is not None:
+            self.feeds[gid] = dict(feeds)
+        group = dict(group)
+        if self.groups.get(gid) == group:
+            return
+        first = 0 if gid not in self.groups or effective is None else self.day_of(effective)
+        self.groups[gid] = group
+        daily = self._daily.setdefault(gid, np.zeros((self.days, len(RATION_KEYS))))
+        daily[first:] = group_rations(group, first, self.days)
+        self.recomputed_days += self.days - first
+
+        monthly = self._monthly.setdefault(gid, np.zeros((len(self.months), len(RATION_KEYS))))
+        m = self._month_of_day[first] if first < self.days else len(self.months)
+        if m < len(self.months):
+            monthly[m:] = np.add.reduceat(daily, self.month_starts[m:], axis=0)
+
+    def set_feeds(self, gid, feeds):
+        """Change the ingredient fed in each slot of a group; nothing is recomputed."""
+        self.feeds[gid] = dict(feeds)
+
+    def remove_group(self, gid):
+        for store in (self.groups, self.feeds, self._daily, self._monthly):
+            store.pop(gid, None)
+
+    def stage_calendar(self, gid):
+        """Stage label of a group on each plan day."""
+        group = self.groups[gid]
+        day = cycle_position(group["stage"], group.get("days_in_stage", 0)) + np.arange(self.days)
+        return [STAGES[s] for s in _STAGE_OF_DAY[day % CYCLE_DAYS]]
+
+    def daily_totals(self):
+        """Herd requirement per plan day as a (days, 6) array in RATION_KEYS order."""
+        return sum(self._daily.values(), np.zeros((self.days, len(RATION_KEYS))))
+
+    def monthly_totals(self):
+        """Herd requirement per month as a (months, 6) array in RATION_KEYS order."""
+        return sum(self._monthly.values(), np.zeros((len(self.months), len(RATION_KEYS))))
+
+    def monthly_by_ingredient(self):
+        """
+        Monthly herd requirement per ingredient in kg (mineral mixture
+        converted from g), summed over the groups feeding it. A slot's feed
+        is an ingredient name or a blend {ingredient: proportion}.
+        """
+        totals = {}
+        for gid, monthly in self._monthly.items():
+            feeds = self.feeds.get(gid, {})
+            for j, k in enumerate(FEED_KEYS):
+                feed = feeds.get(k)
+                if feed is None or not monthly[:, j].any():
+                    continue
+                for name, share in blend_shares(feed if isinstance(feed, dict) else {feed: 1.0}):
+                    totals[name] = totals.get(name, 0) + monthly[:, j] * share
+        mineral = sum((m[:, _MINERAL_COL] for m in self._monthly.values()), np.zeros(len(self.months)))
+        if mineral.any():
+            totals[MINERAL] = mineral / 1000
+        return totals
@@ -0,0 +1,426 @@
+"""
+HTTP/JSON ration service.
+
+A small asyncio server (standard library only, HTTP/1.1 with keep-alive)
+for systems that cannot drive the page: the ration, nutrient totals and
+herd totals the page computes, from the shared catalog (reloaded when
+the workbook changes).
+
+    POST /ration  {"animal": "Cow", "milk_level": "10 L milk" | "milk_yield": 7.5,
+                   "body_size": "Medium", "stage": "Mid lactation",
+                   "feeds": {"dry": "Wheat straw", "conc": {"Maize": 1, "Wheat bran": 1}}}
+        -> {"ration": {"dry": kg/day, ..., "mineral": g/day},
+            "nutrients": {"CP": kg/day, ..., "ME": MJ/day}}
+    POST /herd    {"animals": [{<animal fields>, "count": 12}, ...], "feeds": {...}}
+        -> {"animals": n, "groups": [{<settings>, "animals", "ration", "nutrients"}, ...],
+            "totals": {"dry": kg/day, ..., "mineral": g/day},
+            "requirements": [{"feed", "ingredient", "kg/day"}, ...]}
+    GET /ingredients, /health, /metrics (Prometheus text)
+
+Feeds name one ingredient per slot (FEED_KEYS) or a blend {ingredient:
+parts}; slots without one add no nutrients, and blank nutrient cells
+come back as null.
+
+Requests are normalized before anything else, so differently formatted
+copies of the same request are one request: identical requests in
+flight share one computation (coalescing), and finished responses stay
+in an LRU keyed by the request and the catalog version. Distinct ration
+requests arriving within BATCH_WINDOW are evaluated together in one
+vectorized engine call, off the event loop.
+
+    python -m feed_suggestion serve --port 8088
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+from .catalog import shared_catalog, watch_catalog
+from .engine import (
+    ANIMALS, BODY_SIZES, FEED_KEYS, MAX_MILK_YIELD, MILK_LEVELS, NUTRIENT_COLS, RATION_KEYS, STAGES,
+    blend_table, nutrient_matrix, ration_matrix, yield_ration_matrix,
+)
+from .export import requirement_rows
+from .herd import herd_totals
+from .metrics import API_COALESCED, API_REQUESTS, METRICS, cache_lookup, timed
+
+DEFAULT_PORT = 8088
+# Responses kept in the LRU
+CACHE_SIZE = 10_000
+# Longest wait for more ration requests to batch with (s), and largest batch
+BATCH_WINDOW = 0.002
+MAX_BATCH = 512
+# Largest request body (bytes)
+MAX_BODY = 1024 * 1024
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class RequestError(ValueError):
+    """A request the service cannot answer; `status` is the HTTP status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# ----------------------------------------
+# REQUESTS
+# ----------------------------------------
+def _choice(fields, name, labels):
+    value = fields.get(name)
+    if value not in labels:
+        raise RequestError(f"{name} must be one of: {', '.join(labels)}")
+    return value
+
+
+def parse_animal(fields):
+    """
+    (animal, milk level, milk yield, body size, stage) of one animal's
+    fields, with exactly one of the level and the yield set.
+    """
+    if not isinstance(fields, dict):
+        raise RequestError("an animal must be a JSON object")
+    level = milk_yield = None
+    if fields.get("milk_yield") is not None:
+        milk_yield = fields["milk_yield"]
+        if isinstance(milk_yield, bool) or not isinstance(milk_yield, (int, float)) \
+                or not 0 <= milk_yield <= MAX_MILK_YIELD:
+            raise RequestError(f"milk_yield must be between 0 and {MAX_MILK_YIELD:g} L/day")
+        milk_yield = float(milk_yield)
+    else:
+        level = _choice(fields, "milk_level", MILK_LEVELS)
+    return (_choice(fields, "animal", ANIMALS), level, milk_yield,
+            _choice(fields, "body_size", BODY_SIZES), _choice(fields, "stage", STAGES))
+
+
+def parse_feeds(feeds, catalog):
+    """The feed slots as a tuple of blends, each a sorted tuple of (ingredient, parts)."""
+    if feeds is None:
+        feeds = {}
+    if not isinstance(feeds, dict) or set(feeds) - set(FEED_KEYS):
+        raise RequestError(f"feeds must map feed slots ({', '.join(FEED_KEYS)}) to ingredients")
+    blends = []
+    for k in FEED_KEYS:
+        blend = feeds.get(k) or {}
+        if isinstance(blend, str):
+            blend = {blend: 1.0}
+        if not isinstance(blend, dict):
+            raise RequestError(f"feeds.{k} must be an ingredient name or {{ingredient: parts}}")
+        for name, parts in blend.items():
+            if name not in catalog.rows:
+                raise RequestError(f"Unknown ingredient: {name!r}")
+            if isinstance(parts, bool) or not isinstance(parts, (int, float)) or not parts >= 0:
+                raise RequestError(f"feeds.{k}: parts must be non-negative numbers")
+        blends.append(tuple(sorted((name, float(parts)) for name, parts in blend.items() if parts > 0)))
+    return tuple(blends)
+
+
+def parse_request(path, body, catalog):
+    """The hashable, normalized form of a POST body: ("ration", animal, feeds) or ("herd", animals, feeds)."""
+    try:
+        fields = json.loads(body or b"{}")
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        raise RequestError("request body must be JSON") from None
+    if not isinstance(fields, dict):
+        raise RequestError("request body must be a JSON object")
+    feeds = parse_feeds(fields.get("feeds"), catalog)
+    if path == "/ration":
+        return "ration", parse_animal(fields), feeds
+    animals = fields.get("animals")
+    if not isinstance(animals, list) or not animals:
+        raise RequestError("animals must be a non-empty list")
+    counted = {}
+    for i, a in enumerate(animals):
+        if not isinstance(a, dict):
+            raise RequestError(f"animals[{i}] must be a JSON object")
+        count = a.get("count", 1)
+        if isinstance(count, bool) or not isinstance(count, int) or count < 0:
+            raise RequestError(f"animals[{i}].count must be a non-negative integer")
+        key = parse_animal(a)
+        counted[key] = counted.get(key, 0) + count
+    return "herd", tuple(sorted(counted.items(), key=repr)), feeds
+
+
+# ----------------------------------------
+# COMPUTATION
+# ----------------------------------------
+def _blend_rows(blends, catalog):
+    """Catalog rows and weights of blends, for engine.blend_table."""
+    width = max(1, *(len(b) for b in blends))
+    rows = np.full((len(blends), width), -1, dtype=np.intp)
+    weights = np.zeros(rows.shape)
+    for i, blend in enumerate(blends):
+        if blend:
+            rows[i, :len(blend)] = [catalog.rows[name] for name, _ in blend]
+            weights[i, :len(blend)] = [parts for _, parts in blend]
+    return rows, weights
+
+
+def evaluate(animals, feeds, catalog):
+    """
+    Rations (n, 6) and nutrient totals (n, 8) for n parsed animals, each
+    with its own parsed feeds, in one vectorized pass.
+    """
+    n = len(animals)
+    animal, level, milk_yield, body, stage = (np.array(col, dtype=object) for col in zip(*animals))
+    by_yield = milk_yield != None  # noqa: E711
+    ration = np.zeros((n, len(RATION_KEYS)))
+    if (~by_yield).any():
+        ration[~by_yield] = ration_matrix(animal[~by_yield], level[~by_yield], body[~by_yield], stage[~by_yield])
+    if by_yield.any():
+        ration[by_yield] = yield_ration_matrix(animal[by_yield], milk_yield[by_yield].astype(float),
+                                               body[by_yield], stage[by_yield])
+
+    # one composition row per (animal, slot) blend, unused slots at -1
+    slots = [blend for f in feeds for blend in f]
+    table = blend_table(*_blend_rows(slots, catalog), catalog.nutrients)
+    feed_idx = np.where([bool(b) for b in slots], np.arange(len(slots)), -1).reshape(n, len(FEED_KEYS))
+    return ration, nutrient_matrix(ration, feed_idx, table)
+
+
+def _number(x):
+    return None if x != x else x
+
+
+def _ration_json(ration, nutrients):
+    return {"ration": dict(zip(RATION_KEYS, map(_number, ration))),
+            "nutrients": dict(zip(NUTRIENT_COLS, map(_number, nutrients)))}
+
+
+def ration_responses(requests, catalog):
+    """Responses (dicts) to a batch of parsed ration requests."""
+    ration, nutrients = evaluate([r[1] for r in requests], [r[2] for r in requests], catalog)
+    return [_ration_json(r, t) for r, t in zip(ration.tolist(), nutrients.tolist())]
+
+
+def herd_response(request, catalog):
+    """Response (dict) to a parsed herd request; groups are the distinct animals in the request."""
+    import pandas as pd
+
+    _, counted, feeds = request
+    animals = [a for a, _ in counted]
+    ration, nutrients = evaluate(animals, [feeds] * len(animals), catalog)
+    counts = np.array([c for _, c in counted], dtype=float)
+    groups = [{"animal": a[0], **({"milk_level": a[1]} if a[2] is None else {"milk_yield": a[2]}),
+               "body_size": a[3], "stage": a[4], "animals": int(c), **_ration_json(r, t)}
+              for a, c, r, t in zip(animals, counts, ration.tolist(), nutrients.tolist())]
+    frame = pd.DataFrame(ration, columns=RATION_KEYS)
+    frame["Animals"] = counts
+    blends = {k: dict(blend) for k, blend in zip(FEED_KEYS, feeds)}
+    return {
+        "animals": int(counts.sum()),
+        "groups": groups,
+        "totals": {k: _number(v) for k, v in herd_totals(frame).items()},
+        "requirements": [{"feed": feed, "ingredient": name, "kg/day": kg}
+                         for feed, name, kg in requirement_rows(frame, blends)],
+    }
+
+
+# ----------------------------------------
+# SERVICE
+# ----------------------------------------
+class RationService:
+    """
+    Request coalescing, ration batching and the response LRU around the
+    engine, for one catalog workbook. Methods run on the event loop.
+    """
+
+    def __init__(self, excel_path, cache_size=CACHE_SIZE, batch_window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self.excel_path = excel_path
+        self.cache_size = cache_size
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._queue = []
+        self._flush_handle = None
+        self._tasks = set()
+
+    @property
+    def catalog(self):
+        return shared_catalog(self.excel_path)
+
+    async def respond(self, path, body):
+        """Encoded JSON response to a POST to /ration or /herd."""
+        catalog = self.catalog
+        request = parse_request(path, body, catalog)
+        key = (catalog.version, request)
+        data = self._cache.get(key)
+        future = self._inflight.get(key) if data is None else None
+        # a request joining one in flight is a hit: it computes nothing
+        cache_lookup("api", data is not None or future is not None)
+        if data is not None:
+            self._cache.move_to_end(key)
+            return data
+        if future is not None:
+            METRICS.inc(API_COALESCED, endpoint=path)
+            return await asyncio.shield(future)
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            if request[0] == "ration":
+                result = await self._batched(request, catalog)
+            else:
+                result = await asyncio.to_thread(self._timed, "api_herd_compute", herd_response, request, catalog)
+            data = json.dumps(result).encode("utf-8")
+            self._cache[key] = data
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            future.set_result(data)
+            return data
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()          # retrieved: waiters, if any, get it too
+            raise
+        finally:
+            del self._inflight[key]
+
+    @staticmethod
+    def _timed(stage, fn, *args):
+        with timed(stage):
+            return fn(*args)
+
+    def _batched(self, request, catalog):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((request, catalog, future))
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._queue = self._queue, []
+        # one engine call per catalog version (a reload may land mid-window)
+        by_catalog = {}
+        for item in batch:
+            by_catalog.setdefault(id(item[1]), []).append(item)
+        for items in by_catalog.values():
+            task = asyncio.ensure_future(self._evaluate(items))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _evaluate(self, items):
+        try:
+            results = await asyncio.to_thread(self._timed, "api_ration_batch", ration_responses,
+                                              [r for r, _, _ in items], items[0][1])
+        except Exception as exc:
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        # a request cancelled while waiting has already resolved its future
+        for (_, _, future), result in zip(items, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def handle(self, method, path):
+        """(status, content type, body) for a request without a body."""
+        if path == "/health":
+            return 200, "application/json", json.dumps({"status": "ok", "catalog": self.catalog.version}).encode()
+        if path == "/ingredients":
+            by_category = {c: self.catalog.options(c) for c in self.catalog.by_category}
+            return 200, "application/json", json.dumps(by_category).encode("utf-8")
+        if path == "/metrics":
+            return 200, "text/plain; version=0.0.4; charset=utf-8", METRICS.prometheus().encode("utf-8")
+        raise RequestError(f"Not found: {path}", 404)
+
+    async def dispatch(self, method, target, body):
+        path = target.split("?", 1)[0]
+        try:
+            if path in ("/ration", "/herd"):
+                if method != "POST":
+                    raise RequestError(f"{path} takes POST", 405)
+                with timed(f"api_{path[1:]}"):
+                    data = await self.respond(path, body)
+                status, ctype = 200, "application/json"
+            elif method != "GET":
+                raise RequestError(f"{path} takes GET", 405)
+            else:
+                status, ctype, data = await self.handle(method, path)
+        except RequestError as exc:
+            status, ctype, data = exc.status, "application/json", json.dumps({"error": str(exc)}).encode("utf-8")
+        except Exception as exc:
+            status, ctype = 500, "application/json"
+            data = json.dumps({"error": f"{type(exc).__name__}: {exc}"}).encode("utf-8")
+        METRICS.inc(API_REQUESTS, endpoint=path if status != 404 else "other", status=status)
+        return status, ctype, data
+
+    async def connection(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until it closes."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, target, version = line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY:
+                    status, ctype, data = 413, "application/json", b'{"error": "request body too large"}'
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, ctype, data = await self.dispatch(method, target, body)
+                    keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {ctype}",
+                        f"Content-Length: {len(data)}"]
+                if not keep_alive:
+                    head.append("Connection: close")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def start(excel_path, host="127.0.0.1", port=DEFAULT_PORT, **options):
+    """Start serving `excel_path` on host:port; returns the asyncio server (port 0 picks a free one)."""
+    service = RationService(excel_path, **options)
+    # loaded before the first request rather than by it (pandas for herds)
+    shared_catalog(excel_path)
+    importlib.import_module("pandas")
+    watch_catalog(excel_path)
+    return await asyncio.start_server(service.connection, host, port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve rations, nutrient totals and herd totals as JSON over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--catalog", default="Fodder and Nutrients.xlsx")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="responses kept in the LRU")
+    args = parser.parse_args(argv)
+
+    async def run():
+        server = await start(args.catalog, args.host, args.port, cache_size=args.cache_size)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"serving {args.catalog} on http://{host}:{port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
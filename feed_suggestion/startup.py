@@ -0,0 +1,151 @@
+"""
+Startup profile.
+
+Measures, each in a fresh interpreter, the cold import time of the heavy
+modules, the compiled-catalog load against a full workbook parse, and
+the app script's own start (run in Streamlit bare mode, a proxy for
+time-to-first-render) together with the heavy modules it actually loads.
+
+    python -m feed_suggestion.startup                   # print the profile
+    python -m feed_suggestion.startup --record          # save it as the baseline
+    python -m feed_suggestion.startup --check           # fail on regressions
+
+--check exits non-zero when app start or catalog load got slower than the
+baseline (beyond --tolerance) or when a module that used to load lazily is
+now imported at startup. Without a recorded baseline it checks against
+DEFAULT_BUDGET: no LAZY_MODULES at startup and generous time limits, so
+it works as a regression check on any machine.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, "nddb_feed_app.py")
+EXCEL_PATH = os.path.join(ROOT, "Fodder and Nutrients.xlsx")
+BASELINE_PATH = os.path.join(ROOT, "startup_baseline.json")
+
+# Modules that should only load when the feature needing them is used
+LAZY_MODULES = ["pandas", "openpyxl", "reportlab", "scipy"]
+PROFILE_MODULES = [
+    "streamlit", "numpy", "pandas", "openpyxl", "reportlab.pdfgen.canvas", "scipy.optimize",
+    "feed_suggestion.engine", "feed_suggestion.catalog", "feed_suggestion.report",
+]
+
+# --check limits when no baseline was recorded: app start and compiled
+# catalog load times (s) and the lazy modules allowed at startup (none)
+DEFAULT_BUDGET = {"app": {"seconds": 1.5, "loaded": []}, "catalog": {"compiled_load": 0.05}}
+
+# Allowed slowdown before --check fails: factor plus absolute slack (s)
+TOLERANCE = 1.25
+SLACK = 0.05
+
+_IMPORT = """
+import json, time
+t = time.perf_counter()
+import {module}
+print(json.dumps(time.perf_counter() - t))
+"""
+
+_CATALOG = """
+import json, time
+from feed_suggestion.catalog import Catalog, compile_catalog
+path = {path!r}
+t = time.perf_counter(); compile_catalog(path); parse = time.perf_counter() - t
+t = time.perf_counter(); Catalog.load(path); load = time.perf_counter() - t
+print(json.dumps({{"workbook_compile": parse, "compiled_load": load}}))
+"""
+
+_APP = """
+import json, logging, os, runpy, sys, time
+logging.disable(logging.WARNING)
+os.chdir({root!r})
+t = time.perf_counter()
+runpy.run_path({app!r}, run_name="__main__")
+elapsed = time.perf_counter() - t
+print(json.dumps({{"seconds": elapsed,
+                  "loaded": [m for m in {lazy!r} if m in sys.modules]}}))
+"""
+
+
+def _run(code):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT, env=env)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "profile run failed")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _median(samples):
+    return round(statistics.median(samples), 4)
+
+
+def profile(repeat=3):
+    """Startup profile as a JSON-ready dict (median of `repeat` cold runs)."""
+    imports = {}
+    for module in PROFILE_MODULES:
+        try:
+            imports[module] = _median([_run(_IMPORT.format(module=module)) for _ in range(repeat)])
+        except RuntimeError:
+            imports[module] = None           # not installed here
+
+    runs = [_run(_CATALOG.format(path=EXCEL_PATH)) for _ in range(repeat)]
+    catalog = {k: _median([r[k] for r in runs]) for k in runs[0]}
+
+    runs = [_run(_APP.format(root=ROOT, app=APP_PATH, lazy=LAZY_MODULES)) for _ in range(repeat)]
+    app = {"seconds": _median([r["seconds"] for r in runs]), "loaded": runs[-1]["loaded"]}
+
+    return {"python": sys.version.split()[0], "imports": imports, "catalog": catalog, "app": app}
+
+
+def regressions(result, baseline, tolerance=TOLERANCE, slack=SLACK):
+    """List of human-readable regressions of `result` against `baseline`."""
+    found = []
+    timed = [("app start", result["app"]["seconds"], baseline["app"]["seconds"]),
+             ("compiled catalog load", result["catalog"]["compiled_load"], baseline["catalog"]["compiled_load"])]
+    for name, now, before in timed:
+        if now > before * tolerance + slack:
+            found.append(f"{name}: {now:.3f}s (baseline {before:.3f}s)")
+    for module in sorted(set(result["app"]["loaded"]) - set(baseline["app"]["loaded"])):
+        found.append(f"{module} is now imported at startup")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile app startup and check it against a baseline.")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--record", action="store_true", help="save this profile as the baseline")
+    group.add_argument("--check", action="store_true", help="compare with the baseline")
+    args = parser.parse_args(argv)
+
+    result = profile(args.repeat)
+    print(json.dumps(result, indent=2))
+
+    if args.record:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"baseline recorded -> {args.baseline}")
+    elif args.check:
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline, name = json.load(f), "baseline"
+        else:
+            print(f"no baseline at {args.baseline}; checking against the default budget", file=sys.stderr)
+            baseline, name = DEFAULT_BUDGET, "default budget"
+        found = regressions(result, baseline, args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            return 1
+        print(f"startup within {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Ingredient substitution.
+
+Finds the ingredients whose nutrient profile (NUTRIENT_COLS per kg) is
+closest to a chosen one, for when it is out of stock locally, and the
+quantity of each that keeps the ration's nutrient totals closest to the
+original.
+
+Profiles are compared on a normalized matrix built once per catalog
+version (Catalog.substitution_index): every column is standardized over
+the catalog, and the distance is the root mean squared difference over
+the columns both ingredients have values for (blank NDF/ADF/ME cells are
+common). One vectorized pass over the candidates answers a query in a
+few milliseconds at tens of thousands of ingredients.
+
+    substitutes(catalog, "Wheat straw", qty=6.0, k=5)
+    substitutes(catalog, "Maize", qty=2.5, prices=prices, cheaper=True)
+"""
+import numpy as np
+
+from .engine import NUTRIENT_COLS, NUTRIENT_DIVISORS
+from .optimizer import price_vector
+
+# Nutrient columns two ingredients must both have to be compared
+MIN_SHARED = 4
+
+
+class SubstitutionIndex:
+    """
+    Standardized nutrient profiles of a catalog's rows (blanks masked),
+    with the candidate rows of each category (`groups`, {category: rows};
+    "" for the whole catalog).
+    """
+
+    def __init__(self, nutrients, groups):
+        self.groups = {c: np.asarray(rows, dtype=np.intp) for c, rows in groups.items()}
+        nutrients = np.asarray(nutrients, dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            mean = np.nanmean(nutrients, axis=0) if len(nutrients) else np.zeros(nutrients.shape[1])
+            scale = np.nanstd(nutrients, axis=0) if len(nutrients) else np.ones(nutrients.shape[1])
+        mean = np.nan_to_num(mean)
+        scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+        present = ~np.isnan(nutrients)
+        z = np.where(present, (nutrients - mean) / scale, 0.0)
+        # masked squared distance to q over the shared columns S:
+        #   sum_S (z - q)^2 = z^2 . s - 2 z . (s q) + m . (s q^2)
+        # with m the row's mask and s the query's, so one (rows, 24) @ (24, 2)
+        # product gives every distance and shared-column count at once
+        self._profiles = np.hstack([z * z, z, present.astype(np.float64)])
+        self._z = z
+        self._present = present
+        # per-column weights of the quantity fit: 1 / (spread of a 1 kg contribution)^2
+        self.weights = (NUTRIENT_DIVISORS / scale) ** 2
+
+    def distances(self, row, candidates):
+        """
+        Profile distance from `row` to each candidate row: infinite for
+        `row` itself and for candidates sharing fewer than MIN_SHARED
+        nutrient columns with it.
+        """
+        s = self._present[row].astype(np.float64)
+        q = self._z[row]
+        zeros = np.zeros_like(s)
+        w = np.column_stack([np.concatenate([s, -2 * s * q, s * q * q]), np.concatenate([zeros, zeros, s])])
+        sq, common = (self._profiles @ w)[candidates].T
+        dist = np.sqrt(np.maximum(sq, 0.0) / np.maximum(common, 1))
+        dist[(common < MIN_SHARED - 0.5) | (candidates == row)] = np.inf
+        return dist
+
+    def nearest(self, row, candidates, k=5):
+        """The `k` candidate rows closest to `row` and their distances, nearest first."""
+        candidates = np.asarray(candidates, dtype=np.intp)
+        return _top(candidates, self.distances(row, candidates), k)
+
+    def rebalance(self, qty, composition, row, rows):
+        """
+        Quantity of each of `rows` that best replaces `qty` kg of `row`: the
+        weighted least-squares fit of its nutrient contribution to the
+        original's, over the columns both have values for.
+        """
+        a = composition[row] / NUTRIENT_DIVISORS
+        b = composition[rows] / NUTRIENT_DIVISORS
+        shared = ~np.isnan(b) & ~np.isnan(a)
+        a, b = np.where(shared, a, 0.0), np.where(shared, b, 0.0)
+        num = (b * a * self.weights).sum(axis=1)
+        den = (b * b * self.weights).sum(axis=1)
+        return np.divide(qty * num, den, out=np.zeros(len(rows)), where=den > 0).clip(min=0)
+
+
+def _top(rows, dist, k):
+    top = np.argpartition(dist, k)[:k] if len(dist) > k else np.arange(len(dist))
+    top = top[np.isfinite(dist[top])]
+    top = top[np.lexsort((rows[top], dist[top]))]
+    return rows[top], dist[top]
+
+
+def substitutes(catalog, name, qty=1.0, k=5, category=None, prices=None, cheaper=False):
+    """
+    The `k` closest substitutes for ingredient `name` fed at `qty` kg/day,
+    nearest first, as dicts with the ingredient, its category, the
+    profile distance, the re-balanced quantity (kg/day) and the resulting
+    change in each nutrient total ("delta", keyed by NUTRIENT_COLS; NaN
+    where either ingredient has a blank).
+
+    Candidates come from `category` (default: the ingredient's own; "" for
+    the whole catalog). With `prices` ({ingredient: price per kg}) only
+    priced ingredients are candidates and each result carries its price
+    and daily cost; `cheaper` further keeps those cheaper per day than the
+    original at its quantity.
+    """
+    row = catalog.rows[name]
+    if category is None:
+        category = catalog.categories[row]
+    index = catalog.substitution_index()
+    candidates = index.groups.get(category, np.zeros(0, dtype=np.intp))
+
+    price = None
+    if prices is not None:
+        price = price_vector(catalog, prices)
+        candidates = candidates[np.isfinite(price[candidates])]
+    if cheaper and (price is None or not np.isfinite(price[row])):
+        raise ValueError(f"No price for {name}")
+
+    composition = catalog.nutrients
+    if cheaper:
+        # cost is compared at the re-balanced quantity, so every candidate is fitted
+        dist = index.distances(row, candidates)
+        quantity = index.rebalance(qty, composition, row, candidates)
+        dist[price[candidates] * quantity >= price[row] * qty] = np.inf
+        rows, dist = _top(candidates, dist, k)
+    else:
+        rows, dist = index.nearest(row, candidates, k)
+    quantity = index.rebalance(qty, composition, row, rows)
+
+    original = qty * composition[row] / NUTRIENT_DIVISORS
+    results = []
+    for r, d, q in zip(rows.tolist(), dist.tolist(), quantity.tolist()):
+        delta = q * composition[r] / NUTRIENT_DIVISORS - original
+        result = {
+            "ingredient": catalog.ingredients[r],
+            "category": catalog.categories[r],
+            "distance": d,
+            "quantity": q,
+            "delta": dict(zip(NUTRIENT_COLS, delta.tolist())),
+        }
+        if price is not None:
+            result["price"] = float(price[r])
+            result["cost"] = float(price[r] * q)
+        results.append(result)
+    return results
@@ -0,0 +1,153 @@
+"""
+What-if sensitivity sweeps.
+
+Evaluates nutrient totals over the full Cartesian grid of milk yield, body
+size factor, stage multipliers (concentrate and green fodder) and
+alternative ingredients per feed slot in one batched NumPy pass. The
+stage multipliers are swept directly, so the stage itself only decides
+whether the pregnant or dry-period base ration applies.
+
+    axes, totals = sweep("Cow", "Mid lactation", yields, body, conc, green, feed_rows, composition)
+    totals.shape == (*[len(v) for v in axes.values()], 8)
+
+A heatmap needs only one nutrient over two axes: sweep_map evaluates the
+grid over blocks of milk yields and reduces each block as it goes, so a
+large grid is never held in memory at once.
+"""
+import warnings
+
+import numpy as np
+
+from .engine import FEED_KEYS, NUTRIENT_COLS, NUTRIENT_DIVISORS, scale_rations, yield_rations
+
+# Settings axes of a sweep, in grid order; the feed slots (FEED_KEYS) follow
+SETTING_AXES = ["milk_yield", "body_factor", "conc_factor", "green_factor"]
+AXIS_NAMES = {
+    "milk_yield": "Milk yield (L/day)",
+    "body_factor": "Body size factor",
+    "conc_factor": "Concentrate multiplier",
+    "green_factor": "Green fodder multiplier",
+    "dry": "Dry fodder",
+    "green": "Green fodder",
+    "conc": "Concentrate",
+    "oil": "Oil cake",
+    "bran": "Bran",
+}
+
+# Largest grid of a sweep (totals take 64 bytes per point)
+MAX_POINTS = 2_000_000
+# Grid points sweep_map evaluates per block of milk yields (~16 MB of totals)
+CHUNK_POINTS = 250_000
+
+
+def _check_points(points):
+    if points > MAX_POINTS:
+        raise ValueError(f"Sweep grid has {points:,} points (limit {MAX_POINTS:,})")
+
+
+def sweep(animal, stage, milk_yields, body_factors, conc_factors, green_factors, feed_rows, composition):
+    """
+    Nutrient totals over the grid of settings and ingredient alternatives.
+
+    `feed_rows` holds, per feed slot, the candidate catalog rows ([-1] for
+    an unused slot). Returns (axes, totals): axes maps each axis name
+    (SETTING_AXES + FEED_KEYS) to its values, totals is the grid of
+    NUTRIENT_COLS totals with one dimension per axis plus the nutrients.
+    Each point equals the single-animal calculation for its settings.
+    """
+    axes = {
+        "milk_yield": np.atleast_1d(np.asarray(milk_yields, dtype=float)),
+        "body_factor": np.atleast_1d(np.asarray(body_factors, dtype=float)),
+        "conc_factor": np.atleast_1d(np.asarray(conc_factors, dtype=float)),
+        "green_factor": np.atleast_1d(np.asarray(green_factors, dtype=float)),
+    }
+    for k, rows in zip(FEED_KEYS, feed_rows):
+        axes[k] = np.atleast_1d(np.asarray(rows, dtype=np.intp))
+    shape = tuple(len(v) for v in axes.values())
+    if not all(shape):
+        raise ValueError("Every sweep axis needs at least one value")
+    _check_points(int(np.prod(shape)))
+
+    # (yield, body, conc, green, 6) rations
+    base = yield_rations(animal, axes["milk_yield"], stage)
+    ration = scale_rations(
+        base[:, None, None, None, :],
+        axes["body_factor"][:, None, None],
+        axes["conc_factor"][:, None],
+        axes["green_factor"],
+    )
+
+    composition = np.asarray(composition)
+    settings = len(SETTING_AXES)
+    totals = np.zeros(shape + (len(NUTRIENT_COLS),))
+    for j, k in enumerate(FEED_KEYS):
+        rows = axes[k]
+        # quantities over the settings grid, spread over this slot's axis only
+        qty = ration[..., j].reshape(ration.shape[:settings] + (1,) * len(FEED_KEYS) + (1,))
+        slot = [1] * len(FEED_KEYS)
+        slot[j] = len(rows)
+        nutrients = composition[np.where(rows >= 0, rows, 0)].reshape(
+            (1,) * settings + tuple(slot) + (len(NUTRIENT_COLS),)
+        )
+        active = (qty > 0) & (rows >= 0).reshape(nutrients.shape[:-1] + (1,))
+        totals += np.where(active, qty * nutrients / NUTRIENT_DIVISORS, 0.0)
+    return axes, totals
+
+
+def reduce_sweep(axes, totals, x, y, nutrient, how="mean"):
+    """
+    2-D view of a sweep for a heatmap: `nutrient` over axes `x` and `y`,
+    with every other axis collapsed by `how` ("min", "mean" or "max",
+    ignoring blanks). Returns an array of shape (len(axes[y]), len(axes[x])).
+    """
+    if x == y:
+        raise ValueError("Pick two different sweep axes")
+    names = list(axes)
+    values = totals[..., NUTRIENT_COLS.index(nutrient)]
+    other = tuple(i for i, name in enumerate(names) if name not in (x, y))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)      # all-blank cells stay NaN
+        values = getattr(np, "nan" + how)(values, axis=other)
+    return values if names.index(y) < names.index(x) else values.T
+
+
+def sweep_map(animal, stage, milk_yields, body_factors, conc_factors, green_factors, feed_rows, composition,
+              x, y, nutrient, how="mean"):
+    """
+    reduce_sweep(*sweep(...), x, y, nutrient, how) without the full grid:
+    the sweep runs over blocks of milk yields of about CHUNK_POINTS points
+    (at least one yield each), keeping per block only the sums and counts
+    (or minima/maxima) over the collapsed axes. Returns (axes, map).
+    """
+    if x == y:
+        raise ValueError("Pick two different sweep axes")
+    yields = np.atleast_1d(np.asarray(milk_yields, dtype=float))
+    rest = int(np.prod([np.size(v) for v in (body_factors, conc_factors, green_factors, *feed_rows)]))
+    _check_points(len(yields) * rest)
+    step = max(1, CHUNK_POINTS // max(rest, 1))
+
+    stats = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)      # all-blank cells stay NaN
+        for start in range(0, max(len(yields), 1), step):
+            axes, totals = sweep(animal, stage, yields[start:start + step], body_factors, conc_factors,
+                                 green_factors, feed_rows, composition)
+            values = totals[..., NUTRIENT_COLS.index(nutrient)]
+            # milk yield (axis 0) is kept for now, whichever axes are shown
+            other = tuple(i for i, name in enumerate(axes) if name not in (x, y, "milk_yield"))
+            if how == "mean":
+                stats.append((np.nansum(values, axis=other), (~np.isnan(values)).sum(axis=other)))
+            else:
+                stats.append((getattr(np, "nan" + how)(values, axis=other),))
+        stats = [np.concatenate(parts) for parts in zip(*stats)]
+        if "milk_yield" not in (x, y):
+            combine = {"min": np.nanmin, "max": np.nanmax}.get(how, np.sum)
+            stats = [combine(part, axis=0) for part in stats]
+    if how == "mean":
+        total, count = stats
+        values = np.divide(total, count, out=np.full(total.shape, np.nan), where=count > 0)
+    else:
+        values = stats[0]
+    axes["milk_yield"] = yields
+    names = list(axes)
+    return axes, values if names.index(y) < names.index(x) else values.T
@@ -0,0 +1,108 @@
+"""
+Nutrient uncertainty.
+
+Catalog compositions are averages; the batch an animal actually eats
+varies around them. Each ingredient's nutrient columns carry a spread
+(standard deviation, same units as the catalog):
+
+  * learned from the catalog where an ingredient has several analyses
+    (duplicate rows of one name): the standard deviation across them,
+    capped at MAX_CV of the value the page uses;
+  * otherwise DEFAULT_CV times the value, typical between-batch
+    coefficients of variation of feed analyses.
+
+A ration's totals are then sampled Monte Carlo: the composition of every
+used feed slot is drawn from a normal around its value (negative draws
+clipped to zero) for all samples at once, and the totals and their
+percentiles come from one product over the draws. 10,000 samples of a
+ration take under ten milliseconds (benchmarks: nutrients.uncertainty), so
+the bands are computed on every rerun that shows them.
+
+    bands = ration_bands(catalog, ration, blends)     # {"CP": (p5, p95), ...}, blanks omitted
+"""
+import numpy as np
+
+from .engine import FEED_KEYS, NUTRIENT_COLS, NUTRIENT_DIVISORS
+
+# Between-batch coefficient of variation per nutrient
+DEFAULT_CV = {"CP": 0.15, "EE": 0.20, "CF": 0.12, "NFE": 0.08, "Ash": 0.15, "NDF": 0.10, "ADF": 0.12, "ME": 0.08}
+# Cap on a learned spread, relative to the value (duplicate rows may be different materials)
+MAX_CV = 0.5
+SAMPLES = 10_000
+# Percentiles of the band shown with each total (a 90% range)
+BANDS = (5, 95)
+BAND_LABEL = "90% range"
+# Fixed seed: the same ration shows the same band on every rerun
+SEED = 0
+
+
+def composition_spread(nutrients, ingredients, rows):
+    """
+    Standard deviation of every catalog row's nutrients, (ingredients, 8).
+    `ingredients` names each row and `rows` maps a name to the row the page
+    uses (see Catalog.rows); blanks stay blank.
+    """
+    nutrients = np.asarray(nutrients, dtype=np.float64)
+    cv = np.array([DEFAULT_CV[k] for k in NUTRIENT_COLS])
+    spread = np.abs(nutrients) * cv
+
+    analyses = {}
+    for i, name in enumerate(ingredients):
+        analyses.setdefault(name, []).append(i)
+    for name, idx in analyses.items():
+        if len(idx) < 2:
+            continue
+        values = nutrients[idx]
+        counted = (~np.isnan(values)).sum(axis=0) >= 2
+        with np.errstate(invalid="ignore"):
+            learned = np.nanstd(values[:, counted], axis=0, ddof=1)
+        row = rows[name]
+        spread[row, counted] = np.minimum(learned, MAX_CV * np.abs(nutrients[row, counted]))
+    return spread
+
+
+def blend_spread(rows, weights, spread):
+    """
+    Spread of blend compositions (see engine.blend_table), treating the
+    ingredients as independent: sqrt(sum((share * sd)^2)). Returns (n, 8).
+    """
+    rows = np.atleast_2d(np.asarray(rows, dtype=np.intp))
+    weights = np.atleast_2d(np.asarray(weights, dtype=float))
+    weights = np.where((weights > 0) & (rows >= 0), weights, 0.0)
+    total = weights.sum(axis=1, keepdims=True)
+    shares = np.divide(weights, total, out=np.zeros_like(weights), where=total > 0)
+    sd = np.where(shares[..., None] > 0, spread[np.maximum(rows, 0)], 0.0)
+    return np.sqrt(np.einsum("nk,nkj->nj", shares ** 2, sd ** 2))
+
+
+def sample_totals(qty, table, spread, samples=SAMPLES, seed=SEED):
+    """
+    (samples, 8) draws of a ration's nutrient totals. `qty` is the kg/day
+    of each row of the composition `table` (both as nutrient_matrix
+    gathers them for one animal) and `spread` its standard deviations.
+    """
+    qty = np.asarray(qty, dtype=float)
+    used = qty > 0
+    table, spread, qty = np.asarray(table)[used], np.asarray(spread)[used], qty[used]
+    # (samples, slots, nutrients) compositions, built in place
+    draws = np.random.default_rng(seed).standard_normal((samples, len(qty), len(NUTRIENT_COLS)))
+    draws *= spread
+    draws += table
+    np.maximum(draws, 0.0, out=draws)
+    return qty @ draws / NUTRIENT_DIVISORS
+
+
+def ration_bands(catalog, ration, blends, samples=SAMPLES, percentiles=BANDS, seed=SEED):
+    """
+    Percentile band of each nutrient total of one animal's ration with
+    blended feed slots (see Catalog.blend_table), as {nutrient: (low,
+    high)} in the units of ration_nutrients. A nutrient left blank in the
+    catalog for a used feed has no band and is omitted, as its point total
+    is unknown too.
+    """
+    table, idx = catalog.blend_table(blends)
+    qty = np.array([ration[k] if i >= 0 else 0.0 for k, i in zip(FEED_KEYS, idx)])
+    totals = sample_totals(qty, table, catalog.blend_spread(blends), samples, seed)
+    bands = np.percentile(totals, percentiles, axis=0)
+    known = np.isfinite(bands).all(axis=0)
+    return {k: tuple(bands[:, j].tolist()) for j, k in enumerate(NUTRIENT_COLS) if known[j]}
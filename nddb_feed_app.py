@@ -1,7 +1,32 @@
 import streamlit as st
-import pandas as pd
+
+from feed_suggestion.cards import feed_section, herd_section, nutrient_section, stylesheet_tag
+from feed_suggestion.catalog import blend_label, blend_shares, shared_catalog, watch_catalog
+from feed_suggestion.engine import (
+    ANIMALS, BODY_SIZES, FEED_CATEGORIES, FEED_KEYS, MAX_MILK_YIELD, MILK_LEVELS, NUTRIENT_COLS,
+    NUTRIENT_NAMES, RATION_KEYS, STAGES, ration_for,
+)
+from feed_suggestion.export import MIME_TYPES, export_bytes, plan_tables, single_group
+from feed_suggestion.herd import (
+    LEVEL_COLUMN, YIELD_COLUMN, group_herd, group_nutrients, herd_needs, herd_totals, read_herd,
+)
+from feed_suggestion.metrics import CACHE_MISSES, CACHE_REQUESTS, METRICS, Stopwatch, start_from_env, timed
+from feed_suggestion.optimizer import MIN_TARGETS, least_cost, nutrient_targets
+from feed_suggestion.report import FEED_COLUMNS, REPORT_CACHE, report_spec
+from feed_suggestion.schedule import CYCLE_DAYS, MINERAL as PLAN_MINERAL, FeedingPlan
+from feed_suggestion.substitute import substitutes
+from feed_suggestion.sweep import AXIS_NAMES, sweep_map
+from feed_suggestion.uncertainty import ration_bands
 
 EXCEL_PATH = "Fodder and Nutrients.xlsx"
+# Categories with more ingredients than this get a search box, and their
+# picker only lists the best matches
+PICKER_OPTIONS = 100
+
+# Stage timings and cache counters (exported when FEED_METRICS_PORT or
+# FEED_METRICS_JSON is set, see feed_suggestion/metrics.py)
+start_from_env()
+stopwatch = Stopwatch()
 
 # Page config
 st.set_page_config(
@@ -10,107 +35,29 @@ st.set_page_config(
     layout="wide"
 )
 
-# Professional Agri-based CSS
-st.markdown("""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;500;600;700&display=swap');
-    
-    * { font-family: 'Inter', sans-serif; }
-    .main { background-color: #f8f9fa; }
-
-    .agri-header {
-        background: linear-gradient(135deg, #2d5016 0%, #4a7c2c 100%);
-        padding: 2.5rem 2rem;
-        border-radius: 12px;
-        margin-bottom: 2rem;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-    }
-    .agri-title { color: white; font-size: 2.2rem; font-weight: 700; }
-    .agri-subtitle { color: #c8e6c9; font-size: 1rem; margin-top: 0.5rem; }
-
-    .section-header {
-        color: #2d5016; font-size: 1.4rem; font-weight: 600;
-        margin: 2rem 0 1rem 0; padding-bottom: 0.5rem;
-        border-bottom: 3px solid #4a7c2c;
-    }
-
-    .feed-item {
-        background: white; border: 1px solid #e0e0e0;
-        border-radius: 8px; padding: 1.2rem; margin-bottom: 0.8rem;
-        display: flex; justify-content: space-between; align-items: center;
-        transition: all 0.2s;
-    }
-    .feed-item:hover { box-shadow: 0 2px 8px rgba(74,124,44,0.15); border-color: #4a7c2c; }
-
-    .feed-label { color: #555; font-size: 0.85rem; font-weight: 500; letter-spacing: 0.5px; }
-    .feed-name { color: #2d5016; font-size: 1.1rem; font-weight: 600; }
-    .feed-quantity {
-        background: #f1f8e9; color: #2d5016; padding: 0.5rem 1.2rem;
-        border-radius: 6px; font-size: 1.3rem; font-weight: 700;
-    }
-
-    .nutrient-card {
-        background: white; border: 2px solid #4a7c2c;
-        border-radius: 10px; padding: 1.5rem; text-align: center; height: 100%;
-    }
-    .nutrient-label { color: #666; font-size: 0.9rem; }
-    .nutrient-value { color: #2d5016; font-size: 2.0rem; font-weight: 700; }
-    .nutrient-unit { color: #888; }
-
-    .herd-summary {
-        background: #f1f8e9; border-left: 4px solid #4a7c2c;
-        padding: 1rem 1.5rem; margin-bottom: 0.8rem;
-        border-radius: 4px;
-    }
-    .herd-ingredient { color: #2d5016; font-size: 1rem; font-weight: 600; }
-    .herd-amount { color: #4a7c2c; font-size: 1.2rem; font-weight: 700; float: right; }
-
-    .info-box {
-        background: #11111; border-left: 4px solid #4a7c2c;
-        padding: 1rem; border-radius: 4px; margin: 1rem 0;
-        font-size: 0.9rem;
-    }
-
-    .custom-divider {
-        height: 2px;
-        background: linear-gradient(90deg, transparent, #4a7c2c, transparent);
-        margin: 2rem 0;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-# Load and clean data
-@st.cache_data
-def load_data():
-    return pd.read_excel(EXCEL_PATH)
-
-df = load_data()
-df.columns = df.columns.str.strip().str.replace('\u200b','').str.replace('\ufeff','')
-
-# -------------------------------
-# NDDB BASE RATION VALUES (kg/day)
-# -------------------------------
-NDDB_COW = {
-    "Dry (0 L milk)": {"dry": 7, "green": 4,  "conc": 2, "oil": 0, "bran": 0, "mineral": 50},
-    "5 L milk":       {"dry": 7, "green": 4,  "conc": 4, "oil": 0, "bran": 0, "mineral": 100},
-    "10 L milk":      {"dry": 7, "green": 4,  "conc": 6, "oil": 0, "bran": 0, "mineral": 150},
-}
-
-NDDB_BUFFALO = {
-    "Dry (0 L milk)": {"dry": 6, "green": 2,  "conc": 0, "oil": 2, "bran": 0, "mineral": 75},
-    "5 L milk":       {"dry": 7, "green": 5,  "conc": 5, "oil": 0, "bran": 0, "mineral": 125},
-    "10 L milk":      {"dry": 7, "green": 10, "conc": 6, "oil": 2, "bran": 0, "mineral": 175},
-}
-
-# Pregnant animal ration from NDDB (generic cow/buffalo) – mid-points of ranges
-PREGNANT_BASE = {"dry": 4.5, "green": 17.5, "conc": 2.5, "oil": 1.0, "bran": 0.0, "mineral": 50}
-
-# Body size factors (approximate)
-BODY_FACTORS = {
-    "Small": 0.9,
-    "Medium": 1.0,
-    "Large": 1.15,
-}
+# Professional Agri-based CSS (static/feed.css): a link the browser fetches
+# once when Streamlit serves app/static, else inlined
+st.markdown(stylesheet_tag(st.get_option("server.enableStaticServing")), unsafe_allow_html=True)
+
+# Load the compiled catalog (rebuilt from the workbook only when it changes;
+# the column cleanup happens once, at compile time). Its category and
+# ingredient indexes are built once per catalog version, and one instance
+# is shared by every session in the process. Workbook edits are reloaded
+# in the background; a run keeps the catalog it started with.
+watch_catalog(EXCEL_PATH)
+catalog = shared_catalog(EXCEL_PATH)
+if st.session_state.get("catalog_version", catalog.version) != catalog.version:
+    st.toast("Feed catalog updated from the workbook.")
+st.session_state["catalog_version"] = catalog.version
+
+# Optimizer results are cached on their inputs and the version of the
+# priced ingredients, so catalog edits to other ingredients keep them
+@st.cache_data(max_entries=64)
+def cached_least_cost(ration, prices, targets, ingredients_version):
+    METRICS.inc(CACHE_MISSES, cache="optimizer")
+    return least_cost(ration, catalog, prices, targets)
+
+stopwatch.lap("load_data")
 
 # -------------------------------
 # HEADER
@@ -127,14 +74,17 @@ st.markdown("""
 # -------------------------------
 with st.sidebar:
     st.markdown("### 📋 Animal Configuration")
-    animal = st.selectbox("Animal Type", ["Cow", "Buffalo"])
-    milk_level = st.selectbox("Milk Production Level", ["Dry (0 L milk)", "5 L milk", "10 L milk"])
-    body_type = st.selectbox("Body Size", ["Small", "Medium", "Large"])
-    stage = st.selectbox(
-        "Stage of Lactation",
-        ["Early lactation", "Mid lactation", "Late lactation", "Pregnant (7–9 months)", "Dry period"],
-    )
+    animal = st.selectbox("Animal Type", ANIMALS)
+    milk_level = st.selectbox("Milk Production Level", MILK_LEVELS)
+    body_type = st.selectbox("Body Size", BODY_SIZES)
+    stage = st.selectbox("Stage of Lactation", STAGES)
     num = st.number_input("Number of Animals", 1, 500, 1)
+    herd_file = st.file_uploader(
+        "Herd Register (optional)", type=["csv", "xlsx"],
+        help="One row per animal (or a Count column) with Animal Type, Milk Production Level, "
+             "Body Size and Stage of Lactation, using the labels above. A Milk Yield (L/day) "
+             "column (0–15 L) may replace the production level.",
+    )
     st.markdown("----")
     st.markdown("""
     <div class="info-box">
@@ -144,229 +94,415 @@ with st.sidebar:
     </div>
     """, unsafe_allow_html=True)
 
+stopwatch.lap("render_sidebar")
+
 # -------------------------------
 # DETERMINE BASE RATION
 # -------------------------------
-def get_base_ration(animal, milk_level, stage):
-    if stage == "Pregnant (7–9 months)":
-        base = PREGNANT_BASE
-    elif stage == "Dry period":
-        # always use dry ration from NDDB
-        if animal == "Cow":
-            base = NDDB_COW["Dry (0 L milk)"]
-        else:
-            base = NDDB_BUFFALO["Dry (0 L milk)"]
-    else:
-        if animal == "Cow":
-            base = NDDB_COW[milk_level]
-        else:
-            base = NDDB_BUFFALO[milk_level]
-    return base.copy()
-
-def adjust_ration(base, body_type, stage):
-    ration = base.copy()
-    body_factor = BODY_FACTORS.get(body_type, 1.0)
-
-    # scale by body size
-    for k in ["dry", "green", "conc", "oil", "bran"]:
-        ration[k] = round(ration[k] * body_factor, 2)
-
-    # stage-based adjustments (mild)
-    if stage == "Early lactation":
-        ration["conc"] = round(ration["conc"] * 1.15, 2)
-        ration["green"] = round(ration["green"] * 1.05, 2)
-    elif stage == "Late lactation":
-        ration["conc"] = round(ration["conc"] * 0.9, 2)
-
-    # mineral – keep NDDB base, small body-size scaling
-    ration["mineral"] = round(base["mineral"] * body_factor, 0)
-
-    return ration
-
-base_ration = get_base_ration(animal, milk_level, stage)
-ration = adjust_ration(base_ration, body_type, stage)
+# memoized on the four settings (adjust_ration(get_base_ration(...)))
+ration = ration_for(animal, milk_level, body_type, stage)
+stopwatch.lap("ration")
+
+# Herd register: rations are computed once per distinct configuration, and
+# the grouping is cached on the file contents
+@st.cache_data(max_entries=16)
+def load_herd(data, name):
+    import io
+    METRICS.inc(CACHE_MISSES, cache="herd")
+    return group_herd(read_herd(io.BytesIO(data), name))
+
+herd_groups = None
+if herd_file is not None:
+    # every lookup is a request, failed ones too (they are not cached and
+    # count a miss each time), so misses never exceed requests
+    METRICS.inc(CACHE_REQUESTS, cache="herd")
+    try:
+        herd_groups = load_herd(herd_file.getvalue(), herd_file.name)
+    except ValueError as exc:
+        st.sidebar.error(str(exc))
+
+# feed slots needed by this animal or any animal in the herd
+needs = herd_needs(herd_groups) if herd_groups is not None else {}
+stopwatch.lap("herd_load")
 
 # -----------------------------
-# MANUAL FEED SELECTION
+# FEED SELECTION
 # -----------------------------
-# Dry fodder
-dry_list = df[df["Category"] == "Dry fodder"]["Ingredient"].unique()
-dry_choice = st.sidebar.selectbox("Select Dry Fodder", dry_list)
-dry_fodder = df[df["Ingredient"] == dry_choice].iloc[0]
-
-# Green fodder
-green_list = df[df["Category"] == "Green fodder"]["Ingredient"].unique()
-green_choice = st.sidebar.selectbox("Select Green Fodder", green_list)
-green_fodder = df[df["Ingredient"] == green_choice].iloc[0]
-
-# Concentrate
-conc_list = df[df["Category"] == "Concentrate"]["Ingredient"].unique()
-conc_choice = st.sidebar.selectbox("Select Concentrate", conc_list)
-concentrate = df[df["Ingredient"] == conc_choice].iloc[0]
-
-# Oil cake (only if required)
-if ration["oil"] > 0:
-    oil_list = df[df["Category"] == "Oil cake"]["Ingredient"].unique()
-    oil_choice = st.sidebar.selectbox("Select Oil Cake", oil_list)
-    oil_cake = df[df["Ingredient"] == oil_choice].iloc[0]
-else:
-    oil_cake = None
+feed_mode = st.sidebar.radio("Feed Selection", ["Manual", "Least-cost optimizer"])
+
+def ingredient_picker(label, category):
+    """Selectbox of a category's ingredients, searched (names and aliases) in large catalogs."""
+    options = catalog.options(category)
+    if len(options) > PICKER_OPTIONS:
+        query = st.sidebar.text_input(
+            f"Search {category.lower()}", placeholder=f"Name or local name ({len(options)} ingredients)"
+        )
+        options = catalog.search(query, category, PICKER_OPTIONS)
+        if not options:
+            st.sidebar.caption(f"No {category.lower()} matches “{query}”.")
+    return st.sidebar.selectbox(label, options)
+
+if feed_mode == "Manual":
+    # Dry fodder
+    dry_choice = ingredient_picker("Select Dry Fodder", "Dry fodder")
+
+    # Green fodder
+    green_choice = ingredient_picker("Select Green Fodder", "Green fodder")
+
+    # Concentrate
+    conc_choice = ingredient_picker("Select Concentrate", "Concentrate")
+
+    # Oil cake (only if required)
+    if ration["oil"] > 0 or needs.get("oil", 0) > 0:
+        oil_choice = ingredient_picker("Select Oil Cake", "Oil cake")
+    else:
+        oil_choice = None
+
+    # Bran (only if required)
+    if ration["bran"] > 0 or needs.get("bran", 0) > 0:
+        bran_choice = ingredient_picker("Select Bran", "Bran")
+    else:
+        bran_choice = None
 
-# Bran (only if required)
-if ration["bran"] > 0:
-    bran_list = df[df["Category"] == "Bran"]["Ingredient"].unique()
-    bran_choice = st.sidebar.selectbox("Select Bran", bran_list)
-    bran_feed = df[df["Ingredient"] == bran_choice].iloc[0]
 else:
-    bran_feed = None
+    # Least-cost optimizer: cheapest priced ingredient per slot meeting
+    # nutrient targets derived from the NDDB ration
+    import pandas as pd  # only needed here; keeps it out of the cold start
+
+    st.markdown('<div class="section-header">Least-Cost Ration Optimizer</div>', unsafe_allow_html=True)
+
+    slots = [k for k in FEED_KEYS if ration[k] > 0]
+    price_table = pd.DataFrame(
+        [(name, FEED_CATEGORIES[k]) for k in slots for name in catalog.options(FEED_CATEGORIES[k])],
+        columns=["Ingredient", "Category"],
+    )
+    price_table["Price (₹/kg)"] = float("nan")
+
+    price_file = st.file_uploader("Price list (CSV with Ingredient and Price columns)", type="csv")
+    if price_file is not None:
+        uploaded = pd.read_csv(price_file)
+        price_table["Price (₹/kg)"] = price_table["Ingredient"].map(
+            dict(zip(uploaded["Ingredient"], uploaded["Price"]))
+        )
+    with st.expander("Ingredient Prices", expanded=price_file is None):
+        price_table = st.data_editor(
+            price_table, disabled=["Ingredient", "Category"], hide_index=True, key="prices"
+        )
+
+    targets = nutrient_targets(ration, catalog)
+    for col, name in zip(st.columns(len(targets)), list(targets)):
+        bound = "min" if name in MIN_TARGETS else "max"
+        unit = "MJ/day" if name == "ME" else "kg/day"
+        targets[name] = col.number_input(
+            f"{name} {bound} ({unit})", min_value=0.0, value=float(targets[name]), format="%.3f"
+        )
+
+    prices = dict(zip(price_table["Ingredient"], price_table["Price (₹/kg)"]))
+
+    METRICS.inc(CACHE_REQUESTS, cache="optimizer")
+    try:
+        with timed("optimizer"):
+            best = cached_least_cost(ration, prices, targets,
+                                     catalog.ingredient_version(n for n, p in prices.items() if p == p))
+    except ValueError as exc:
+        st.info(f"{exc}. Enter ingredient prices to run the optimizer.")
+        st.stop()
+    if best is None:
+        st.error("No combination of the priced ingredients meets these nutrient targets.")
+        st.stop()
+
+    st.success(f"Least-cost ration: ₹{best['cost']:.2f} per animal per day")
+    dry_choice, green_choice, conc_choice, oil_choice, bran_choice = (
+        best["choices"].get(k) for k in FEED_KEYS
+    )
+    ration.update(best["quantities"])
+
+choices = dict(zip(FEED_KEYS, (dry_choice, green_choice, conc_choice, oil_choice, bran_choice)))
+# ingredient proportions per slot; a single ingredient unless blended
+blends = {k: {name: 1.0} for k, name in choices.items() if name is not None}
+if feed_mode == "Manual" and st.sidebar.checkbox(
+    "Blend ingredients",
+    help="Mix several ingredients per category in proportions, e.g. 1 part legume to 3 parts "
+         "non-legume green fodder.",
+):
+    for k, name in choices.items():
+        if name is None:
+            continue
+        extra = st.sidebar.multiselect(
+            f"Blend {FEED_COLUMNS[k]} with", [o for o in catalog.options(FEED_CATEGORIES[k]) if o != name]
+        )
+        if extra:
+            blends[k] = {
+                n: st.sidebar.number_input(f"{n.strip()} (parts)", 0.0, 100.0, 1.0, 0.5, key=f"parts_{k}_{n}")
+                for n in [name, *extra]
+            }
+
+stopwatch.lap("feed_selection")
 
 # ----------------------------------------
 # NUTRIENT CALCULATION (ALL NUTRIENTS)
 # ----------------------------------------
-NUTRIENT_COLS = ["CP", "EE", "CF", "NFE", "Ash", "NDF", "ADF", "ME"]
-
-def nutrient_from_feed(feed_row, qty_kg):
-    """
-    Returns dict of nutrient amounts per day for a given feed:
-    CP–ADF in kg/day, ME in MJ/day.
-    """
-    if feed_row is None or qty_kg <= 0:
-        return {k: 0.0 for k in NUTRIENT_COLS}
-    vals = {}
-    # percentage-based nutrients (kg)
-    for col in ["CP", "EE", "CF", "NFE", "Ash", "NDF", "ADF"]:
-        vals[col] = qty_kg * feed_row[col] / 100.0
-    # ME is MJ per kg
-    vals["ME"] = qty_kg * feed_row["ME"]
-    return vals
-
-# initialize totals
-nutrient_totals = {k: 0.0 for k in NUTRIENT_COLS}
-
-for feed_row, qty in [
-    (dry_fodder, ration["dry"]),
-    (green_fodder, ration["green"]),
-    (concentrate, ration["conc"]),
-    (oil_cake, ration["oil"]),
-    (bran_feed, ration["bran"]),
-]:
-    nf = nutrient_from_feed(feed_row, qty)
-    for k in NUTRIENT_COLS:
-        nutrient_totals[k] += nf[k]
+# composition of each slot's blend and the slot's row in that table
+# (-1 when the slot is not used)
+feed_table, feed_idx = catalog.blend_table(blends)
+stopwatch.lap("feed_lookup")
+nutrient_totals = catalog.blend_nutrients(ration, blends)
+stopwatch.lap("nutrient_totals")
+# Monte Carlo band of each total for the batch-to-batch variation of the
+# feeds (feed_suggestion.uncertainty; 10,000 samples in one pass)
+nutrient_bands = None
+if st.sidebar.checkbox(
+    "Nutrient uncertainty bands",
+    help="Range that 90% of feed batches would give, from each ingredient's spread in the catalog "
+         "(repeated analyses) or typical batch variation.",
+):
+    nutrient_bands = ration_bands(catalog, ration, blends)
+    stopwatch.lap("nutrient_bands")
 
 # ----------------------------------------
 # FEED RECOMMENDATION OUTPUT
 # ----------------------------------------
-st.markdown('<div class="section-header">Daily Feed Recommendation (Per Animal)</div>', unsafe_allow_html=True)
-
-col1, col2 = st.columns(2)
-
-def show_feed(feed, qty, label, col):
-    if feed is not None and qty > 0:
-        col.markdown(f"""
-        <div class="feed-item">
-            <div>
-                <div class="feed-label">{label}</div>
-                <div class="feed-name">{feed['Ingredient']}</div>
-            </div>
-            <div class="feed-quantity">{qty:.2f} kg</div>
-        </div>
-        """, unsafe_allow_html=True)
-
-show_feed(dry_fodder, ration["dry"], "Dry Fodder", col1)
-show_feed(green_fodder, ration["green"], "Green Fodder", col1)
-show_feed(concentrate, ration["conc"], "Concentrate", col2)
-show_feed(oil_cake, ration["oil"], "Oil Cake", col2)
-show_feed(bran_feed, ration["bran"], "Bran", col2)
-
-# Mineral mixture
-st.markdown(f"""
-<div class="feed-item" style="background:#fffde7;border-color:#f9a825;">
-    <div>
-        <div class="feed-label">Mineral Supplement</div>
-        <div class="feed-name">Mineral Mixture</div>
-    </div>
-    <div class="feed-quantity" style="background:#fff9c4;color:#f57f17;">{ration['mineral']:.0f} g</div>
-</div>
-""", unsafe_allow_html=True)
-
-NUTRIENT_NAMES = {
-    "CP": "Crude Protein (Protein)",
-    "EE": "Ether Extract (Fat)",
-    "CF": "Crude Fibre (Fibre)",
-    "NFE": "Nitrogen Free Extract (Carbohydrates)",
-    "Ash": "Ash (Minerals)",
-    "NDF": "Neutral Detergent Fibre (Digestible Fibre)",
-    "ADF": "Acid Detergent Fibre (Indigestible Fibre)",
-    "ME": "Metabolizable Energy (Energy)"
-}
-
+# one HTML payload per section, memoized on what it shows (feed_suggestion.cards)
+columns = ([], [])
+for k, column in zip(FEED_KEYS, [0, 0, 1, 1, 1]):
+    shares = blend_shares(blends.get(k, {}))
+    for feed, share in shares:
+        label = FEED_COLUMNS[k] if len(shares) == 1 else f"{FEED_COLUMNS[k]} ({share:.0%})"
+        if ration[k] * share > 0:
+            columns[column].append((label, feed, ration[k] * share))
+st.markdown(feed_section(tuple(map(tuple, columns)), ration["mineral"]), unsafe_allow_html=True)
+stopwatch.lap("render_feeds")
 
 # ----------------------------------------
 # NUTRITIONAL ANALYSIS – ALL NUTRIENTS
 # ----------------------------------------
-st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
-st.markdown('<div class="section-header">Nutritional Analysis (Per Animal Per Day)</div>', unsafe_allow_html=True)
-
-row1 = st.columns(4)
-row2 = st.columns(4)
-
-# row 1: CP, EE, CF, NFE  (kg/day)
-for col, name in zip(row1, ["CP", "EE", "CF", "NFE"]):
-    val = nutrient_totals[name]
-    label = NUTRIENT_NAMES[name]
-    col.markdown(f"""
-    <div class="nutrient-card">
-        <div class="nutrient-label">{label}</div>
-        <div class="nutrient-value">{val:.2f}</div>
-        <div class="nutrient-unit">kg/day</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-# row 2: Ash, NDF, ADF, ME
-for col, name, unit in zip(
-    row2,
-    ["Ash", "NDF", "ADF", "ME"],
-    ["kg/day", "kg/day", "kg/day", "MJ/day"]
-):
-    val = nutrient_totals[name]
-    label = NUTRIENT_NAMES[name]
-    col.markdown(f"""
-    <div class="nutrient-card">
-        <div class="nutrient-label">{label}</div>
-        <div class="nutrient-value">{val:.2f}</div>
-        <div class="nutrient-unit">{unit}</div>
-    </div>
-    """, unsafe_allow_html=True)
+# row 1: CP, EE, CF, NFE (kg/day); row 2: Ash, NDF, ADF (kg/day), ME (MJ/day)
+st.markdown(nutrient_section(tuple(
+    tuple((NUTRIENT_NAMES[name], nutrient_totals[name], "MJ/day" if name == "ME" else "kg/day",
+           *([nutrient_bands[name]] if name in (nutrient_bands or {}) else [])) for name in row)
+    for row in (NUTRIENT_COLS[:4], NUTRIENT_COLS[4:])
+)), unsafe_allow_html=True)
+stopwatch.lap("render_nutrients")
 
 # ----------------------------------------
 # HERD SUMMARY
 # ----------------------------------------
+# daily herd requirement per ration key (feeds in kg, mineral in g)
+if herd_groups is not None:
+    num = int(herd_groups["Animals"].sum())
+    herd_kg = herd_totals(herd_groups)
+else:
+    herd_kg = {k: ration[k] * num for k in RATION_KEYS}
+
+herd_lines = tuple((feed, herd_kg[k] * share) for k in FEED_KEYS
+                   for feed, share in blend_shares(blends.get(k, {})) if herd_kg[k] * share > 0)
+st.markdown(herd_section(num, herd_lines, herd_kg["mineral"] / 1000), unsafe_allow_html=True)
+
+if herd_groups is not None:
+    with st.expander(f"Herd Groups ({len(herd_groups)} distinct configurations)"):
+        group_table = herd_groups.copy()
+        group_table[["CP", "ME"]] = group_nutrients(herd_groups, feed_idx, feed_table)[:, [0, 7]]
+        st.dataframe(group_table, hide_index=True)
+stopwatch.lap("render_herd")
+
+# ----------------------------------------
+# WHAT-IF SENSITIVITY SWEEP
+# ----------------------------------------
+# A fragment, so changing the grid or the heatmap axes reruns only this
+# section. The grid is evaluated in NumPy blocks of milk yields and reduced to
+# the heatmap as it goes (feed_suggestion.sweep).
+@st.fragment
+def sweep_section(animal, stage, choices):
+    if not st.toggle("What-if sensitivity sweep"):
+        return
+    import time
+
+    import altair as alt
+    import numpy as np
+    import pandas as pd
+
+    def axis_values(col, label, lo, hi, default, steps):
+        low, high = col.slider(label, lo, hi, default)
+        n = col.number_input(f"{label} steps", 1, 50, steps)
+        return np.linspace(low, high, n) if high > low else np.array([low])
+
+    c1, c2, c3, c4 = st.columns(4)
+    yields = axis_values(c1, "Milk yield (L/day)", 0.0, MAX_MILK_YIELD, (0.0, MAX_MILK_YIELD), 7)
+    body = axis_values(c2, "Body size factor", 0.8, 1.3, (0.9, 1.15), 6)
+    conc = axis_values(c3, "Concentrate multiplier", 0.8, 1.3, (0.9, 1.15), 6)
+    green = axis_values(c4, "Green fodder multiplier", 0.9, 1.2, (1.0, 1.05), 3)
+
+    # alternative ingredients per feed slot (the current choice by default)
+    feed_rows = []
+    for col, k in zip(st.columns(len(FEED_KEYS)), FEED_KEYS):
+        options = catalog.options(FEED_CATEGORIES[k])
+        picked = col.multiselect(
+            f"{FEED_CATEGORIES[k]} alternatives", options,
+            default=[choices[k]] if choices[k] in options else [],
+        )
+        feed_rows.append(catalog.rows_of(picked) if picked else [-1])
+
+    c1, c2, c3, c4 = st.columns(4)
+    x = c1.selectbox("Heatmap columns", list(AXIS_NAMES), format_func=AXIS_NAMES.get)
+    y = c2.selectbox("Heatmap rows", list(AXIS_NAMES), index=1, format_func=AXIS_NAMES.get)
+    nutrient = c3.selectbox("Nutrient", NUTRIENT_COLS, format_func=NUTRIENT_NAMES.get)
+    how = c4.radio("Other settings", ["mean", "min", "max"], horizontal=True)
+
+    try:
+        start = time.perf_counter()
+        with timed("sweep"):
+            axes, grid = sweep_map(animal, stage, yields, body, conc, green, feed_rows, catalog.nutrients,
+                                   x, y, nutrient, how)
+        elapsed = time.perf_counter() - start
+    except ValueError as exc:
+        st.error(str(exc))
+        return
+
+    def ticks(name):
+        if name in FEED_KEYS:
+            return [catalog.ingredients[r] if r >= 0 else "—" for r in axes[name]]
+        return [f"{v:.3g}" for v in axes[name]]
+
+    table = pd.DataFrame(grid, index=ticks(y), columns=ticks(x))
+    st.caption(
+        f"{int(np.prod([len(v) for v in axes.values()])):,} grid points in {elapsed * 1000:.0f} ms; "
+        f"cells show the {how} over the other settings."
+    )
+    cells = table.rename_axis(index="row", columns="column").stack().rename("value").reset_index()
+    unit = "MJ/day" if nutrient == "ME" else "kg/day"
+    st.altair_chart(
+        alt.Chart(cells).mark_rect().encode(
+            x=alt.X("column:O", title=AXIS_NAMES[x], sort=None),
+            y=alt.Y("row:O", title=AXIS_NAMES[y], sort=None),
+            color=alt.Color("value:Q", title=f"{nutrient} ({unit})", scale=alt.Scale(scheme="greens")),
+            tooltip=["row", "column", alt.Tooltip("value:Q", format=".3f")],
+        )
+    )
+    st.dataframe(table.round(3))
+
 st.markdown('<div class="custom-divider"></div>', unsafe_allow_html=True)
-st.markdown(f'<div class="section-header">Total Feed Requirements ({num} Animals)</div>', unsafe_allow_html=True)
-
-def herd_line(feed, qty):
-    if feed is not None and qty > 0:
-        st.markdown(f"""
-        <div class="herd-summary">
-            <span class="herd-ingredient">{feed['Ingredient']}</span>
-            <span class="herd-amount">{qty * num:.2f} kg/day</span>
-        </div>
-        """, unsafe_allow_html=True)
-
-herd_line(dry_fodder, ration["dry"])
-herd_line(green_fodder, ration["green"])
-herd_line(concentrate, ration["conc"])
-herd_line(oil_cake, ration["oil"])
-herd_line(bran_feed, ration["bran"])
-
-# Mineral mixture for herd
-st.markdown(f"""
-<div class="herd-summary" style="background:#fff9c4;border-left-color:#f9a825;">
-    <span class="herd-ingredient">Mineral Mixture</span>
-    <span class="herd-amount">{(ration['mineral'] * num)/1000:.2f} kg/day</span>
-</div>
-""", unsafe_allow_html=True)
+st.markdown('<div class="section-header">What-If Analysis</div>', unsafe_allow_html=True)
+sweep_section(animal, stage, choices)
+
+# Closest alternatives by nutrient profile for an ingredient that is out of
+# stock, with the quantity that keeps the ration's totals closest
+# (feed_suggestion.substitute; priced and cheaper ones in optimizer mode).
+@st.fragment
+def substitute_section(ration, choices, prices):
+    if not st.toggle("Ingredient substitutes"):
+        return
+    import pandas as pd
+
+    slots = [k for k in FEED_KEYS if choices.get(k) and ration[k] > 0]
+    if not slots:
+        st.info("Select feeds to look for substitutes.")
+        return
+    c1, c2, c3 = st.columns(3)
+    k = c1.selectbox("Replace", slots, format_func=lambda k: f"{choices[k]} ({FEED_COLUMNS[k]})")
+    count = c2.number_input("Substitutes", 1, 20, 5)
+    any_category = c3.checkbox("Any category")
+    cheaper = prices is not None and c3.checkbox("Only cheaper per day")
+
+    try:
+        with timed("substitutes"):
+            found = substitutes(catalog, choices[k], ration[k], count, category="" if any_category else None,
+                                prices=prices, cheaper=cheaper)
+    except ValueError as exc:
+        st.info(f"{exc}. Enter its price to compare costs.")
+        return
+    if not found:
+        st.info("No ingredient with a comparable nutrient profile" + (" is cheaper." if cheaper else "."))
+        return
+    table = pd.DataFrame([{
+        "Ingredient": r["ingredient"], "Category": r["category"], "Distance": r["distance"],
+        "kg/day": r["quantity"], **({"Cost (₹/day)": r["cost"]} if "cost" in r else {}),
+        **{f"Δ {n}": v for n, v in r["delta"].items()},
+    } for r in found])
+    st.caption(f"Instead of {ration[k]:.2f} kg/day of {choices[k]}; Δ is the change in the ration's totals.")
+    st.dataframe(table.round(3), hide_index=True)
+
+substitute_section(ration, choices, prices if feed_mode != "Manual" else None)
+stopwatch.lap("render_sweep")
+
+# ----------------------------------------
+# 12-MONTH FEEDING PLAN
+# ----------------------------------------
+# The plan lives in the session and caches each group's daily requirement:
+# editing one group recomputes only that group, from the date the edit
+# takes effect, and changing feeds only re-buckets the cached totals by
+# ingredient.
+@st.fragment
+def plan_section(rows, feeds):
+    if not st.toggle("12-month feeding plan"):
+        return
+    import datetime
+
+    import pandas as pd
+
+    c1, c2 = st.columns(2)
+    start = c1.date_input("Plan start", datetime.date.today().replace(day=1))
+    plan = st.session_state.get("feeding_plan")
+    if plan is None or plan.start != start:
+        plan = st.session_state["feeding_plan"] = FeedingPlan(start)
+    effective = c2.date_input(
+        "Edits take effect", start, min_value=start, max_value=start + datetime.timedelta(days=plan.days - 1),
+        help="Changes to a group apply from this date on; the plan keeps its earlier days as they were.",
+    )
+
+    editable = ["Animals", "Days into Stage"]
+    table = pd.DataFrame(rows)
+    table["Days into Stage"] = 0
+    table = st.data_editor(
+        table, hide_index=True, key="plan_groups",
+        disabled=[c for c in table.columns if c not in editable],
+        column_config={"Days into Stage": st.column_config.NumberColumn(min_value=0, max_value=CYCLE_DAYS - 1)},
+    )
+    before, seen = plan.recomputed_days, set()
+    for row in table.to_dict("records"):
+        gid = tuple(v for c, v in row.items() if c not in editable)
+        seen.add(gid)
+        group = {
+            "animal": row["Animal Type"], "body_type": row["Body Size"], "stage": row["Stage of Lactation"],
+            "days_in_stage": int(row["Days into Stage"]), "count": int(row["Animals"]),
+        }
+        if YIELD_COLUMN in row:
+            group["milk_yield"] = float(row[YIELD_COLUMN])
+        else:
+            group["milk_level"] = row[LEVEL_COLUMN]
+        plan.set_feeds(gid, feeds)
+        plan.set_group(gid, group, effective=effective)
+    for gid in set(plan.groups) - seen:
+        plan.remove_group(gid)
+
+    view = st.radio("Requirements", ["Monthly by ingredient", "Monthly by feed", "Daily by feed"], horizontal=True)
+    if view == "Monthly by ingredient":
+        totals = pd.DataFrame(plan.monthly_by_ingredient(), index=plan.months).rename_axis("Month")
+    else:
+        monthly = view.startswith("Monthly")
+        values = plan.monthly_totals() if monthly else plan.daily_totals()
+        totals = pd.DataFrame(values[:, :len(FEED_KEYS)], columns=[FEED_COLUMNS[k] for k in FEED_KEYS],
+                              index=plan.months if monthly else pd.date_range(start, periods=plan.days))
+        totals[PLAN_MINERAL] = values[:, RATION_KEYS.index("mineral")] / 1000
+        totals = totals.loc[:, totals.any()].rename_axis("Month" if monthly else "Day")
+    unit = "kg per day" if view == "Daily by feed" else "kg per month"
+    st.caption(f"{plan.recomputed_days - before:,} group-days recomputed. Requirements in {unit}.")
+    st.bar_chart(totals)
+    st.dataframe(totals.round(1))
+
+    with st.expander("Stage of each group on the first of each month"):
+        st.dataframe(pd.DataFrame(
+            {" / ".join(map(str, gid)): [calendar[d] for d in plan.month_starts]
+             for gid, calendar in ((gid, plan.stage_calendar(gid)) for gid in plan.groups)},
+            index=plan.months,
+        ).rename_axis("Month"))
+
+if herd_groups is not None:
+    plan_rows = herd_groups.drop(columns=RATION_KEYS).to_dict("records")
+else:
+    plan_rows = [{"Animal Type": animal, LEVEL_COLUMN: milk_level, "Body Size": body_type,
+                  "Stage of Lactation": stage, "Animals": num}]
+plan_section(plan_rows, blends)
+stopwatch.lap("render_plan")
 
 # ----------------------------------------
 # FOOTER
@@ -379,256 +515,65 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import inch
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-import datetime
-import io
-
 st.markdown("<div class='custom-divider'></div>", unsafe_allow_html=True)
 st.markdown("## 📄 Download Feed Report")
 
-# Button to generate report
-if st.button("Export PDF Report"):
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    
-    def draw_header_box(c, y_pos):
-        """Draw green header box"""
-        c.setFillColorRGB(0.176, 0.314, 0.086)  # Dark green
-        c.rect(40, y_pos - 35, width - 80, 50, fill=True, stroke=False)
-        c.setFillColorRGB(1, 1, 1)  # White text
-        c.setFont("Helvetica-Bold", 18)
-        c.drawString(55, y_pos - 15, "Feed Recommendation Report")
-        c.setFont("Helvetica", 10)
-        c.drawString(55, y_pos - 30, "NDDB-Based Scientific Ration Balancing for Dairy Animals")
-        return y_pos - 50
-    
-    def draw_section_box(c, y_pos, title, content_lines, bg_color=(0.941, 0.973, 0.902)):
-        """Draw a styled section box with content"""
-        box_height = 30 + (len(content_lines) * 18)
-        
-        # Check if we need a new page
-        if y_pos - box_height < 50:
-            c.showPage()
-            y_pos = height - 80
-        
-        # Draw background box
-        c.setFillColorRGB(*bg_color)
-        c.rect(40, y_pos - box_height, width - 80, box_height, fill=True, stroke=True)
-        
-        # Draw title bar
-        c.setFillColorRGB(0.176, 0.314, 0.086)
-        c.rect(40, y_pos - 25, width - 80, 25, fill=True, stroke=False)
-        c.setFillColorRGB(1, 1, 1)
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(50, y_pos - 18, title)
-        
-        # Draw content
-        c.setFillColorRGB(0, 0, 0)
-        c.setFont("Helvetica", 10)
-        y_content = y_pos - 42
-        for line in content_lines:
-            c.drawString(55, y_content, line)
-            y_content -= 18
-        
-        return y_pos - box_height - 20
-    
-    def draw_feed_table(c, y_pos, feeds_data):
-        """Draw feed recommendation table"""
-        if y_pos < 200:
-            c.showPage()
-            y_pos = height - 80
-        
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(50, y_pos, "Daily Feed Recommendation (Per Animal)")
-        y_pos -= 25
-        
-        # Table header
-        c.setFillColorRGB(0.176, 0.314, 0.086)
-        c.rect(50, y_pos - 20, width - 100, 25, fill=True, stroke=True)
-        c.setFillColorRGB(1, 1, 1)
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(60, y_pos - 13, "Feed Type")
-        c.drawString(250, y_pos - 13, "Ingredient")
-        c.drawString(450, y_pos - 13, "Quantity")
-        
-        y_pos -= 25
-        c.setFillColorRGB(0, 0, 0)
-        c.setFont("Helvetica", 10)
-        
-        # Table rows
-        for i, (feed_type, ingredient, quantity, unit) in enumerate(feeds_data):
-            if quantity > 0:
-                # Alternate row colors
-                if i % 2 == 0:
-                    c.setFillColorRGB(0.97, 0.97, 0.97)
-                else:
-                    c.setFillColorRGB(1, 1, 1)
-                c.rect(50, y_pos - 18, width - 100, 20, fill=True, stroke=True)
-                
-                c.setFillColorRGB(0, 0, 0)
-                c.drawString(60, y_pos - 12, feed_type)
-                c.drawString(250, y_pos - 12, ingredient)
-                c.drawString(450, y_pos - 12, f"{quantity:.2f} {unit}")
-                y_pos -= 20
-        
-        return y_pos - 20
-    
-    def draw_nutrient_grid(c, y_pos, nutrients_data):
-        """Draw nutrient analysis in a grid"""
-        if y_pos < 300:
-            c.showPage()
-            y_pos = height - 80
-        
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(50, y_pos, "Nutritional Analysis (Per Animal Per Day)")
-        y_pos -= 30
-        
-        # Draw 2 columns x 4 rows grid
-        col_width = (width - 100) / 2
-        row_height = 60
-        x_start = 50
-        
-        row = 0
-        col = 0
-        
-        for nutrient, full_name, value, unit in nutrients_data:
-            x = x_start + (col * col_width)
-            y = y_pos - (row * row_height)
-            
-            # Draw box
-            c.setFillColorRGB(0.97, 0.97, 0.97)
-            c.rect(x, y - row_height + 10, col_width - 10, row_height - 10, fill=True, stroke=True)
-            
-            # Draw content
-            c.setFillColorRGB(0.4, 0.4, 0.4)
-            c.setFont("Helvetica", 8)
-            c.drawString(x + 10, y - 20, full_name)
-            
-            # Value and unit on same line
-            c.setFillColorRGB(0.176, 0.314, 0.086)
-            c.setFont("Helvetica-Bold", 18)
-            value_text = f"{value:.2f}"
-            c.drawString(x + 10, y - 43, value_text)
-            
-            # Calculate width of value text to position unit right after it
-            value_width = c.stringWidth(value_text, "Helvetica-Bold", 18)
-            
-            c.setFillColorRGB(0.5, 0.5, 0.5)
-            c.setFont("Helvetica", 10)
-            c.drawString(x + 10 + value_width + 3, y - 43, f" {unit}")
-            
-            col += 1
-            if col >= 2:
-                col = 0
-                row += 1
-        
-        return y_pos - (row * row_height) - 30
-
-    # Start building PDF
-    y = height - 60
-    
-    # Header
-    y = draw_header_box(c, y)
-    y -= 30
-    
-    # Generated date
-    c.setFont("Helvetica", 9)
-    c.setFillColorRGB(0.5, 0.5, 0.5)
-    c.drawString(50, y, f"Generated: {datetime.datetime.now().strftime('%B %d, %Y at %H:%M')}")
-    y -= 30
-    
-    # Animal Configuration
-    animal_info = [
-        f"Animal Type: {animal}",
-        f"Milk Production Level: {milk_level}",
-        f"Body Size: {body_type}",
-        f"Lactation Stage: {stage}",
-        f"Number of Animals: {num}"
-    ]
-    y = draw_section_box(c, y, "■ Animal Configuration", animal_info)
-    
-    # Feed Recommendation Table
-    feeds_data = [
-        ("DRY FODDER", dry_fodder['Ingredient'] if dry_fodder is not None else "", ration["dry"], "kg"),
-        ("GREEN FODDER", green_fodder['Ingredient'] if green_fodder is not None else "", ration["green"], "kg"),
-        ("CONCENTRATE", concentrate['Ingredient'] if concentrate is not None else "", ration["conc"], "kg"),
-        ("OIL CAKE", oil_cake['Ingredient'] if oil_cake is not None else "", ration["oil"], "kg"),
-        ("BRAN", bran_feed['Ingredient'] if bran_feed is not None else "", ration["bran"], "kg"),
-        ("MINERAL SUPPLEMENT", "Mineral Mixture", ration["mineral"], "g"),
-    ]
-    y = draw_feed_table(c, y, feeds_data)
-    
-    # Nutritional Analysis Grid
-    nutrients_data = [
-        ("CP", "Crude Protein (Protein)", nutrient_totals["CP"], "kg/day"),
-        ("EE", "Ether Extract (Fat)", nutrient_totals["EE"], "kg/day"),
-        ("CF", "Crude Fibre (Fibre)", nutrient_totals["CF"], "kg/day"),
-        ("NFE", "NFE (Carbohydrates)", nutrient_totals["NFE"], "kg/day"),
-        ("Ash", "Ash (Minerals)", nutrient_totals["Ash"], "kg/day"),
-        ("NDF", "NDF (Digestible Fibre)", nutrient_totals["NDF"], "kg/day"),
-        ("ADF", "ADF (Indigestible Fibre)", nutrient_totals["ADF"], "kg/day"),
-        ("ME", "Metabolizable Energy", nutrient_totals["ME"], "MJ/day"),
-    ]
-    y = draw_nutrient_grid(c, y, nutrients_data)
-    
-    # Check if we need a new page for herd summary
-    if y < 200:
-        c.showPage()
-        y = height - 80
-    
-    # Total Herd Requirements
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(50, y, f"Total Herd Requirements ({num} Animals)")
-    y -= 25
-    
-    herd_feeds = [
-        ("Dry Fodder", dry_fodder, ration["dry"]),
-        ("Green Fodder", green_fodder, ration["green"]),
-        ("Concentrate", concentrate, ration["conc"]),
-        ("Oil Cake", oil_cake, ration["oil"]),
-        ("Bran", bran_feed, ration["bran"]),
-    ]
-    
-    c.setFont("Helvetica", 10)
-    for label, feed, qty in herd_feeds:
-        if feed is not None and qty > 0:
-            c.setFillColorRGB(0.941, 0.973, 0.902)
-            c.rect(50, y - 18, width - 100, 20, fill=True, stroke=True)
-            c.setFillColorRGB(0, 0, 0)
-            c.drawString(60, y - 12, f"{label}: {feed['Ingredient']}")
-            c.setFillColorRGB(0.176, 0.314, 0.086)
-            c.setFont("Helvetica-Bold", 10)
-            c.drawString(450, y - 12, f"{qty * num:.2f} kg/day")
-            c.setFont("Helvetica", 10)
-            c.setFillColorRGB(0, 0, 0)
-            y -= 22
-    
-    # Mineral mixture
-    c.setFillColorRGB(1, 0.98, 0.8)
-    c.rect(50, y - 18, width - 100, 20, fill=True, stroke=True)
-    c.setFillColorRGB(0, 0, 0)
-    c.drawString(60, y - 12, "Mineral Mixture")
-    c.setFillColorRGB(0.96, 0.66, 0.09)
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(450, y - 12, f"{(ration['mineral'] * num)/1000:.2f} kg/day")
-    
-    # Footer
-    c.setFillColorRGB(0.7, 0.7, 0.7)
-    c.setFont("Helvetica", 8)
-    footer_text = "National Dairy Development Board (NDDB) Standards Applied"
-    c.drawCentredString(width/2, 40, footer_text)
-    c.drawCentredString(width/2, 28, "Base rations from NDDB TMR tables; adjustments follow NDDB feeding principles")
-    
-    c.save()
-    buffer.seek(0)
-
-    st.download_button(
-        label="📥 Download PDF Report",
-        data=buffer,
-        file_name="Feed_Recommendation_Report.pdf",
-        mime="application/pdf"
-    )
\ No newline at end of file
+# The report section is a fragment: clicking its buttons reruns only this
+# section, not the whole page. reportlab is loaded on first use and repeat
+# requests for the same configuration are served from the report cache
+# (that day, until one of the report's ingredients changes in the catalog).
+@st.fragment
+def report_section(spec, ingredients_version):
+    if st.button("Export PDF Report"):
+        with timed("pdf_export"):
+            data = REPORT_CACHE.report(spec, ingredients_version)
+        st.download_button(
+            label="📥 Download PDF Report",
+            data=data,
+            file_name="Feed_Recommendation_Report.pdf",
+            mime="application/pdf",
+            on_click="ignore",
+        )
+
+report_section(
+    report_spec(
+        animal, milk_level, body_type, stage, num,
+        ration=ration,
+        choices={k: blend_label(blends[k]) if k in blends else None for k in FEED_KEYS},
+        nutrients=nutrient_totals,
+        herd_kg=herd_kg,
+        bands=nutrient_bands,
+    ),
+    catalog.ingredient_version(name for blend in blends.values() for name in blend),
+)
+
+# Spreadsheets (ration per group and ingredient, nutrients, herd totals)
+# are only built when a download is clicked, off the page run
+# (feed_suggestion.export); Streamlit then sends the file whole.
+# Without a herd register the one-group frame is built then too, so
+# pandas stays out of page runs.
+def spreadsheet(fmt, groups, animal_config, blends):
+    def build():
+        with timed("spreadsheet_export"):
+            frame = groups if groups is not None else single_group(*animal_config)
+            return export_bytes(fmt, plan_tables(frame, blends, catalog))
+    return build
+
+animal_config = (animal, milk_level, body_type, stage, num, ration)
+excel_col, csv_col = st.columns(2)
+excel_col.download_button(
+    label="📊 Download Excel Workbook",
+    data=spreadsheet("xlsx", herd_groups, animal_config, blends),
+    file_name="Feed_Plan.xlsx",
+    mime=MIME_TYPES["xlsx"],
+    on_click="ignore",
+)
+csv_col.download_button(
+    label="📄 Download CSV Tables (ZIP)",
+    data=spreadsheet("zip", herd_groups, animal_config, blends),
+    file_name="Feed_Plan_CSV.zip",
+    mime=MIME_TYPES["zip"],
+    on_click="ignore",
+)
+stopwatch.lap("render_report")
+stopwatch.total("page")
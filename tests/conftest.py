@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXCEL_PATH = os.path.join(ROOT, "Fodder and Nutrients.xlsx")
+
+
+@pytest.fixture(scope="session")
+def excel_path():
+    return EXCEL_PATH
+
+
+@pytest.fixture(scope="session")
+def catalog():
+    """The real feed catalog, compiled once per test run."""
+    from feed_suggestion.catalog import Catalog
+
+    return Catalog.load(EXCEL_PATH)
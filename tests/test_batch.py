@@ -0,0 +1,35 @@
+import csv
+
+from feed_suggestion.batch import main
+
+HEADER = ["Animal Type", "Milk Production Level", "Body Size", "Stage of Lactation"]
+
+
+def _register(path, *rows):
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows([HEADER, *rows])
+    return str(path)
+
+
+def test_writes_plan(tmp_path):
+    register = _register(tmp_path / "herd.csv", ["Cow", "5 L milk", "Large", "Early lactation"])
+    out = tmp_path / "plan.csv"
+    assert main([register, "-o", str(out), "-j", "1"]) == 0
+    with open(out) as f:
+        assert len(list(csv.reader(f))) == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["herd.csv", "plan.csv"]
+
+
+def test_failed_run_keeps_existing_output(tmp_path):
+    register = _register(tmp_path / "herd.csv", ["Horse", "5 L milk", "Large", "Early lactation"])
+    out = tmp_path / "plan.csv"
+    out.write_text("previous plan\n")
+    assert main([register, "-o", str(out), "-j", "1"]) == 1
+    assert out.read_text() == "previous plan\n"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["herd.csv", "plan.csv"]
+
+
+def test_failed_run_leaves_no_output(tmp_path):
+    register = _register(tmp_path / "herd.csv", ["Horse", "5 L milk", "Large", "Early lactation"])
+    assert main([register, "-o", str(tmp_path / "plan.parquet"), "-j", "1"]) == 1
+    assert [p.name for p in tmp_path.iterdir()] == ["herd.csv"]
@@ -0,0 +1,40 @@
+import numpy as np
+
+from feed_suggestion.catalog import Catalog, catalog_diff
+
+
+def _catalog(rows, version="v"):
+    names, categories, values = zip(*rows)
+    return Catalog(names, categories, np.array(values, dtype=float), version)
+
+
+ROWS = [
+    ("Barley", "Concentrate", [12.0, 2.5, 5.9, 79.0, 2.5, 20.0, 7.0, 2.8]),
+    ("Maize", "Concentrate", [9.0, 4.0, 2.5, 82.0, 1.5, 9.0, 3.0, np.nan]),
+    ("Barley", "Concentrate", [4.0, 0.9, 47.4, 40.4, 9.1, 65.8, 39.9, np.nan]),
+]
+
+
+def test_diff_unchanged():
+    assert catalog_diff(_catalog(ROWS), _catalog(ROWS, "w")) == set()
+
+
+def test_diff_first_row_edit():
+    rows = [("Maize", "Concentrate", [9.5, *ROWS[1][2][1:]]) if r[0] == "Maize" else r for r in ROWS]
+    assert catalog_diff(_catalog(ROWS), _catalog(rows)) == {"Maize"}
+
+
+def test_diff_repeated_analysis_edit():
+    rows = ROWS[:2] + [("Barley", "Concentrate", [4.5, *ROWS[2][2][1:]])]
+    assert catalog_diff(_catalog(ROWS), _catalog(rows)) == {"Barley"}
+
+
+def test_diff_repeated_analysis_added_and_removed():
+    assert catalog_diff(_catalog(ROWS), _catalog(ROWS[:2])) == {"Barley"}
+    assert catalog_diff(_catalog(ROWS[:2]), _catalog(ROWS)) == {"Barley"}
+    assert catalog_diff(_catalog(ROWS), _catalog(ROWS + [("Oats", "Concentrate", ROWS[1][2])])) == {"Oats"}
+
+
+def test_diff_category_edit():
+    rows = ROWS[:2] + [("Barley", "Dry Fodder", ROWS[2][2])]
+    assert catalog_diff(_catalog(ROWS), _catalog(rows)) == {"Barley"}
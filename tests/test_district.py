@@ -0,0 +1,100 @@
+import csv
+import re
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from feed_suggestion.district import (
+    DISTRICT_COLUMN, MINERAL, aggregate_file, aggregate_files, main, read_chunks, totals_frame,
+)
+from feed_suggestion.herd import COUNT_COLUMN, YIELD_COLUMN, group_herd, herd_totals
+
+HEADER = ["Animal Type", "Milk Production Level", "Body Size", "Stage of Lactation", COUNT_COLUMN, "Dry Fodder"]
+ROWS = [
+    ["Cow", "10 L milk", "Medium", "Mid lactation", 3, "Wheat hay"],
+    ["Buffalo", "5 L milk", "Large", "Dry period", 2, ""],
+    ["Cow", "Dry (0 L milk)", "Small", "Early lactation", None, "Wheat hay"],
+    ["Cow", "10 L milk", "Medium", "Mid lactation", 1, "Wheat hay"],
+    ["Buffalo", "10 L milk", "Small", "Late lactation", 4, "Maize stover"],
+]
+
+
+def _csv(path, rows=ROWS, header=HEADER):
+    with open(path, "w", newline="") as f:
+        csv.writer(f).writerows([header, *([("" if v is None else v) for v in row] for row in rows)])
+    return str(path)
+
+
+def _xlsx(path, rows=ROWS, header=HEADER):
+    wb = Workbook()
+    wb.active.append(header)
+    for row in rows:
+        wb.active.append([v if v != "" else None for v in row])
+    wb.save(path)
+    return str(path)
+
+
+def _herd_kg(rows):
+    groups = group_herd(pd.DataFrame(rows, columns=HEADER))
+    return herd_totals(groups), int(groups["Animals"].sum())
+
+
+@pytest.mark.parametrize("write", [_csv, _xlsx])
+def test_chunks_cover_every_row(tmp_path, write):
+    path = write(tmp_path / f"village.{'csv' if write is _csv else 'xlsx'}")
+    chunks = list(read_chunks(path, chunksize=2))
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    frame = pd.concat(chunks)
+    assert frame.index.tolist() == list(range(len(ROWS)))
+    assert frame["Animal Type"].tolist() == [r[0] for r in ROWS]
+
+
+@pytest.mark.parametrize("write", [_csv, _xlsx])
+def test_totals_match_single_pass(tmp_path, write):
+    path = write(tmp_path / f"village.{'csv' if write is _csv else 'xlsx'}")
+    kg, n = _herd_kg(ROWS)
+    for chunksize in (1, 2, 100):
+        totals, animals = aggregate_file(path, {"conc": "Maize"}, chunksize)
+        assert animals == {"village": n}
+        assert totals["village", MINERAL] == pytest.approx(kg["mineral"] / 1000)
+        feeds = sum(v for (_, name), v in totals.items() if name != MINERAL)
+        assert feeds == pytest.approx(sum(kg[k] for k in ("dry", "green", "conc", "oil", "bran")))
+        # the blank Dry Fodder row is totalled as unspecified
+        assert ("village", "Unspecified dry fodder") in totals
+
+
+def test_files_in_parallel_match_one_process(tmp_path):
+    paths = [_csv(tmp_path / "a.csv", ROWS[:3]), _xlsx(tmp_path / "b.xlsx", ROWS[3:]),
+             _csv(tmp_path / "c.csv", [r[:4] + [r[4], r[5]] for r in ROWS],
+                  HEADER[:4] + [COUNT_COLUMN, "Dry Fodder"])]
+    parallel = aggregate_files(paths, workers=3, chunksize=2)
+    serial = aggregate_files(paths, workers=1, chunksize=100)
+    assert parallel[1] == serial[1] == {"a": 6, "b": 5, "c": 11}
+    assert parallel[0].keys() == serial[0].keys()
+    for key in serial[0]:
+        assert parallel[0][key] == pytest.approx(serial[0][key])
+    kg, n = _herd_kg(ROWS)
+    assert sum(v for (d, name), v in serial[0].items() if name == MINERAL) == pytest.approx(2 * kg["mineral"] / 1000)
+
+    frame = totals_frame(*serial)
+    overall = frame[frame[DISTRICT_COLUMN] == "All districts"]
+    assert set(overall["Animals"]) == {2 * n}
+
+
+@pytest.mark.parametrize("count", [1.5, -1, "two"])
+def test_bad_count_rejected(tmp_path, count):
+    rows = [ROWS[0], ROWS[1], [*ROWS[2][:4], count, "Wheat hay"]]
+    path = _csv(tmp_path / "village.csv", rows)
+    message = f"{path} (rows 3-3): {COUNT_COLUMN} must be a whole number of animals in data row(s) 3"
+    with pytest.raises(ValueError, match=re.escape(message)):
+        aggregate_file(path, chunksize=2)
+
+
+def test_blank_yield_rejected(tmp_path, capsys):
+    header = [YIELD_COLUMN if c == "Milk Production Level" else c for c in HEADER]
+    rows = [[*r[:1], 8, *r[2:]] for r in ROWS]
+    rows[3][1] = None
+    path = _xlsx(tmp_path / "village.xlsx", rows, header)
+    assert main([path, "--chunksize", "2"]) == 1
+    assert f"(rows 3-4): {YIELD_COLUMN} is blank or not a number in data row(s) 4" in capsys.readouterr().err
@@ -0,0 +1,134 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from feed_suggestion import engine
+
+COMBOS = list(itertools.product(engine.ANIMALS, engine.MILK_LEVELS, engine.BODY_SIZES, engine.STAGES))
+
+
+# ----------------------------------------
+# BASELINE: the original per-animal app code, as the reference
+# ----------------------------------------
+NDDB_COW = {
+    "Dry (0 L milk)": {"dry": 7, "green": 4,  "conc": 2, "oil": 0, "bran": 0, "mineral": 50},
+    "5 L milk":       {"dry": 7, "green": 4,  "conc": 4, "oil": 0, "bran": 0, "mineral": 100},
+    "10 L milk":      {"dry": 7, "green": 4,  "conc": 6, "oil": 0, "bran": 0, "mineral": 150},
+}
+NDDB_BUFFALO = {
+    "Dry (0 L milk)": {"dry": 6, "green": 2,  "conc": 0, "oil": 2, "bran": 0, "mineral": 75},
+    "5 L milk":       {"dry": 7, "green": 5,  "conc": 5, "oil": 0, "bran": 0, "mineral": 125},
+    "10 L milk":      {"dry": 7, "green": 10, "conc": 6, "oil": 2, "bran": 0, "mineral": 175},
+}
+PREGNANT_BASE = {"dry": 4.5, "green": 17.5, "conc": 2.5, "oil": 1.0, "bran": 0.0, "mineral": 50}
+BODY_FACTORS = {"Small": 0.9, "Medium": 1.0, "Large": 1.15}
+
+
+def baseline_base_ration(animal, milk_level, stage):
+    if stage == "Pregnant (7–9 months)":
+        base = PREGNANT_BASE
+    elif stage == "Dry period":
+        base = NDDB_COW["Dry (0 L milk)"] if animal == "Cow" else NDDB_BUFFALO["Dry (0 L milk)"]
+    else:
+        base = NDDB_COW[milk_level] if animal == "Cow" else NDDB_BUFFALO[milk_level]
+    return base.copy()
+
+
+def baseline_adjust_ration(base, body_type, stage):
+    ration = base.copy()
+    body_factor = BODY_FACTORS.get(body_type, 1.0)
+    for k in ["dry", "green", "conc", "oil", "bran"]:
+        ration[k] = round(ration[k] * body_factor, 2)
+    if stage == "Early lactation":
+        ration["conc"] = round(ration["conc"] * 1.15, 2)
+        ration["green"] = round(ration["green"] * 1.05, 2)
+    elif stage == "Late lactation":
+        ration["conc"] = round(ration["conc"] * 0.9, 2)
+    ration["mineral"] = round(base["mineral"] * body_factor, 0)
+    return ration
+
+
+def baseline_nutrients(feed_row, qty_kg):
+    if feed_row is None or qty_kg <= 0:
+        return {k: 0.0 for k in engine.NUTRIENT_COLS}
+    vals = {col: qty_kg * feed_row[col] / 100.0 for col in ["CP", "EE", "CF", "NFE", "Ash", "NDF", "ADF"]}
+    vals["ME"] = qty_kg * feed_row["ME"]
+    return vals
+
+
+def _baseline(combo):
+    animal, milk_level, body_type, stage = combo
+    return baseline_adjust_ration(baseline_base_ration(animal, milk_level, stage), body_type, stage)
+
+
+# ----------------------------------------
+# RATIONS
+# ----------------------------------------
+def test_ration_matrix_matches_baseline():
+    ration = engine.ration_matrix(*map(list, zip(*COMBOS)))
+    for combo, row in zip(COMBOS, ration.tolist()):
+        expected = _baseline(combo)
+        assert row == [expected[k] for k in engine.RATION_KEYS], combo
+
+
+@pytest.mark.parametrize("combo", COMBOS, ids="|".join)
+def test_ration_for_matches_baseline(combo):
+    assert engine.ration_for(*combo) == _baseline(combo)
+    animal, milk_level, body_type, stage = combo
+    assert engine.adjust_ration(engine.get_base_ration(animal, milk_level, stage), body_type, stage) == \
+        _baseline(combo)
+
+
+def test_ration_for_returns_fresh_dicts():
+    combo = COMBOS[0]
+    engine.ration_for(*combo)["dry"] = -1
+    assert engine.ration_for(*combo) == _baseline(combo)
+
+
+def test_yield_rations_match_levels_at_knots():
+    for combo in COMBOS:
+        animal, milk_level, body_type, stage = combo
+        milk_yield = engine.MILK_YIELDS[engine.MILK_LEVELS.index(milk_level)]
+        assert engine.yield_ration_matrix(animal, milk_yield, body_type, stage)[0] == \
+            pytest.approx(engine.ration_matrix(*combo)[0]), combo
+
+
+def test_unknown_label_rejected():
+    with pytest.raises(ValueError):
+        engine.ration_matrix(["Goat"], ["5 L milk"], ["Small"], ["Mid lactation"])
+
+
+# ----------------------------------------
+# NUTRIENTS
+# ----------------------------------------
+def test_nutrient_totals_match_baseline(catalog):
+    composition = catalog.nutrients
+    rng = np.random.default_rng(0)
+    feed_idx = rng.integers(-1, len(catalog), (len(COMBOS), len(engine.FEED_KEYS)))
+    ration, totals = engine.evaluate(*map(list, zip(*COMBOS)), feed_idx, composition)
+    for combo, idx, got in zip(COMBOS, feed_idx, totals.tolist()):
+        expected = dict.fromkeys(engine.NUTRIENT_COLS, 0.0)
+        r = _baseline(combo)
+        for key, i in zip(engine.FEED_KEYS, idx):
+            row = dict(zip(engine.NUTRIENT_COLS, composition[i])) if i >= 0 else None
+            for k, v in baseline_nutrients(row, r[key]).items():
+                expected[k] += v
+        np.testing.assert_allclose(got, [expected[k] for k in engine.NUTRIENT_COLS], rtol=1e-12, equal_nan=True)
+
+
+def test_unused_slots_ignore_blanks():
+    composition = np.full((2, len(engine.NUTRIENT_COLS)), np.nan)
+    composition[0] = 10.0
+    ration = [[5.0, 0.0, 2.0, 0.0, 0.0, 100.0]]
+    # slot 2 points at an all-blank row but the slot is unused; slot 3 has no quantity
+    totals = engine.nutrient_matrix(ration, [[0, -1, 0, 1, -1]], composition)[0]
+    assert totals.tolist() == pytest.approx([0.7] * 7 + [70.0])
+
+
+def test_single_ingredient_blend_is_the_ingredient(catalog):
+    ration = engine.ration_for("Cow", "10 L milk", "Medium", "Mid lactation")
+    names = [(catalog.options(engine.FEED_CATEGORIES[k]) or [None])[0] for k in engine.FEED_KEYS]
+    blends = {k: {name: 1.0} for k, name in zip(engine.FEED_KEYS, names) if name is not None}
+    assert catalog.blend_nutrients(ration, blends) == \
+        engine.ration_nutrients(ration, [catalog.row(n) for n in names], catalog.nutrients)
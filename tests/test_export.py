@@ -0,0 +1,96 @@
+import csv
+import io
+import zipfile
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from feed_suggestion import export
+from feed_suggestion.export import (
+    MINERAL, TABLES, export_bytes, plan_tables, ration_rows, single_group, write_csv_zip, write_xlsx,
+)
+from feed_suggestion.engine import ration_for
+from feed_suggestion.herd import group_herd
+
+BLENDS = {"dry": {"Wheat hay": 1.0}, "conc": {"Maize": 1.0, "Wheat bran": 3.0}}
+
+
+@pytest.fixture
+def groups():
+    rows = [("Cow", "10 L milk", "Medium", "Mid lactation", 3), ("Buffalo", "5 L milk", "Large", "Dry period", 2),
+            ("Cow", "Dry (0 L milk)", "Small", "Early lactation", None)]
+    return group_herd(pd.DataFrame(rows, columns=["Animal Type", "Milk Production Level", "Body Size",
+                                                  "Stage of Lactation", "Count"]))
+
+
+def _sheets(data):
+    wb = load_workbook(io.BytesIO(data), read_only=True)
+    return {ws.title: list(ws.iter_rows(values_only=True)) for ws in wb.worksheets}
+
+
+def _zip(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return {name: list(csv.reader(io.TextIOWrapper(zf.open(name), encoding="utf-8")))
+                for name in zf.namelist()}
+
+
+def test_ration_rows(groups):
+    rows = list(ration_rows(groups, BLENDS))
+    cow = ration_for("Cow", "10 L milk", "Medium", "Mid lactation")
+    first = [r for r in rows if r[:4] == ("Cow", "10 L milk", "Medium", "Mid lactation")]
+    assert [r[5:7] for r in first] == [("Dry Fodder", "Wheat hay"), ("Concentrate", "Maize"),
+                                      ("Concentrate", "Wheat bran"), (MINERAL, MINERAL)]
+    assert first[1][7] + first[2][7] == pytest.approx(cow["conc"], abs=1e-3)
+    assert first[2][7] == pytest.approx(3 * first[1][7], abs=2e-3)
+    assert first[0][4] == 3 and first[0][8] == pytest.approx(3 * cow["dry"])
+    # the blank count stands for one animal
+    assert {r[4] for r in rows if r[0] == "Cow" and r[1] == "Dry (0 L milk)"} == {1}
+
+
+def test_xlsx_round_trip(groups, catalog):
+    sheets = _sheets(export_bytes("xlsx", plan_tables(groups, BLENDS, catalog)))
+    assert list(sheets) == TABLES
+    expected = plan_tables(groups, BLENDS, catalog)
+    for name, (header, rows) in expected.items():
+        assert sheets[name][0] == tuple(header)
+        assert sheets[name][1:] == [tuple(r) for r in rows]
+
+
+def test_zip_round_trip(groups, catalog):
+    files = _zip(export_bytes("zip", plan_tables(groups, BLENDS, catalog)))
+    assert list(files) == [f"{name}.csv" for name in TABLES]
+    for name, (header, rows) in plan_tables(groups, BLENDS, catalog).items():
+        assert files[f"{name}.csv"][0] == header
+        assert files[f"{name}.csv"][1:] == [[str(v) for v in r] for r in rows]
+
+
+def test_csv_holds_first_table(groups, catalog):
+    text = export_bytes("csv", plan_tables(groups, BLENDS, catalog)).decode("utf-8")
+    header, *rows = csv.reader(io.StringIO(text))
+    assert rows == [[str(v) for v in r] for r in ration_rows(groups, BLENDS)]
+    with pytest.raises(ValueError, match="Unknown export format"):
+        export_bytes("ods", plan_tables(groups, BLENDS, catalog))
+
+
+def test_long_table_continues_on_next_sheet(groups, catalog, monkeypatch, tmp_path):
+    monkeypatch.setattr(export, "EXCEL_MAX_ROWS", 4)
+    path = tmp_path / "plan.xlsx"
+    write_xlsx(str(path), plan_tables(groups, BLENDS, catalog))
+    sheets = _sheets(path.read_bytes())
+    ration = [name for name in sheets if name.startswith("Ration")]
+    assert ration[:2] == ["Ration", "Ration (2)"]
+    header = sheets["Ration"][0]
+    assert all(sheets[name][0] == header and len(sheets[name]) <= 4 for name in ration)
+    assert [r for name in ration for r in sheets[name][1:]] == list(ration_rows(groups, BLENDS))
+
+
+def test_single_group_matches_herd_of_one(catalog):
+    ration = ration_for("Cow", "10 L milk", "Medium", "Mid lactation")
+    frame = single_group("Cow", "10 L milk", "Medium", "Mid lactation", 4, ration)
+    herd = group_herd(pd.DataFrame([("Cow", "10 L milk", "Medium", "Mid lactation", 4)],
+                                   columns=list(frame.columns[:5])[:4] + ["Count"]))
+    assert list(ration_rows(frame, BLENDS)) == list(ration_rows(herd, BLENDS))
+    buffer = io.BytesIO()
+    write_csv_zip(buffer, plan_tables(frame, BLENDS, catalog))
+    assert len(_zip(buffer.getvalue())) == len(TABLES)
@@ -0,0 +1,103 @@
+import io
+import re
+
+import pandas as pd
+import pytest
+
+from feed_suggestion.engine import ANIMALS, MILK_LEVELS, MILK_YIELDS, RATION_KEYS, ration_for, yield_ration_matrix
+from feed_suggestion.herd import HERD_COLUMNS, YIELD_COLUMN, group_herd, herd_totals, read_herd
+
+COW = {"Animal Type": "Cow", "Milk Production Level": "5 L milk", "Body Size": "Large",
+       "Stage of Lactation": "Early lactation"}
+
+
+def _herd(*rows):
+    return pd.DataFrame([dict(COW, **row) for row in rows])
+
+
+def test_yield_column_replaces_level():
+    groups = group_herd(_herd({YIELD_COLUMN: MILK_YIELDS[2]}, {YIELD_COLUMN: "7.5"}, {YIELD_COLUMN: 7.5}))
+    assert groups[YIELD_COLUMN].tolist() == [MILK_YIELDS[2], 7.5]
+    assert groups["Animals"].tolist() == [1, 2]
+    knot = ration_for("Cow", MILK_LEVELS[2], "Large", "Early lactation")
+    assert groups.loc[0, RATION_KEYS].tolist() == pytest.approx(list(knot.values()))
+    between = yield_ration_matrix("Cow", 7.5, "Large", "Early lactation")[0]
+    assert groups.loc[1, RATION_KEYS].tolist() == pytest.approx(list(between))
+
+
+@pytest.mark.parametrize("value", [None, "", "n/a"])
+def test_blank_yield_rejected_not_dropped(value):
+    herd = _herd({YIELD_COLUMN: 5}, {YIELD_COLUMN: value}, {YIELD_COLUMN: 10})
+    with pytest.raises(ValueError, match=re.escape(f"{YIELD_COLUMN} is blank or not a number in data row(s) 2")):
+        group_herd(herd)
+
+
+def test_blank_yield_in_csv_rejected():
+    data = io.StringIO("Animal Type,Milk Yield (L/day),Body Size,Stage of Lactation\n"
+                       "Cow,5,Large,Early lactation\nCow,,Large,Early lactation\nCow,8,Large,Early lactation\n")
+    with pytest.raises(ValueError, match="data row\\(s\\) 2$"):
+        group_herd(pd.read_csv(data))
+
+
+def test_every_animal_counted():
+    groups = group_herd(_herd({YIELD_COLUMN: 5}, {YIELD_COLUMN: 5}, {YIELD_COLUMN: 12}))
+    assert groups["Animals"].sum() == 3
+    one = ration_for("Cow", "5 L milk", "Large", "Early lactation")
+    assert herd_totals(groups)["dry"] == pytest.approx(2 * one["dry"] + groups.loc[1, "dry"])
+
+
+# headers as spreadsheets export them: padded, with a BOM and zero-width spaces
+MESSY = {" Animal Type": "Cow", "\ufeffMilk Production Level": "5 L milk", "Body\u200b Size ": "Large",
+         "Stage of Lactation\u200b": "Early lactation"}
+
+
+@pytest.mark.parametrize("filename", ["herd.csv", "herd.xlsx"])
+def test_read_herd_cleans_headers(filename):
+    data = io.BytesIO()
+    frame = pd.DataFrame([MESSY, MESSY])
+    if filename.endswith(".csv"):
+        frame.to_csv(data, index=False)
+    else:
+        frame.to_excel(data, index=False)
+    data.seek(0)
+    herd = read_herd(data, filename.upper())
+    assert list(herd.columns) == list(HERD_COLUMNS)
+    assert group_herd(herd)["Animals"].tolist() == [2]
+
+
+def test_read_herd_missing_column():
+    data = io.StringIO("Animal Type,Milk Production Level,Stage of Lactation\nCow,5 L milk,Early lactation\n")
+    with pytest.raises(ValueError, match="^Herd register is missing column\\(s\\): Body Size$"):
+        read_herd(data, "herd.csv")
+
+
+def test_read_herd_yield_replaces_level():
+    data = io.StringIO("Animal Type,Milk Yield (L/day),Body Size,Stage of Lactation\nCow,7.5,Large,Early lactation\n")
+    assert YIELD_COLUMN in read_herd(data, "herd.csv")
+    with pytest.raises(ValueError, match="missing column\\(s\\): Milk Production Level$"):
+        read_herd(io.StringIO("Animal Type,Body Size,Stage of Lactation\nCow,Large,Early lactation\n"), "herd.csv")
+
+
+def test_unknown_label_names_rows():
+    herd = _herd({}, {"Animal Type": " Goat "}, {}, {"Animal Type": "Goat"})
+    message = f"Unknown Animal Type: Goat in data row(s) 2, 4 (expected one of: {', '.join(ANIMALS)})"
+    with pytest.raises(ValueError, match=re.escape(message)):
+        group_herd(herd)
+
+
+def test_labels_are_stripped():
+    groups = group_herd(_herd({}, {"Animal Type": " Cow", "Body Size": "Large "}))
+    assert groups["Animals"].tolist() == [2]
+
+
+def test_count_defaults_to_one():
+    assert group_herd(_herd({}, {}, {}))["Animals"].tolist() == [3]
+    groups = group_herd(_herd({"Count": 4}, {"Count": None}, {"Count": "2"}))
+    assert groups["Animals"].tolist() == [7]
+    assert herd_totals(groups)["dry"] == pytest.approx(7 * ration_for(*COW.values())["dry"])
+
+
+@pytest.mark.parametrize("count", [-1, 1.5, "two"])
+def test_bad_count_rejected(count):
+    with pytest.raises(ValueError, match=re.escape("Count must be a whole number of animals in data row(s) 2")):
+        group_herd(_herd({}, {"Count": count}))
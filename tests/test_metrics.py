@@ -0,0 +1,36 @@
+import json
+import threading
+import time
+import urllib.request
+
+from feed_suggestion import metrics
+
+
+def test_exporter_listens_on_localhost_by_default():
+    server = metrics.serve(0)
+    try:
+        host, port = server.server_address[:2]
+        assert host == "127.0.0.1"
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            assert response.status == 200
+    finally:
+        server.shutdown()
+
+
+def test_periodic_dump_survives_write_errors(tmp_path, caplog):
+    path = tmp_path / "missing" / "metrics.json"
+    stop = metrics.dump_periodically(str(path), 0.01)
+    try:
+        time.sleep(0.1)
+        assert "Could not write metrics" in caplog.text
+        path.parent.mkdir()
+        deadline = time.time() + 2
+        while not path.exists() and time.time() < deadline:
+            time.sleep(0.01)
+        assert "counters" in json.loads(path.read_text())
+    finally:
+        stop.set()
+    deadline = time.time() + 2
+    while any(t.name == "feed-metrics-json" for t in threading.enumerate()) and time.time() < deadline:
+        time.sleep(0.01)
+    assert not any(t.name == "feed-metrics-json" for t in threading.enumerate())
@@ -0,0 +1,171 @@
+import itertools
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from feed_suggestion import optimizer
+from feed_suggestion.catalog import Catalog
+from feed_suggestion.engine import FEED_CATEGORIES, FEED_KEYS, ration_for, ration_nutrients
+from feed_suggestion.optimizer import MAX_TARGETS, MIN_TARGETS, least_cost, nutrient_targets
+
+# dry, green and concentrate slots in use
+RATION = {"dry": 6.0, "green": 10.0, "conc": 3.0, "oil": 0.0, "bran": 0.0, "mineral": 100.0}
+PER_CATEGORY = 5
+
+
+def _synthetic(seed=0):
+    rng = np.random.default_rng(seed)
+    names, categories, values = [], [], []
+    for key in ("dry", "green", "conc"):
+        for i in range(PER_CATEGORY):
+            names.append(f"{key} {i}")
+            categories.append(FEED_CATEGORIES[key])
+            # CP, EE, CF, NFE, Ash, NDF, ADF (% of kg), ME (MJ/kg)
+            values.append([*rng.uniform(2, 25, 7), rng.uniform(5, 12)])
+    prices = {name: round(float(p), 2) for name, p in zip(names, rng.uniform(2, 30, len(names)))}
+    return Catalog(names, categories, np.array(values), f"synthetic-{seed}"), prices
+
+
+def _brute_force(catalog, prices, targets):
+    """Cheapest feasible choice with the NDDB quantities fixed (no tolerance)."""
+    slots = [k for k in FEED_KEYS if RATION[k] > 0]
+    best = None
+    for names in itertools.product(*(catalog.options(FEED_CATEGORIES[k]) for k in slots)):
+        idx = [catalog.rows[dict(zip(slots, names))[k]] if k in slots else -1 for k in FEED_KEYS]
+        totals = ration_nutrients(RATION, idx, catalog.nutrients)
+        if any(totals[k] < v - 1e-9 for k, v in targets.items() if k in MIN_TARGETS) or \
+                any(totals[k] > v + 1e-9 for k, v in targets.items() if k in MAX_TARGETS):
+            continue
+        cost = sum(RATION[k] * prices[n] for k, n in zip(slots, names))
+        if best is None or cost < best[0]:
+            best = cost, dict(zip(slots, names))
+    return best
+
+
+def _assert_feasible(result, targets, ration, tolerance):
+    # the reported ration itself meets every bound, with no rounding slack
+    for k, v in targets.items():
+        if k in MIN_TARGETS:
+            assert result["nutrients"][k] >= v, k
+        else:
+            assert result["nutrients"][k] <= v, k
+    for k in FEED_KEYS:
+        if ration[k] > 0:
+            assert k in result["choices"]
+            assert ration[k] * (1 - tolerance) - 1e-9 <= result["quantities"][k] <= ration[k] * (1 + tolerance) + 1e-9
+            assert result["quantities"][k] == round(result["quantities"][k], 2)
+        else:
+            assert k not in result["choices"] and result["quantities"][k] == 0.0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_brute_force(seed):
+    catalog, prices = _synthetic(seed)
+    targets = nutrient_targets(RATION, catalog)
+    result = least_cost(RATION, catalog, prices, targets, tolerance=0.0)
+    best = _brute_force(catalog, prices, targets)
+    if best is None:
+        assert result is None
+        return
+    _assert_feasible(result, targets, RATION, 0.0)
+    assert result["cost"] == pytest.approx(best[0])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_tolerance_never_costs_more(seed):
+    catalog, prices = _synthetic(seed)
+    targets = nutrient_targets(RATION, catalog)
+    fixed = least_cost(RATION, catalog, prices, targets, tolerance=0.0)
+    free = least_cost(RATION, catalog, prices, targets)
+    if fixed is not None:
+        assert free is not None
+        _assert_feasible(free, targets, RATION, 0.2)
+        assert free["cost"] <= fixed["cost"] + 1e-9
+
+
+def test_cost_and_nutrients_consistent():
+    catalog, prices = _synthetic(1)
+    result = least_cost(RATION, catalog, prices, {k: None for k in MIN_TARGETS + MAX_TARGETS})
+    assert result["cost"] == pytest.approx(sum(q * prices[result["choices"][k]]
+                                               for k, q in result["quantities"].items() if q))
+    idx = [catalog.rows[result["choices"][k]] if k in result["choices"] else -1 for k in FEED_KEYS]
+    assert result["nutrients"] == pytest.approx(ration_nutrients(result["quantities"], idx, catalog.nutrients))
+    # no bounds: the cheapest ingredient per slot, at the lowest quantity allowed
+    for k, name in result["choices"].items():
+        options = catalog.options(FEED_CATEGORIES[k])
+        assert prices[name] == min(prices[o] for o in options)
+        assert result["quantities"][k] == pytest.approx(RATION[k] * 0.8)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_binding_targets_met_after_rounding(seed):
+    # floors raised to bind: the optimum sits on them and the band edges
+    catalog, prices = _synthetic(seed)
+    targets = {k: round(v * 1.05, 3) for k, v in nutrient_targets(RATION, catalog).items()}
+    result = least_cost(RATION, catalog, prices, targets)
+    if result is not None:
+        _assert_feasible(result, targets, RATION, 0.2)
+        idx = [catalog.rows[result["choices"][k]] if k in result["choices"] else -1 for k in FEED_KEYS]
+        assert result["nutrients"] == pytest.approx(ration_nutrients(result["quantities"], idx, catalog.nutrients))
+        assert result["cost"] == pytest.approx(sum(q * prices[result["choices"][k]]
+                                                   for k, q in result["quantities"].items() if q))
+
+
+def test_steps_fall_back_to_other_ingredients():
+    # Cheap meets the CP floor only at 1.002 kg, between two 10 g steps of a
+    # 1.00 ± 0.004 kg band; Rich meets it at 1.00 kg
+    values = [[10.0, *[1.0] * 6, 8.0], [12.0, *[1.0] * 6, 8.0]]
+    catalog = Catalog(["Cheap", "Rich"], [FEED_CATEGORIES["dry"]] * 2, np.array(values), "steps")
+    ration = dict.fromkeys(FEED_KEYS, 0.0) | {"dry": 1.0, "mineral": 0.0}
+    result = least_cost(ration, catalog, {"Cheap": 1.0, "Rich": 2.0}, {"CP": 0.1002}, tolerance=0.004)
+    assert result["choices"] == {"dry": "Rich"} and result["quantities"]["dry"] == 1.0
+    assert result["nutrients"]["CP"] >= 0.1002
+
+
+def test_infeasible_targets():
+    catalog, prices = _synthetic(2)
+    assert least_cost(RATION, catalog, prices, {"CP": 1e6}) is None
+
+
+def test_unpriced_slot():
+    catalog, prices = _synthetic(3)
+    prices = {n: p for n, p in prices.items() if not n.startswith("green")}
+    with pytest.raises(ValueError, match="No priced"):
+        least_cost(RATION, catalog, prices)
+
+
+def test_real_catalog(catalog):
+    ration = ration_for("Buffalo", "10 L milk", "Large", "Early lactation")
+    prices = {name: 10.0 + (i % 17) for i, name in enumerate(catalog.rows)}
+    targets = nutrient_targets(ration, catalog)
+    result = least_cost(ration, catalog, prices, targets)
+    assert result is not None
+    _assert_feasible(result, targets, ration, 0.2)
+
+
+def _brute_pareto(values):
+    return np.array([not any((o >= v).all() and (o > v).any() for o in values) for v in values])
+
+
+@pytest.mark.parametrize("block", [1, 7, 1024])
+def test_pareto_mask_matches_pairwise(monkeypatch, block):
+    monkeypatch.setattr(optimizer, "_PRUNE_BLOCK", block)
+    rng = np.random.default_rng(block)
+    # few distinct levels: ties and duplicate rows are common
+    values = rng.integers(0, 4, size=(300, 3)).astype(float)
+    assert (optimizer._pareto_mask(values) == _brute_pareto(values)).all()
+    values = rng.normal(size=(200, 2))
+    assert (optimizer._pareto_mask(values) == _brute_pareto(values)).all()
+
+
+def test_pareto_mask_memory_stays_flat():
+    values = np.random.default_rng(0).normal(size=(100_000, 3))
+    tracemalloc.start()
+    try:
+        keep = optimizer._pareto_mask(values)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert keep.any()
+    assert peak < 32 * 2**20
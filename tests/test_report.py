@@ -0,0 +1,81 @@
+import datetime
+import os
+import zipfile
+
+import pandas as pd
+import pytest
+
+from feed_suggestion.engine import FEED_CATEGORIES, FEED_KEYS, NUTRIENT_COLS, ration_for
+from feed_suggestion.report import ReportCache, build_report, main, report_key, report_spec
+
+FARM = {"Farm": "Asha Dairy", "Animal Type": "Cow", "Milk Production Level": "5 L milk",
+        "Body Size": "Large", "Stage of Lactation": "Early lactation", "Number of Animals": 3}
+
+
+def _spec(**overrides):
+    ration = ration_for("Cow", "5 L milk", "Large", "Early lactation")
+    spec = report_spec("Cow", "5 L milk", "Large", "Early lactation", 3, ration,
+                       choices=dict.fromkeys(FEED_KEYS), nutrients=dict.fromkeys(NUTRIENT_COLS, 0.0),
+                       herd_kg={k: v * 3 for k, v in ration.items()})
+    spec.update(overrides)
+    return spec
+
+
+def test_generated_is_today():
+    assert _spec()["generated"] == datetime.date.today().strftime("%B %d, %Y")
+
+
+def test_key_covers_the_date():
+    assert report_key(_spec(), "v") == report_key(_spec(filename="a.pdf"), "v")
+    assert report_key(_spec(), "v") != report_key(_spec(generated="January 01, 2000"), "v")
+    assert report_key(_spec(), "v") != report_key(_spec(), "w")
+
+
+def test_another_day_renders_again():
+    cache = ReportCache()
+    today = cache.report(_spec(), "v")
+    assert cache.report(_spec(), "v") is today
+    assert cache.report(_spec(generated="January 01, 2000"), "v") != today
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_renders_with_some_bands_missing():
+    pdf = build_report(_spec(bands={"CP": [0.9, 1.1]}))
+    assert pdf[:4] == b"%PDF"
+
+
+def _run(tmp_path, excel_path, *rows):
+    farms = tmp_path / "farms.csv"
+    pd.DataFrame([dict(FARM, **row) for row in rows]).to_csv(farms, index=False)
+    out = tmp_path / "reports.zip"
+    return main([str(farms), "-o", str(out), "-j", "1", "--catalog", excel_path]), out
+
+
+def test_cli_writes_one_pdf_per_farm(tmp_path, excel_path, catalog, capsys):
+    hay = catalog.ingredients[catalog.rows_in(FEED_CATEGORIES["dry"])[0]]
+    code, out = _run(tmp_path, excel_path, {"Dry Fodder": hay}, {"Farm": "Green Acres", "Number of Animals": None})
+    assert code == 0
+    assert "2 reports" in capsys.readouterr().out
+    with zipfile.ZipFile(out) as zf:
+        assert zf.namelist() == ["00001_Asha_Dairy.pdf", "00002_Green_Acres.pdf"]
+        assert all(zf.read(name)[:4] == b"%PDF" for name in zf.namelist())
+
+
+def test_cli_without_feed_columns(tmp_path, excel_path):
+    code, out = _run(tmp_path, excel_path, {})
+    assert code == 0
+    with zipfile.ZipFile(out) as zf:
+        assert zf.namelist() == ["00001_Asha_Dairy.pdf"]
+
+
+@pytest.mark.parametrize("row, message", [
+    ({"Animal Type": "Goat"}, "Unknown Animal Type: Goat in data row(s) 2"),
+    ({"Body Size": None}, "Unknown Body Size: (blank) in data row(s) 2"),
+    ({"Number of Animals": 2.5}, "Number of Animals must be a whole number of animals in data row(s) 2"),
+    ({"Number of Animals": "many"}, "Number of Animals must be a whole number of animals in data row(s) 2"),
+])
+def test_cli_rejects_bad_rows(tmp_path, excel_path, capsys, row, message):
+    code, _ = _run(tmp_path, excel_path, {}, row)
+    assert code == 1
+    assert message in capsys.readouterr().err
+    assert os.listdir(tmp_path) == ["farms.csv"]
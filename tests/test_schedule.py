@@ -0,0 +1,84 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from feed_suggestion.engine import RATION_KEYS, ration_for
+from feed_suggestion.schedule import CYCLE, CYCLE_DAYS, MINERAL, FeedingPlan, cycle_position
+
+START = datetime.date(2025, 4, 1)
+GROUP = {"animal": "Cow", "milk_level": "10 L milk", "body_type": "Medium", "stage": "Mid lactation",
+         "days_in_stage": 20, "count": 12}
+
+
+def _per_day(group, days):
+    """The plan's daily requirement, one ration_for call per day."""
+    stages = [stage for stage, length in CYCLE for _ in range(length)]
+    start = cycle_position(group["stage"], group["days_in_stage"])
+    rows = []
+    for d in range(days):
+        stage = stages[(start + d) % CYCLE_DAYS]
+        ration = ration_for(group["animal"], group["milk_level"], group["body_type"], stage)
+        rows.append([group["count"] * ration[k] for k in RATION_KEYS])
+    return np.array(rows)
+
+
+def test_matches_per_day_evaluation():
+    plan = FeedingPlan(START)
+    plan.set_group("A", GROUP)
+    np.testing.assert_allclose(plan.daily_totals(), _per_day(GROUP, plan.days))
+    assert plan.monthly_totals().sum(axis=0) == pytest.approx(plan.daily_totals().sum(axis=0))
+    assert plan.months[0] == "2025-04" and len(plan.months) == 12
+
+
+def test_stage_calendar():
+    plan = FeedingPlan(START)
+    plan.set_group("A", GROUP)
+    calendar = plan.stage_calendar("A")
+    assert calendar[0] == "Mid lactation"
+    assert calendar[80] == "Late lactation"          # 100 - 20 days left of mid lactation
+    assert len(calendar) == plan.days
+
+
+def test_edit_recomputes_from_effective_date():
+    plan = FeedingPlan(START)
+    plan.set_group("A", GROUP)
+    plan.set_group("B", dict(GROUP, animal="Buffalo"))
+    before = plan.daily_totals().copy()
+    recomputed = plan.recomputed_days
+
+    effective = START + datetime.timedelta(days=200)
+    plan.set_group("A", dict(GROUP, count=20), effective=effective)
+    assert plan.recomputed_days - recomputed == plan.days - 200
+
+    after = plan.daily_totals()
+    np.testing.assert_array_equal(after[:200], before[:200])
+    expected = _per_day(dict(GROUP, count=20), plan.days) + _per_day(dict(GROUP, animal="Buffalo"), plan.days)
+    np.testing.assert_allclose(after[200:], expected[200:])
+    np.testing.assert_allclose(plan.monthly_totals().sum(axis=0), after.sum(axis=0))
+
+    # an unchanged group is not recomputed
+    plan.set_group("B", dict(GROUP, animal="Buffalo"), effective=effective)
+    assert plan.recomputed_days - recomputed == plan.days - 200
+
+
+def test_feeds_only_rebucket():
+    plan = FeedingPlan(START)
+    plan.set_group("A", GROUP, feeds={"dry": "Wheat hay", "conc": "Maize"})
+    recomputed = plan.recomputed_days
+    plan.set_feeds("A", {"dry": {"Wheat hay": 1, "Oats hay": 3}, "conc": "Maize"})
+    assert plan.recomputed_days == recomputed
+
+    totals = plan.monthly_by_ingredient()
+    monthly = plan.monthly_totals()
+    np.testing.assert_allclose(totals["Wheat hay"] + totals["Oats hay"], monthly[:, RATION_KEYS.index("dry")])
+    np.testing.assert_allclose(totals["Oats hay"], 3 * totals["Wheat hay"])
+    np.testing.assert_allclose(totals[MINERAL], monthly[:, RATION_KEYS.index("mineral")] / 1000)
+
+
+def test_remove_group():
+    plan = FeedingPlan(START)
+    plan.set_group("A", GROUP)
+    plan.set_group("B", dict(GROUP, count=1))
+    plan.remove_group("A")
+    np.testing.assert_allclose(plan.daily_totals(), _per_day(dict(GROUP, count=1), plan.days))
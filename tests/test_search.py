@@ -0,0 +1,95 @@
+import os
+
+import pytest
+from openpyxl import Workbook
+
+from feed_suggestion.catalog import ALIAS_COLUMN, shared_catalog
+from feed_suggestion.engine import NUTRIENT_COLS
+from feed_suggestion.search import SearchIndex, normalize, split_aliases, trigrams
+
+NAMES = ["Wheat straw", "Paddy straw", "Wheat bran", "Straw pellets", "Maize", "Berseem", "Wheat"]
+ALIASES = {"Wheat straw": ["Bhusa", "भूसा"], "Maize": ["Makka"]}
+BY_CATEGORY = {"Dry fodder": ["Wheat straw", "Paddy straw", "Straw pellets"],
+               "Concentrate": ["Wheat bran", "Maize", "Wheat", "Not in the index"]}
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SearchIndex(NAMES, ALIASES, BY_CATEGORY)
+
+
+def test_normalize():
+    assert normalize("  Wheat-Straw (Bhusa) ") == "wheat straw bhusa"
+    assert normalize("ＭＡＩＺＥ") == "maize"
+    assert normalize("भूसा") == "भूसा"
+
+
+def test_split_aliases():
+    assert split_aliases("Bhusa; Bhoosa | Toori,Kadbi/ ") == ["Bhusa", "Bhoosa", "Toori", "Kadbi"]
+    assert split_aliases(float("nan")) == []
+    assert split_aliases(None) == []
+
+
+def test_trigrams_are_padded():
+    assert trigrams("ab") == {"  a", " ab", "ab "}
+
+
+def test_exact_then_prefix_then_word_prefix(index):
+    assert index.search("wheat") == ["Wheat", "Wheat bran", "Wheat straw"]
+    # a name starting with the query ranks above word prefixes inside names
+    assert index.search("stra") == ["Straw pellets", "Wheat straw", "Paddy straw"]
+    # fewer than k prefix hits: fuzzy matches follow them
+    assert index.search("WHEAT  Straw", k=1) == ["Wheat straw"]
+    assert index.search("WHEAT  Straw")[0] == "Wheat straw"
+
+
+def test_alias_hits(index):
+    assert index.search("bhu") == ["Wheat straw"]
+    assert index.search("भू") == ["Wheat straw"]
+    assert index.search("makka") == ["Maize"]
+
+
+def test_typos_match_by_trigrams(index):
+    assert index.search("wheet strw")[0] == "Wheat straw"
+    assert index.search("bersem") == ["Berseem"]
+    assert index.search("bhoosa")[0] == "Wheat straw"
+    assert index.search("xyz") == []
+
+
+def test_category_filter(index):
+    assert index.search("wheat", category="Dry fodder") == ["Wheat straw"]
+    assert index.search("straw", category="Concentrate") == []
+    assert index.search("wheat", category="No such category") == []
+    # empty queries list the category in its own order; unknown names are skipped
+    assert index.search("", category="Concentrate") == ["Wheat bran", "Maize", "Wheat"]
+    assert index.search("", k=2) == NAMES[:2]
+
+
+def test_k_limits_results(index):
+    assert index.search("straw", k=2) == ["Straw pellets", "Wheat straw"]
+
+
+def _workbook(path, rows):
+    wb = Workbook()
+    wb.active.append(["Ingredient", "Category", *NUTRIENT_COLS, ALIAS_COLUMN])
+    for name, category, aliases in rows:
+        wb.active.append([name, category, *range(1, len(NUTRIENT_COLS) + 1), aliases])
+    wb.save(path)
+
+
+def test_index_rebuilt_after_reload(tmp_path):
+    path = str(tmp_path / "catalog.xlsx")
+    _workbook(path, [("Wheat straw", "Dry fodder", "Bhusa"), ("Maize", "Concentrate", None)])
+    catalog = shared_catalog(path)
+    assert catalog.search("bhu") == ["Wheat straw"]
+    assert catalog.search("makka") == []
+
+    _workbook(path, [("Wheat straw", "Dry fodder", "Bhusa"), ("Maize", "Concentrate", "Makka; Corn"),
+                     ("Berseem", "Green fodder", None)])
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10**9))
+    reloaded = shared_catalog(path)
+    assert reloaded is not catalog
+    assert reloaded.search("makka") == reloaded.search("corn") == ["Maize"]
+    assert reloaded.search("bers", category="Green fodder") == ["Berseem"]
+    # the old catalog keeps its own index
+    assert catalog.search("makka") == []
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import re
+
+import pytest
+
+from feed_suggestion.metrics import API_COALESCED, CACHE_MISSES, CACHE_REQUESTS, METRICS, STAGE_SECONDS
+from feed_suggestion.service import RationService, RequestError, parse_request
+
+COW = {"animal": "Cow", "milk_level": "10 L milk", "body_size": "Medium", "stage": "Mid lactation"}
+
+
+def _counter(name, **labels):
+    return METRICS.counters().get((name, tuple(sorted(labels.items()))), 0)
+
+
+def _stage_count(stage):
+    hist = METRICS.histograms().get((STAGE_SECONDS, (("stage", stage),)))
+    return hist[2] if hist else 0
+
+
+def _body(fields):
+    return json.dumps(fields).encode()
+
+
+@pytest.mark.parametrize("fields, message", [
+    ({"animals": ["cow"]}, "animals[0] must be a JSON object"),
+    ({"animals": [COW, 3]}, "animals[1] must be a JSON object"),
+    ({"animals": [dict(COW, count=-1)]}, "animals[0].count must be a non-negative integer"),
+    ({"animals": [dict(COW, count=True)]}, "animals[0].count must be a non-negative integer"),
+    ({"animals": []}, "animals must be a non-empty list"),
+    ({"animals": [dict(COW, stage="Weaning")]}, "stage must be one of"),
+    ({"animals": [COW], "feeds": {"dry": "No such hay"}}, "Unknown ingredient"),
+    ({"animals": [COW], "feeds": {"hay": "Wheat hay"}}, "feeds must map feed slots"),
+])
+def test_herd_validation(catalog, fields, message):
+    with pytest.raises(RequestError, match=re.escape(message)):
+        parse_request("/herd", _body(fields), catalog)
+
+
+def test_ration_validation(catalog):
+    with pytest.raises(RequestError, match="milk_yield must be between"):
+        parse_request("/ration", _body(dict(COW, milk_yield=40)), catalog)
+    with pytest.raises(RequestError, match="must be JSON"):
+        parse_request("/ration", b"{not json", catalog)
+
+
+def test_equivalent_requests_normalize_alike(catalog):
+    feeds = {"dry": "Wheat hay", "conc": {"Maize": 1, "Wheat bran": 0}}
+    a = parse_request("/ration", _body(dict(COW, feeds=feeds)), catalog)
+    b = parse_request("/ration", json.dumps({"feeds": {"conc": "Maize", "dry": "Wheat hay"}, **COW},
+                                            indent=2).encode(), catalog)
+    assert a == b
+
+
+def test_ration_matches_page(catalog, excel_path):
+    service = RationService(excel_path)
+    feeds = {"dry": "Wheat hay", "conc": {"Maize": 1, "Wheat bran": 3}}
+    data = json.loads(asyncio.run(service.respond("/ration", _body(dict(COW, feeds=feeds)))))
+
+    from feed_suggestion.engine import ration_for
+
+    ration = ration_for(COW["animal"], COW["milk_level"], COW["body_size"], COW["stage"])
+    blends = {"dry": {"Wheat hay": 1.0}, "conc": {"Maize": 1.0, "Wheat bran": 3.0}}
+    assert data["ration"] == pytest.approx(dict(ration))
+    assert data["nutrients"] == pytest.approx(catalog.blend_nutrients(ration, blends))
+
+
+def test_identical_requests_coalesce(excel_path):
+    service = RationService(excel_path)
+    body = _body({"animals": [dict(COW, count=4), dict(COW, stage="Dry period", count=2)],
+                  "feeds": {"dry": "Wheat hay"}})
+    before = (_counter(API_COALESCED, endpoint="/herd"), _counter(CACHE_REQUESTS, cache="api"),
+              _counter(CACHE_MISSES, cache="api"), _stage_count("api_herd_compute"))
+
+    async def burst():
+        return await asyncio.gather(*(service.respond("/herd", body) for _ in range(20)))
+
+    responses = asyncio.run(burst())
+    assert len(set(responses)) == 1
+    assert json.loads(responses[0])["animals"] == 6
+    assert _counter(API_COALESCED, endpoint="/herd") - before[0] == 19
+    assert _counter(CACHE_REQUESTS, cache="api") - before[1] == 20
+    # coalesced requests are hits: only the first one computed
+    assert _counter(CACHE_MISSES, cache="api") - before[2] == 1
+    assert _stage_count("api_herd_compute") - before[3] == 1
+
+    # and the response is cached afterwards
+    assert asyncio.run(service.respond("/herd", body)) == responses[0]
+    assert _counter(CACHE_MISSES, cache="api") - before[2] == 1
+
+
+def test_distinct_rations_batch(excel_path):
+    service = RationService(excel_path)
+    stages = ["Early lactation", "Mid lactation", "Late lactation", "Dry period"]
+    bodies = [_body(dict(COW, stage=s, feeds={"dry": "Wheat hay"})) for s in stages]
+    before = _stage_count("api_ration_batch")
+
+    async def burst():
+        return await asyncio.gather(*(service.respond("/ration", b) for b in bodies))
+
+    responses = [json.loads(r) for r in asyncio.run(burst())]
+    assert _stage_count("api_ration_batch") - before == 1
+    for stage, data in zip(stages, responses):
+        alone = RationService(excel_path)
+        assert json.loads(asyncio.run(alone.respond("/ration", _body(dict(COW, stage=stage,
+                                                                          feeds={"dry": "Wheat hay"}))))) == data
+
+
+def test_herd_stage_timed_once(excel_path):
+    service = RationService(excel_path)
+    body = _body({"animals": [dict(COW, body_size="Large")]})
+    before = _stage_count("api_herd")
+    for _ in range(2):
+        status, _, _ = asyncio.run(service.dispatch("POST", "/herd", body))
+        assert status == 200
+    assert _stage_count("api_herd") - before == 2
+
+
+def test_dispatch_errors(excel_path):
+    service = RationService(excel_path)
+    status, _, data = asyncio.run(service.dispatch("POST", "/herd", _body({"animals": [1]})))
+    assert status == 400 and json.loads(data) == {"error": "animals[0] must be a JSON object"}
+    assert asyncio.run(service.dispatch("GET", "/ration", b""))[0] == 405
+    assert asyncio.run(service.dispatch("GET", "/nowhere", b""))[0] == 404
+
+
+def test_cancelled_request_leaves_batch_intact(excel_path):
+    service = RationService(excel_path)
+    bodies = [_body(dict(COW, stage=s)) for s in ("Early lactation", "Late lactation")]
+
+    async def burst():
+        cancelled, kept = (asyncio.ensure_future(service.respond("/ration", b)) for b in bodies)
+        await asyncio.sleep(0)          # both queued in the same batch window
+        cancelled.cancel()
+        data = await asyncio.wait_for(kept, 5)
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        # the cancelled request is not stuck in flight: a retry computes it
+        retry = await asyncio.wait_for(service.respond("/ration", bodies[0]), 5)
+        return data, retry
+
+    from feed_suggestion.engine import ration_for
+
+    data, retry = asyncio.run(burst())
+    for stage, response in (("Late lactation", data), ("Early lactation", retry)):
+        ration = ration_for(COW["animal"], COW["milk_level"], COW["body_size"], stage)
+        assert json.loads(response)["ration"] == pytest.approx(dict(ration))
+    assert not service._inflight
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from feed_suggestion.catalog import Catalog
+from feed_suggestion.engine import NUTRIENT_DIVISORS
+from feed_suggestion.substitute import MIN_SHARED, substitutes
+
+NAN = np.nan
+# CP, EE, CF, NFE, Ash, NDF, ADF, ME
+ROWS = [
+    ("Maize", "Concentrate", [9.0, 4.0, 2.5, 82.0, 1.5, 9.0, 3.0, 13.0]),
+    ("Sorghum", "Concentrate", [10.0, 3.0, 2.8, 81.0, 1.8, NAN, NAN, NAN]),       # blanks: compared on 5 columns
+    ("Barley", "Concentrate", [12.0, 2.5, 5.9, 79.0, 2.5, 20.0, 7.0, 12.0]),
+    ("Wheat bran", "Concentrate", [15.0, 4.0, 11.0, 63.0, 6.0, 45.0, 13.0, 10.0]),
+    ("Molasses", "Concentrate", [4.0, NAN, NAN, NAN, 10.0, NAN, NAN, 11.0]),      # too few shared columns
+    ("Maize (rich)", "Concentrate", [18.0, 8.0, 5.0, 164.0, 3.0, 18.0, 6.0, 26.0]),  # twice as dense
+    ("Wheat straw", "Dry fodder", [3.5, 1.5, 40.0, 42.0, 9.0, 75.0, 50.0, 6.5]),
+]
+
+
+@pytest.fixture
+def catalog():
+    names, categories, values = zip(*ROWS)
+    return Catalog(names, categories, np.array(values), "v")
+
+
+def _expected_distances(catalog, name):
+    values = np.asarray(catalog.nutrients)
+    z = (values - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0)
+    q = z[catalog.rows[name]]
+    out = {}
+    for other, r in catalog.rows.items():
+        shared = ~np.isnan(z[r]) & ~np.isnan(q)
+        if other != name and catalog.categories[r] == catalog.categories[catalog.rows[name]] \
+                and shared.sum() >= MIN_SHARED:
+            out[other] = np.sqrt(np.mean((z[r][shared] - q[shared]) ** 2))
+    return out
+
+
+def test_ranking_masks_blank_columns(catalog):
+    found = substitutes(catalog, "Maize", qty=2.0, k=10)
+    expected = _expected_distances(catalog, "Maize")
+    assert [f["ingredient"] for f in found] == sorted(expected, key=expected.get)
+    assert [f["distance"] for f in found] == pytest.approx([expected[f["ingredient"]] for f in found])
+    names = [f["ingredient"] for f in found]
+    # Molasses shares only CP, Ash and ME with Maize; Wheat straw is another category
+    assert "Molasses" not in names and "Wheat straw" not in names and "Maize" not in names
+    sorghum = next(f for f in found if f["ingredient"] == "Sorghum")
+    assert np.isnan(sorghum["delta"]["ME"]) and not np.isnan(sorghum["delta"]["CP"])
+    assert [f["ingredient"] for f in substitutes(catalog, "Maize", k=2)] == names[:2]
+    assert "Wheat straw" in [f["ingredient"] for f in substitutes(catalog, "Maize", k=10, category="")]
+
+
+def test_rebalanced_quantity_keeps_totals(catalog):
+    # an ingredient twice as dense replaces Maize at half the weight, CP and ME unchanged
+    rich = next(f for f in substitutes(catalog, "Maize", qty=2.0, k=10) if f["ingredient"] == "Maize (rich)")
+    assert rich["quantity"] == pytest.approx(1.0)
+    assert rich["delta"]["CP"] == pytest.approx(0.0, abs=1e-12)
+    assert rich["delta"]["ME"] == pytest.approx(0.0, abs=1e-12)
+    # blanks do not bias the fit: Sorghum is fitted on its five shared columns
+    sorghum = next(f for f in substitutes(catalog, "Maize", qty=2.0, k=10) if f["ingredient"] == "Sorghum")
+    assert abs(sorghum["delta"]["CP"]) < 0.25 * 2.0 * 9.0 / 100
+
+
+def _weighted_error(catalog, name, qty, other, q):
+    index = catalog.substitution_index()
+    a = qty * catalog.nutrients[catalog.rows[name]] / NUTRIENT_DIVISORS
+    b = q * catalog.nutrients[catalog.rows[other]] / NUTRIENT_DIVISORS
+    shared = ~np.isnan(a) & ~np.isnan(b)
+    return float(((a - b)[shared] ** 2 * index.weights[shared]).sum())
+
+
+@pytest.mark.parametrize("real", [False, True])
+def test_rebalance_is_the_weighted_fit(real, catalog, excel_path):
+    if real:
+        catalog = Catalog.load(excel_path)
+    name = catalog.options("Concentrate")[0]
+    found = substitutes(catalog, name, qty=2.0, k=5)
+    assert found
+    for f in found:
+        best = _weighted_error(catalog, name, 2.0, f["ingredient"], f["quantity"])
+        for q in (0.9 * f["quantity"], 1.1 * f["quantity"], 2.0):
+            assert best <= _weighted_error(catalog, name, 2.0, f["ingredient"], q) + 1e-12
+
+
+def test_cheaper_filter(catalog):
+    prices = {"Maize": 20.0, "Sorghum": 18.0, "Barley": 30.0, "Wheat bran": 12.0, "Maize (rich)": 45.0}
+    found = substitutes(catalog, "Maize", qty=2.0, k=10, prices=prices)
+    assert {f["ingredient"] for f in found} == {"Sorghum", "Barley", "Wheat bran", "Maize (rich)"}
+    for f in found:
+        assert f["cost"] == pytest.approx(f["price"] * f["quantity"])
+
+    cheaper = substitutes(catalog, "Maize", qty=2.0, k=10, prices=prices, cheaper=True)
+    assert cheaper
+    assert all(f["cost"] < 20.0 * 2.0 for f in cheaper)
+    assert {f["ingredient"] for f in cheaper} == {f["ingredient"] for f in found if f["cost"] < 40.0}
+    # ranked as without the filter
+    order = [f["ingredient"] for f in found]
+    assert [f["ingredient"] for f in cheaper] == [n for n in order if n in {f["ingredient"] for f in cheaper}]
+
+    with pytest.raises(ValueError, match="No price for Maize"):
+        substitutes(catalog, "Maize", prices={"Barley": 30.0}, cheaper=True)
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from feed_suggestion import sweep as sweep_module
+from feed_suggestion.engine import FEED_CATEGORIES, FEED_KEYS, NUTRIENT_COLS
+from feed_suggestion.sweep import SETTING_AXES, reduce_sweep, sweep, sweep_map
+
+SETTINGS = (np.linspace(0, 15, 7), np.linspace(0.9, 1.15, 3), np.linspace(0.9, 1.15, 2), [1.0, 1.05])
+
+
+def _feed_rows(catalog):
+    # two alternatives per slot where the catalog has them, plus a green fodder with blank cells
+    rows = [list(catalog.rows_in(FEED_CATEGORIES[k])[:2]) or [-1] for k in FEED_KEYS]
+    green = catalog.rows_in(FEED_CATEGORIES["green"])
+    rows[FEED_KEYS.index("green")].append(next(r for r in green if np.isnan(catalog.nutrients[r]).any()))
+    return rows
+
+
+@pytest.mark.parametrize("how", ["mean", "min", "max"])
+@pytest.mark.parametrize("x, y", [("body_factor", "milk_yield"), ("milk_yield", "dry"), ("green", "conc_factor")])
+def test_sweep_map_matches_full_grid(catalog, monkeypatch, x, y, how):
+    monkeypatch.setattr(sweep_module, "CHUNK_POINTS", 100)      # several blocks of yields
+    args = ("Cow", "Mid lactation", *SETTINGS, _feed_rows(catalog), catalog.nutrients)
+    for nutrient in NUTRIENT_COLS:
+        expected = reduce_sweep(*sweep(*args), x, y, nutrient, how)
+        axes, grid = sweep_map(*args, x, y, nutrient, how)
+        np.testing.assert_allclose(grid, expected, equal_nan=True)
+    assert list(axes) == SETTING_AXES + FEED_KEYS
+    np.testing.assert_array_equal(axes["milk_yield"], SETTINGS[0])
+
+
+def test_sweep_map_checks_the_whole_grid(catalog, monkeypatch):
+    monkeypatch.setattr(sweep_module, "MAX_POINTS", 10)
+    with pytest.raises(ValueError, match="limit"):
+        sweep_map("Cow", "Mid lactation", *SETTINGS, [[-1]] * len(FEED_KEYS), catalog.nutrients,
+                  "milk_yield", "body_factor", "CP")
@@ -0,0 +1,39 @@
+import math
+
+import numpy as np
+
+from feed_suggestion.engine import NUTRIENT_COLS, ration_for
+from feed_suggestion.uncertainty import ration_bands
+
+RATION = ration_for("Cow", "10 L milk", "Medium", "Mid lactation")
+
+
+def _green(catalog, blank):
+    """A green fodder whose ME is blank (or known) in the catalog."""
+    return next(name for name in catalog.options("Green fodder")
+                if np.isnan(catalog.composition(name)["ME"]) == blank)
+
+
+def test_bands_bracket_every_nutrient_when_catalog_is_complete(catalog):
+    blends = {"green": {_green(catalog, blank=False): 1}}
+    bands = ration_bands(catalog, RATION, blends, samples=2000)
+    totals = catalog.blend_nutrients(RATION, blends)
+    assert set(bands) == set(NUTRIENT_COLS)
+    for name, (low, high) in bands.items():
+        assert low <= totals[name] <= high
+
+
+def test_blank_nutrient_has_no_band(catalog):
+    blends = {"green": {_green(catalog, blank=True): 1}}
+    bands = ration_bands(catalog, RATION, blends, samples=2000)
+    assert "ME" not in bands
+    assert math.isnan(catalog.blend_nutrients(RATION, blends)["ME"])
+    assert all(math.isfinite(v) for band in bands.values() for v in band)
+
+
+def test_cards_skip_missing_band():
+    from feed_suggestion.cards import nutrient_section
+
+    html = nutrient_section(((("Crude protein", 1.0, "kg/day", (0.9, 1.1)), ("Energy", 2.0, "MJ/day")),))
+    assert html.count("nutrient-band\"") == 1
+    assert "nan" not in html